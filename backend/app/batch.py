@@ -0,0 +1,73 @@
+"""
+Analyze a batch of WhatsApp exports: a directory of .txt exports (or of
+WhatsApp's export zips), or a zip of .txt exports.
+
+    python -m app.batch team-chats.zip --output results/
+    python -m app.batch exports/ --output results/ --workers 8 --exclude topics
+
+Each chat's analysis is written to <output>/chats/ as soon as it is done,
+and the merged word, emoji and domain frequencies, per-participant totals
+and throughput to <output>/summary.json.
+"""
+import argparse
+import logging
+import os
+import re
+
+from app.utils.analytics import select_analyses
+from app.utils.batch import BATCH_MAX_PENDING, BATCH_WORKERS, run_batch
+from app.utils.encoding import encode_json
+
+UNSAFE_NAME = re.compile(r'[^\w.-]+')
+
+
+def chat_filename(name: str, taken: set) -> str:
+    """
+    A file name for a chat's results that no other chat of the batch gets:
+    names that only differ in the characters replaced here (or in case,
+    for case-insensitive file systems) are numbered.
+    """
+    stem = UNSAFE_NAME.sub("_", name).strip("_") or "chat"
+    filename, number = f"{stem}.json", 1
+    while filename.lower() in taken:
+        number += 1
+        filename = f"{stem}-{number}.json"
+    taken.add(filename.lower())
+    return filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="directory or zip of exports")
+    parser.add_argument("--output", required=True, help="directory for the per-chat results and the summary")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=BATCH_MAX_PENDING,
+                        help="chats in flight at once, which bounds memory")
+    parser.add_argument("--include", nargs="*", help="analyses to run; all of them when omitted")
+    parser.add_argument("--exclude", nargs="*", help="analyses to leave out")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    analyses = select_analyses(args.include, args.exclude)
+    chats_directory = os.path.join(args.output, "chats")
+    os.makedirs(chats_directory, exist_ok=True)
+
+    written = set()
+
+    def write_chat(report):
+        filename = chat_filename(report["name"], written)
+        with open(os.path.join(chats_directory, filename), "wb") as f:
+            f.write(encode_json(report))
+        status = f"failed: {report['error']}" if "error" in report else f"{report['messages']} messages"
+        print(f"{report['name']}: {status} in {report['seconds']:.1f}s")
+
+    summary = run_batch(args.path, analyses, on_chat=write_chat, workers=args.workers, max_pending=args.max_pending)
+    with open(os.path.join(args.output, "summary.json"), "wb") as f:
+        f.write(encode_json(summary))
+    print(f"{summary['chats']} chats ({summary['failed_chats']} failed), {summary['messages']} messages "
+          f"in {summary['seconds']:.1f}s: {summary['chats_per_minute']:.1f} chats/min")
+
+
+if __name__ == "__main__":
+    main()
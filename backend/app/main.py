@@ -1,8 +1,34 @@
-from fastapi import FastAPI, UploadFile, File
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import parsing, analysis
+from fastapi.responses import JSONResponse
+from app.routers import parsing, analysis, analyze, batch, chats, jobs, metrics
+from app.utils.cache import result_cache
+from app.utils.executor import EXECUTOR_MODE, shutdown_process_pool, start_process_pool
+from app.utils.warmup import start_warm_up
+from app.utils.workpool import RETRY_AFTER_SECONDS, WorkPoolBusy
 
-app = FastAPI(title="WhatsApp Chat Analyzer")
+# Configured once here; modules only create their loggers
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The "process" executor's workers start with the server, before any
+    # request thread exists, and stop with it
+    if EXECUTOR_MODE == "process":
+        start_process_pool()
+    # Imports the heavy analytics dependencies ahead of the first request
+    # when WARMUP is set
+    start_warm_up()
+    yield
+    shutdown_process_pool()
+
+app = FastAPI(title="WhatsApp Chat Analyzer", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -13,10 +39,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(WorkPoolBusy)
+async def work_pool_busy(request: Request, exc: WorkPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
 # Include routers
 app.include_router(parsing.router)
 app.include_router(analysis.router)
+app.include_router(analyze.router)
+app.include_router(chats.router)
+app.include_router(batch.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
     
 @app.get("/")
 async def root():
-    return {"message": "WhatsApp Chat Analyzer API"}
\ No newline at end of file
+    return {"message": "WhatsApp Chat Analyzer API"}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
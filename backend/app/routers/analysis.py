@@ -1,36 +1,100 @@
 import logging
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
-from ..utils.analytics import generate_complete_analysis
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Dict, Optional
+from ..utils.analytics import ANALYSIS_ACCUMULATORS
+from ..utils.cache import result_cache, table_key
+from ..utils.incremental import generate_incremental_analysis
+from ..utils.metrics import Profile
+from ..utils.table import InvalidMessage, MessageTable
+from ..utils.workpool import WorkPoolBusy, pool_for
+from .negotiation import ResponseEncoding, response_encoding
+from .selection import analysis_selection
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
-@router.post("/complete")
-async def analyze_chat(messages: List[Dict]):
+def analyze_table(table: MessageTable, profile: Profile, analyses: Optional[List[str]] = None,
+                  save_state: bool = True) -> Dict:
     """
-    Generate a complete analysis of the chat, including:
-    - Basic statistics
-    - User activity patterns
-    - Time-based patterns
-    - Content analysis
-    - Sentiment analysis
-    - Interaction patterns
+    Analyze loaded messages through the result cache; runs on a work pool
+    thread. `save_state` False keeps the incremental state of `table` from
+    being saved (see generate_incremental_analysis).
     """
-    logger.debug(f"Received chat messages for analysis: {len(messages)} messages")
+    with profile.stage("cache_lookup"):
+        key = table_key(table)
+        result = result_cache.get_selection(key, analyses)
+    profile.details["messages"] = len(table)
+    profile.details["cache"] = "miss" if result is None else "hit"
+    if result is None:
+        with profile.stage("analysis"):
+            result, profile.details["incremental"] = generate_incremental_analysis(
+                table, timings=profile.analyses, analyses=analyses, save_state=save_state)
+        result_cache.put_selection(key, analyses, result)
+    return result
 
+def analyze_messages(messages: List[Dict], profile: Profile, analyses: Optional[List[str]] = None) -> Dict:
+    """Analyze a message list through the result cache; runs on a work pool thread."""
+    profile.stages["queue_wait"] = profile.elapsed()
+    with profile.stage("load"):
+        table = MessageTable.from_messages(messages)
+    return analyze_table(table, profile, analyses)
+
+async def run_analysis(messages: List[Dict], profile: bool, analyses: Optional[List[str]]) -> Dict:
     if not messages:
         logger.warning("No messages received for analysis")
         raise HTTPException(status_code=400, detail="No messages provided")
 
     try:
         logger.debug("Starting chat analysis...")
-        analysis = generate_complete_analysis(messages)
+        timing = Profile()
+        pool = pool_for(message_count=len(messages))
+        analysis = await pool.run(analyze_messages, messages, timing, analyses)
         logger.debug("Chat analysis completed successfully")
+        if profile:
+            analysis["profile"] = timing.report()
         return analysis
+    except WorkPoolBusy:
+        raise
+    except InvalidMessage as e:
+        logger.warning(f"Invalid messages received for analysis: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error during chat analysis: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error during analysis")
+
+@router.post("/complete")
+async def analyze_chat(messages: List[Dict], profile: bool = False,
+                       analyses: Optional[List[str]] = Depends(analysis_selection),
+                       encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    Generate a complete analysis of the chat, including:
+    - Basic statistics
+    - User activity patterns
+    - Time-based patterns
+    - Content analysis
+    - Sentiment analysis
+    - Interaction patterns
+
+    `?include=` and `?exclude=` limit the report to some of its sections,
+    e.g. `?include=basic_stats,time_patterns`; only those analyses run.
+    With `?profile=true` the response also carries a `profile` section with
+    the time spent per stage and per analysis. Send `Accept:
+    application/msgpack` for MessagePack instead of JSON.
+    """
+    logger.debug(f"Received chat messages for analysis: {len(messages)} messages")
+    return encoding.response(await run_analysis(messages, profile, analyses))
+
+@router.post("/{section}")
+async def analyze_section(section: str, messages: List[Dict], profile: bool = False,
+                          encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    One section of the complete analysis, e.g. /analysis/time_patterns, for
+    views that load their data lazily. The response has the same shape as
+    /analysis/complete with only that section in it.
+    """
+    if section not in ANALYSIS_ACCUMULATORS:
+        raise HTTPException(status_code=404, detail=f"Unknown analysis: {section}")
+
+    logger.debug(f"Received chat messages for {section}: {len(messages)} messages")
+    return encoding.response(await run_analysis(messages, profile, [section]))
@@ -0,0 +1,77 @@
+import logging
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from typing import List, Optional
+from ..utils.cache import result_cache, upload_key
+from ..utils.exports import parse_upload
+from ..utils.incremental import generate_incremental_analysis
+from ..utils.metrics import Profile
+from ..utils.workpool import pool_for
+from .negotiation import ResponseEncoding, response_encoding
+from .selection import analysis_selection
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["analysis"])
+
+def parse_and_analyze(stream, profile: Profile, analyses: Optional[List[str]] = None):
+    """
+    Parse and analyze one upload; runs on a work pool thread. An export
+    whose exact bytes were analyzed before is answered from the result
+    cache without parsing it, and a longer export of a chat seen before
+    only has its new messages analyzed.
+    """
+    profile.stages["queue_wait"] = profile.elapsed()
+    with profile.stage("cache_lookup"):
+        key = upload_key(stream)
+        cached = result_cache.get_selection(key, analyses)
+    profile.details["cache"] = "miss" if cached is None else "hit"
+    if cached is not None:
+        logger.debug(f"Serving cached analysis for {key}")
+        return cached
+
+    try:
+        with profile.stage("parse"):
+            table = parse_upload(stream)
+    except Exception as e:
+        logger.error(f"Error parsing chat: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to parse chat")
+
+    if not len(table):
+        logger.warning("No messages found in uploaded chat")
+        raise HTTPException(status_code=400, detail="No messages found in chat")
+
+    profile.details["messages"] = len(table)
+    try:
+        with profile.stage("analysis"):
+            result, profile.details["incremental"] = generate_incremental_analysis(
+                table, timings=profile.analyses, analyses=analyses)
+    except Exception as e:
+        logger.error(f"Error during chat analysis: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error during analysis")
+
+    result_cache.put_selection(key, analyses, result)
+    return result
+
+@router.post("/analyze")
+async def analyze_upload(file: UploadFile = File(...), profile: bool = False,
+                         analyses: Optional[List[str]] = Depends(analysis_selection),
+                         encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    Parse an uploaded export (the chat's text, or WhatsApp's export zip)
+    and return its complete analysis in one request.
+
+    Same result as /parse/chat followed by /analysis/complete, without
+    sending the parsed message list to the client and back. `?include=` and
+    `?exclude=` limit the report to some of its sections. With
+    `?profile=true` the response also carries a `profile` section with the
+    time spent per stage and per analysis. The response is JSON, or
+    MessagePack with `Accept: application/msgpack`, and compressed when the
+    client accepts gzip or brotli.
+    """
+    logger.debug(f"Received file for analysis: {file.filename}, Size: {file.size} bytes")
+
+    timing = Profile()
+    result = await pool_for(size_bytes=file.size).run(parse_and_analyze, file.file, timing, analyses)
+    if profile:
+        result["profile"] = timing.report()
+    return encoding.response(result)
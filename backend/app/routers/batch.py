@@ -0,0 +1,50 @@
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from typing import Dict, List, Optional
+from ..utils.batch import run_batch
+from ..utils.workpool import WorkPoolBusy, pool_for
+from .negotiation import ResponseEncoding, response_encoding
+from .selection import analysis_selection
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["batch"])
+
+def analyze_archive(file, analyses: Optional[List[str]]) -> Dict:
+    """Spool an uploaded zip of exports to disk and analyze it as a batch; runs on a work pool thread."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "batch.zip")
+        with open(path, "wb") as spool:
+            shutil.copyfileobj(file, spool)
+        if not zipfile.is_zipfile(path):
+            raise HTTPException(status_code=400, detail="Upload a zip of chat exports")
+        chats = []
+        summary = run_batch(path, analyses, on_chat=chats.append)
+    if not chats:
+        raise HTTPException(status_code=400, detail="No chat exports (.txt) found in the zip")
+    return {"summary": summary, "chats": sorted(chats, key=lambda report: report["name"])}
+
+@router.post("/batch")
+async def analyze_batch(file: UploadFile = File(...),
+                        analyses: Optional[List[str]] = Depends(analysis_selection),
+                        encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    Analyze every .txt export in an uploaded zip across a process pool.
+    Returns each chat's analysis (or its error) and a summary with word,
+    emoji and domain frequencies and per-participant totals merged across
+    the chats, plus throughput in chats per minute. `?include=` and
+    `?exclude=` pick the analyses run for every chat.
+    """
+    logger.debug(f"Received batch: {file.filename}, Size: {file.size} bytes")
+    try:
+        result = await pool_for().run(analyze_archive, file.file, analyses)
+    except (HTTPException, WorkPoolBusy):
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error during batch analysis")
+    return encoding.response(result)
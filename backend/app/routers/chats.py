@@ -0,0 +1,135 @@
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from typing import Dict, List, Optional
+from ..utils.analytics import ANALYSIS_ACCUMULATORS
+from ..utils.exports import parse_upload
+from ..utils.metrics import Profile
+from ..utils.store import ChatNotFound, StoredChat, chat_store
+from ..utils.table import to_epoch
+from ..utils.workpool import WorkPoolBusy, pool_for
+from .analysis import analyze_table
+from .negotiation import ResponseEncoding, response_encoding
+from .selection import analysis_selection
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/chats", tags=["chats"])
+
+class MessageFilter:
+    """Messages sent in [start, end), in epoch seconds, by any of `senders`; None leaves a bound open."""
+
+    def __init__(self, start: Optional[int], end: Optional[int], senders: Optional[List[str]]):
+        self.start = start
+        self.end = end
+        self.senders = senders
+
+    @property
+    def is_empty(self) -> bool:
+        return self.start is None and self.end is None and self.senders is None
+
+def _epoch(value: Optional[str], name: str) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        # Export timestamps are local times, so any offset given is ignored
+        return to_epoch(datetime.fromisoformat(value).replace(tzinfo=None))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+
+def message_filter(
+    start: Optional[str] = Query(None, description="First date or datetime to include, e.g. 2024-03-01"),
+    end: Optional[str] = Query(None, description="Date or datetime to stop before, e.g. 2024-04-01"),
+    sender: Optional[List[str]] = Query(None, description="Participant to include; repeat for several"),
+) -> MessageFilter:
+    return MessageFilter(_epoch(start, "start"), _epoch(end, "end"), sender)
+
+def load_chat(chat_id: str) -> StoredChat:
+    try:
+        return chat_store.get(chat_id)
+    except ChatNotFound:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+def store_upload(stream) -> Dict:
+    table = parse_upload(stream)
+    if not len(table):
+        raise HTTPException(status_code=400, detail="No messages found in chat")
+    return chat_store.get(chat_store.save(table)).info()
+
+def analyze_stored(chat: StoredChat, query: MessageFilter, profile: Profile,
+                   analyses: Optional[List[str]] = None) -> Dict:
+    """Analyze the messages of a stored chat that pass `query`; runs on a work pool thread."""
+    profile.stages["queue_wait"] = profile.elapsed()
+    with profile.stage("load"):
+        table = chat.query(query.start, query.end, query.senders)
+    if not len(table):
+        raise HTTPException(status_code=400, detail="No messages match the filter")
+    # Only the whole chat saves incremental state; a filtered part of it
+    # would store a state of its own under the part's first messages
+    return analyze_table(table, profile, analyses, save_state=query.is_empty)
+
+async def run_stored_analysis(chat_id: str, query: MessageFilter, profile: bool,
+                              analyses: Optional[List[str]]) -> Dict:
+    chat = load_chat(chat_id)
+    timing = Profile()
+    try:
+        result = await pool_for(message_count=len(chat)).run(analyze_stored, chat, query, timing, analyses)
+    except (HTTPException, WorkPoolBusy):
+        raise
+    except Exception as e:
+        logger.error(f"Error during chat analysis: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error during analysis")
+    if profile:
+        result["profile"] = timing.report()
+    return result
+
+@router.post("", status_code=201)
+async def store_chat(file: UploadFile = File(...)):
+    """
+    Parse an uploaded export and keep it on the server, indexed by time and
+    sender, for later analyses of parts of it. Returns the chat's id and its
+    participants and time span; uploading the same chat again returns the
+    same id.
+    """
+    logger.debug(f"Received file to store: {file.filename}, Size: {file.size} bytes")
+    try:
+        return await pool_for(size_bytes=file.size).run(store_upload, file.file)
+    except (HTTPException, WorkPoolBusy):
+        raise
+    except Exception as e:
+        logger.error(f"Error storing chat: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to parse chat")
+
+@router.get("")
+async def list_chats():
+    return chat_store.list()
+
+@router.get("/{chat_id}")
+async def chat_info(chat_id: str):
+    return load_chat(chat_id).info()
+
+@router.delete("/{chat_id}", status_code=204)
+async def delete_chat(chat_id: str):
+    load_chat(chat_id)
+    chat_store.delete(chat_id)
+
+@router.get("/{chat_id}/analysis")
+async def analyze_chat(chat_id: str, query: MessageFilter = Depends(message_filter), profile: bool = False,
+                       analyses: Optional[List[str]] = Depends(analysis_selection),
+                       encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    Analysis of a stored chat, or of the messages sent between `start` and
+    `end` and/or by the `sender`s given, e.g.
+    `?start=2024-03-01&end=2024-04-01&sender=Alice&sender=Bob`. The
+    filtered messages are read through the chat's indexes, not by scanning
+    it. `include`, `exclude` and `profile` work as for /analysis/complete.
+    """
+    return encoding.response(await run_stored_analysis(chat_id, query, profile, analyses))
+
+@router.get("/{chat_id}/analysis/{section}")
+async def analyze_chat_section(chat_id: str, section: str, query: MessageFilter = Depends(message_filter),
+                               profile: bool = False, encoding: ResponseEncoding = Depends(response_encoding)):
+    """One section of /chats/{chat_id}/analysis, with the same filters."""
+    if section not in ANALYSIS_ACCUMULATORS:
+        raise HTTPException(status_code=404, detail=f"Unknown analysis: {section}")
+    return encoding.response(await run_stored_analysis(chat_id, query, profile, [section]))
@@ -0,0 +1,94 @@
+import logging
+import shutil
+import tempfile
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Optional
+from ..utils.cache import upload_key
+from ..utils.exports import parse_upload
+from ..utils.jobs import JobError, job_store, run_job
+from ..utils.workpool import pool_for
+from .negotiation import ResponseEncoding, response_encoding
+from .selection import analysis_selection
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+def spool_upload(file, spool) -> str:
+    """Copy an upload to `spool` and return its cache key."""
+    shutil.copyfileobj(file, spool)
+    spool.seek(0)
+    return upload_key(spool)
+
+def load_spooled_upload(spool):
+    try:
+        return parse_upload(spool)
+    except Exception as e:
+        logger.error(f"Error parsing chat: {e}", exc_info=True)
+        raise JobError("Failed to parse chat")
+
+def run_upload_job(job, spool, key: str, analyses: Optional[List[str]] = None) -> None:
+    try:
+        run_job(job, lambda: load_spooled_upload(spool), key, analyses)
+    finally:
+        spool.close()
+
+def submit_job(pool, analyses: Optional[List[str]], func, *args, cleanup=None) -> Dict:
+    job = job_store.create(analyses)
+    try:
+        pool.submit(func, job, *args, analyses=analyses)
+    except Exception:
+        job_store.discard(job.id)
+        if cleanup is not None:
+            cleanup()
+        raise
+    logger.debug(f"Submitted analysis job {job.id}")
+    return {"job_id": job.id, "status": job.status}
+
+@router.post("/upload", status_code=202)
+async def submit_upload(file: UploadFile = File(...),
+                        analyses: Optional[List[str]] = Depends(analysis_selection)):
+    """
+    Start analyzing an uploaded export in the background and return its job
+    id. The upload is closed once this request returns, so it is first
+    copied to a temporary file that the job parses and then deletes.
+    `?include=` and `?exclude=` pick the analyses, as for /analyze.
+    """
+    logger.debug(f"Received file for job: {file.filename}, Size: {file.size} bytes")
+
+    spool = tempfile.TemporaryFile()
+    key = await run_in_threadpool(spool_upload, file.file, spool)
+    return submit_job(pool_for(size_bytes=file.size), analyses, run_upload_job, spool, key,
+                      cleanup=spool.close)
+
+@router.post("/messages", status_code=202)
+async def submit_messages(messages: List[Dict],
+                          analyses: Optional[List[str]] = Depends(analysis_selection)):
+    """
+    Start analyzing a parsed message list in the background and return its
+    job id. `?include=` and `?exclude=` pick the analyses.
+    """
+    if not messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+
+    return submit_job(pool_for(message_count=len(messages)), analyses, run_job, lambda: messages)
+
+@router.get("/{job_id}")
+async def job_status(job_id: str):
+    """Job status and which of the analyses have finished."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.status_snapshot()
+
+@router.get("/{job_id}/result")
+async def job_result(job_id: str, encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    The analyses finished so far. `complete` turns true once every section
+    is in; sections that failed are reported as None, as in /analysis/complete.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return encoding.response(job.result_snapshot())
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..utils.cache import result_cache
+from ..utils.incremental import state_store
+from ..utils.metrics import Counter, Gauge, registry
+from ..utils.sentiment import get_scorer
+from ..utils.workpool import large_pool, small_pool
+
+router = APIRouter(tags=["metrics"])
+
+POOL_JOBS = registry.register(Gauge(
+    "chatviz_pool_jobs", "Jobs on a work pool by state", ("pool", "state")))
+POOL_REJECTED = registry.register(Counter(
+    "chatviz_pool_rejected_total", "Jobs turned away because a work pool was full", ("pool",)))
+CACHE_LOOKUPS = registry.register(Counter(
+    "chatviz_cache_lookups_total", "Cache lookups by result", ("cache", "result")))
+CACHE_BYTES = registry.register(Gauge(
+    "chatviz_cache_bytes", "Bytes held by a cache", ("cache",)))
+CACHE_ENTRIES = registry.register(Gauge(
+    "chatviz_cache_entries", "Entries held by a cache", ("cache",)))
+
+def collect_service_metrics() -> None:
+    for pool in (small_pool, large_pool):
+        stats = pool.stats()
+        POOL_JOBS.set(stats["running"], pool.name, "running")
+        POOL_JOBS.set(stats["queued"], pool.name, "queued")
+        POOL_REJECTED.set_total(stats["rejected"], pool.name)
+
+    for name, cache in (("results", result_cache), ("analysis_state", state_store)):
+        stats = cache.stats()
+        CACHE_LOOKUPS.set_total(stats["hits"], name, "hit")
+        CACHE_LOOKUPS.set_total(stats["misses"], name, "miss")
+        CACHE_BYTES.set(stats["bytes"], name)
+        CACHE_ENTRIES.set(stats["entries"], name)
+
+    stats = get_scorer().stats()
+    CACHE_LOOKUPS.set_total(stats["hits"], "sentiment", "hit")
+    CACHE_LOOKUPS.set_total(stats["misses"], "sentiment", "miss")
+    CACHE_ENTRIES.set(stats["cache_entries"], "sentiment")
+
+registry.add_collector(collect_service_metrics)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timings, counts and throughput in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,51 @@
+from fastapi import Header
+from fastapi.responses import Response, StreamingResponse
+from typing import Iterable, Optional
+from ..utils.encoding import COMPRESS_MIN_BYTES, choose_coding, choose_format, compress, compress_stream, encode
+
+# The body depends on these request headers, which caches have to know
+VARY = "Accept, Accept-Encoding"
+
+class ResponseEncoding:
+    """
+    How the client wants its response: `media_type` is JSON or MessagePack,
+    per the Accept header, and `coding` is brotli, gzip or None, per
+    Accept-Encoding.
+    """
+
+    def __init__(self, media_type: str, coding: Optional[str]):
+        self.media_type = media_type
+        self.coding = coding
+
+    def _headers(self, compressed: bool):
+        headers = {"Vary": VARY}
+        if compressed:
+            headers["Content-Encoding"] = self.coding
+        return headers
+
+    def response(self, content) -> Response:
+        """
+        `content` serialized and compressed as negotiated. Returning the
+        Response from a route skips FastAPI's jsonable_encoder walk.
+        """
+        body = encode(content, self.media_type)
+        compressed = self.coding is not None and len(body) >= COMPRESS_MIN_BYTES
+        if compressed:
+            body = compress(body, self.coding)
+        return Response(body, media_type=self.media_type, headers=self._headers(compressed))
+
+    def stream(self, chunks: Iterable[bytes]) -> StreamingResponse:
+        """A response streaming `chunks`, already encoded as `media_type`."""
+        if self.coding is not None:
+            chunks = compress_stream(chunks, self.coding)
+        return StreamingResponse(chunks, media_type=self.media_type,
+                                 headers=self._headers(self.coding is not None))
+
+def response_encoding(accept: Optional[str] = Header(None),
+                      accept_encoding: Optional[str] = Header(None)) -> ResponseEncoding:
+    """
+    Negotiated response format. JSON unless the client asks for
+    `application/msgpack` (or x-msgpack) in Accept; compressed with brotli
+    when it is installed and accepted, else gzip, else not at all.
+    """
+    return ResponseEncoding(choose_format(accept), choose_coding(accept_encoding))
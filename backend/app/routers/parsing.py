@@ -1,36 +1,77 @@
-from fastapi import APIRouter, UploadFile, File
-from ..utils.parser import parse_chat_file
-from typing import List
-import io
+from fastapi import APIRouter, Depends, UploadFile, File
+from ..utils.encoding import MSGPACK, encode_json, encode_msgpack
+from ..utils.exports import parse_upload, upload_media
+from ..utils.table import MessageTable
+from ..utils.workpool import WorkPoolBusy, pool_for
+from .negotiation import ResponseEncoding, response_encoding
+from typing import Dict, Iterator, List, Optional
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/parse", tags=["parsing"])
 
-@router.post("/chat")
-async def parse_chat(file: UploadFile = File(...)):
-    try:
-        # Read file content
-        content = await file.read()
-        text = content.decode("utf-8")
+# Messages serialized per chunk of the streamed response
+RESPONSE_BATCH_SIZE = 1000
+# Rows per column batch of the MessagePack response
+COLUMN_BATCH_SIZE = 50_000
+
+def iter_messages_json(table: MessageTable, media: Optional[List[Dict]] = None) -> Iterator[bytes]:
+    """
+    Encode `{"messages": [...]}` a slice at a time so the full dict list
+    never exists, with a `media` list after the messages when given.
+    """
+    yield b'{"messages":['
+    for start in range(0, len(table), RESPONSE_BATCH_SIZE):
+        batch = table.slice(start, min(start + RESPONSE_BATCH_SIZE, len(table)))
+        # Strip the brackets of each batch's list to splice it into one array
+        encoded = encode_json(batch.to_messages())[1:-1]
+        yield (b"," + encoded) if start else encoded
+    yield b']}' if media is None else b'],"media":' + encode_json(media) + b'}'
 
-        # Debugging: Log file size and preview content
-        logger.debug(f"Received file: {file.filename}, Size: {len(content)} bytes")
-        logger.debug(f"File content preview: {text[:500]}")  # Log first 500 characters
+def iter_messages_msgpack(table: MessageTable, media: Optional[List[Dict]] = None) -> Iterator[bytes]:
+    """
+    Encode the messages as a sequence of MessagePack maps: a header with
+    the row count, the `senders` and `types` the codes point into and the
+    `media` list when given, then `MessageTable.to_columns` of up to
+    COLUMN_BATCH_SIZE rows at a time.
+    """
+    header = {"count": len(table), "senders": table.senders, "types": table.types}
+    if media is not None:
+        header["media"] = media
+    yield encode_msgpack(header)
+    for start in range(0, len(table), COLUMN_BATCH_SIZE):
+        yield encode_msgpack(table.slice(start, min(start + COLUMN_BATCH_SIZE, len(table))).to_columns())
 
-        # Parse chat messages
-        messages = parse_chat_file(io.StringIO(text))
+@router.post("/chat")
+async def parse_chat(file: UploadFile = File(...), media: bool = False,
+                     encoding: ResponseEncoding = Depends(response_encoding)):
+    """
+    The messages of an uploaded export, as `{"messages": [...]}` JSON. With
+    `Accept: application/msgpack` they come as compact columns instead (see
+    iter_messages_msgpack), with the fields derived from the timestamp left
+    out.
+
+    The upload may be the chat's text or WhatsApp's "export with media"
+    zip, whose chat is decompressed into the parser as it is read. Its
+    media files are skipped; `?media=true` adds a `media` list with the
+    name and size of each.
+    """
+    try:
+        logger.debug(f"Received file: {file.filename}, Size: {file.size} bytes")
 
-        # Debugging: Log parsed messages count and sample
-        logger.debug(f"Parsed {len(messages)} messages.")
-        if messages:
-            logger.debug(f"First 3 messages: {messages[:3]}")
+        # Parse chat messages straight from the upload, chunk by chunk,
+        # on a work pool thread so the event loop stays free
+        table = await pool_for(size_bytes=file.size).run(parse_upload, file.file)
+        logger.debug(f"Parsed {len(table)} messages.")
+        entries = upload_media(file.file) if media else None
 
-        return {"messages": messages}
+        if encoding.media_type == MSGPACK:
+            return encoding.stream(iter_messages_msgpack(table, entries))
+        return encoding.stream(iter_messages_json(table, entries))
 
+    except WorkPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"Error parsing chat: {e}", exc_info=True)
         return {"error": "Failed to parse chat"}
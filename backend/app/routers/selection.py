@@ -0,0 +1,26 @@
+from fastapi import HTTPException, Query
+from typing import List, Optional
+from ..utils.analytics import is_complete_selection, select_analyses
+
+def _split(values: Optional[List[str]]) -> Optional[List[str]]:
+    if values is None:
+        return None
+    return [name.strip() for value in values for name in value.split(",") if name.strip()]
+
+def analysis_selection(
+    include: Optional[List[str]] = Query(None, description="Analyses to run; all of them when omitted"),
+    exclude: Optional[List[str]] = Query(None, description="Analyses to leave out"),
+) -> Optional[List[str]]:
+    """
+    The analyses picked with `include` and `exclude`, each given repeated
+    or comma separated (`?include=basic_stats,time_patterns`). None stands
+    for all of them, which is what the result cache and the saved
+    incremental state are keyed on.
+    """
+    try:
+        analyses = select_analyses(_split(include), _split(exclude))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not analyses:
+        raise HTTPException(status_code=400, detail="No analyses selected")
+    return None if is_complete_selection(analyses) else analyses
@@ -1,583 +1,769 @@
 import logging
 from collections import Counter, defaultdict
-from datetime import datetime, timedelta
-from textblob import TextBlob
-import emoji
 import re
 import numpy as np
-import networkx as nx
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-from typing import List, Dict
-
-# Configure logging with more detailed format
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s'
-)
+from typing import Iterable, List, Dict, Optional, Union
+
+from .centrality import (BETWEENNESS_MODES, NETWORK_BETWEENNESS, NETWORK_GRAPH, NETWORK_GRAPHS,
+                         betweenness, reply_centrality)
+from .engine import Accumulator, ResultCallback, run_accumulator
+from .features import count_terms
+from .executor import EXECUTOR_MODE, run_analyses
+from .sentiment import SentimentScorer, get_scorer
+from .sessions import (BURST_WINDOW_SECONDS, SESSION_IDLE_SECONDS, adjacent_pairs, grouped_percentiles,
+                       summarize)
+from .sketches import FREQUENCY_MODE, HeavyHitters, frequency_counter
+from .table import FLAG_CAPS, FLAG_EXCLAMATION, FLAG_QUESTION, MessageTable, from_epoch
+from .topics import TOPICS_MODE, DocumentTerms, scalable_topics, top_words
+
 logger = logging.getLogger(__name__)
 
-def compute_basic_stats(messages: List[Dict]) -> Dict:
-    logger.info(f"Starting basic stats computation for {len(messages)} messages")
-    
-    try:
-        total_messages = len(messages)
-        logger.debug(f"Found {total_messages} total messages")
-        
-        participants = set(msg["sender"] for msg in messages if msg["sender"])
-        logger.debug(f"Identified {len(participants)} unique participants")
-
-        date_range = {
-            "start": min(msg["date"] for msg in messages),
-            "end": max(msg["date"] for msg in messages)
-        }
-        logger.debug(f"Date range: {date_range['start']} to {date_range['end']}")
+DOMAIN_PATTERN = re.compile(r'https?://(?:www\.)?([^/]+)')
+# Replies slower than this start a new conversation rather than respond
+RESPONSE_WINDOW_SECONDS = SESSION_IDLE_SECONDS
+CODE_INDICATORS = ['```', 'def ', 'class ', '#include', 'import ', 'console.log']
+
+Messages = Union[List[Dict], MessageTable]
+
+USER_TOTALS = ("word_count", "character_count", "emoji_count", "media_count",
+               "questions_asked", "exclamations_used", "caps_messages", "urls_shared")
+
+
+def _new_user_stats() -> Dict:
+    return {
+        "message_count": 0,
+        "word_count": 0,
+        "character_count": 0,
+        "emoji_count": 0,
+        "media_count": 0,
+        "questions_asked": 0,
+        "exclamations_used": 0,
+        "caps_messages": 0,
+        "urls_shared": 0,
+        "average_message_length": 0
+    }
+
+
+def _counts_in_order(values: np.ndarray):
+    """(value, count) pairs of an integer array, in order of first appearance."""
+    if not len(values):
+        return []
+    uniques, first, counts = np.unique(values, return_index=True, return_counts=True)
+    order = np.argsort(first)
+    return zip(uniques[order].tolist(), counts[order].tolist())
+
+
+def _with_previous(previous, column: np.ndarray) -> np.ndarray:
+    """Prepend the last value of the previous batch so adjacent pairs span batches."""
+    if previous is None:
+        return column
+    return np.concatenate(([previous], column))
 
-        message_types = Counter(msg["type"] for msg in messages)
-        logger.debug(f"Message type distribution: {dict(message_types)}")
 
-        media_count = len([m for m in messages if m["type"] == "media"])
-        logger.debug(f"Media messages count: {media_count}")
+def _term_counts(batch: MessageTable) -> List:
+    """
+    (word, count) pairs of the batch's normal messages, in order of first
+    appearance. Read off the shared features when some analysis needed
+    them, otherwise tokenized from the batch alone.
+    """
+    if not batch.has_features():
+        return count_terms(batch)
+    vocabulary = batch.features().vocabulary
+    return [(vocabulary[term], count) for term, count in _counts_in_order(batch.features().batch_token_ids())]
 
-        deleted_count = len([m for m in messages if m["type"] == "deleted"])
-        logger.debug(f"Deleted messages count: {deleted_count}")
 
-        system_count = len([m for m in messages if m["type"] == "system"])
-        logger.debug(f"System messages count: {system_count}")
+def term_counts(batch: MessageTable) -> List:
+    return batch.shared("term_counts", _term_counts)
 
-        questions = len([m for m in messages if m["has_question"]])
-        logger.debug(f"Questions asked: {questions}")
 
-        exclamations = len([m for m in messages if m["has_exclamation"]])
-        logger.debug(f"Exclamations used: {exclamations}")
+def _hours(batch: MessageTable) -> np.ndarray:
+    return batch.shared("hours", MessageTable.hours)
 
-        caps = len([m for m in messages if m["is_caps"]])
-        logger.debug(f"Messages in caps: {caps}")
 
-        urls = sum(len(msg["urls"]) for msg in messages)
-        logger.debug(f"Total URLs shared: {urls}")
+def _float_mean(total, count):
+    return np.float64(total) / count
 
-        emoji_count = sum(msg["emoji_count"] for msg in messages)
-        logger.debug(f"Total emojis used: {emoji_count}")
 
-        stats = {
-            "total_messages": total_messages,
-            "total_participants": len(participants),
-            "date_range": date_range,
-            "message_types": dict(message_types),
-            "media_count": media_count,
-            "deleted_messages": deleted_count,
-            "system_messages": system_count,
-            "questions_asked": questions,
-            "exclamations_used": exclamations,
-            "caps_messages": caps,
-            "urls_shared": urls,
-            "total_emojis": emoji_count
+class BasicStatsAccumulator(Accumulator):
+    def __init__(self):
+        self.total_messages = 0
+        self.participants = set()
+        self.start = None
+        self.end = None
+        self.message_types = Counter()
+        self.questions = 0
+        self.exclamations = 0
+        self.caps = 0
+        self.urls = 0
+        self.emoji_count = 0
+
+    def update(self, batch: MessageTable) -> None:
+        self.total_messages += len(batch)
+        codes = batch.sender_codes
+        self.participants.update(batch.senders[code] for code in np.unique(codes[codes >= 0]).tolist())
+        start, end = int(batch.timestamps.min()), int(batch.timestamps.max())
+        self.start = start if self.start is None else min(self.start, start)
+        self.end = end if self.end is None else max(self.end, end)
+        for code, count in _counts_in_order(batch.type_codes):
+            self.message_types[batch.types[code]] += count
+        self.questions += int(np.count_nonzero(batch.has_flag(FLAG_QUESTION)))
+        self.exclamations += int(np.count_nonzero(batch.has_flag(FLAG_EXCLAMATION)))
+        self.caps += int(np.count_nonzero(batch.has_flag(FLAG_CAPS)))
+        self.urls += int(batch.url_offsets[-1] - batch.url_offsets[0])
+        self.emoji_count += int(batch.emoji_offsets[-1] - batch.emoji_offsets[0])
+
+    def finalize(self) -> Dict:
+        if not self.total_messages:
+            raise ValueError("No messages to compute basic stats from")
+        return {
+            "total_messages": self.total_messages,
+            "total_participants": len(self.participants),
+            "date_range": {
+                "start": from_epoch(self.start).date().isoformat(),
+                "end": from_epoch(self.end).date().isoformat()
+            },
+            "message_types": dict(self.message_types),
+            "media_count": self.message_types["media"],
+            "deleted_messages": self.message_types["deleted"],
+            "system_messages": self.message_types["system"],
+            "questions_asked": self.questions,
+            "exclamations_used": self.exclamations,
+            "caps_messages": self.caps,
+            "urls_shared": self.urls,
+            "total_emojis": self.emoji_count
         }
-        
-        logger.info("Basic stats computation completed successfully")
-        return stats
-        
-    except Exception as e:
-        logger.error(f"Error computing basic stats: {str(e)}", exc_info=True)
-        raise
 
-def analyze_user_activity(messages: List[Dict]) -> Dict:
-    logger.info(f"Starting user activity analysis for {len(messages)} messages")
-    
-    try:
-        user_stats = defaultdict(lambda: {
-            "message_count": 0,
-            "word_count": 0,
-            "character_count": 0,
-            "emoji_count": 0,
-            "media_count": 0,
-            "questions_asked": 0,
-            "exclamations_used": 0,
-            "caps_messages": 0,
-            "urls_shared": 0,
-            "average_message_length": 0
-        })
-        
-        for idx, msg in enumerate(messages):
-            if not msg["sender"] or msg["type"] == "system":
-                logger.debug(f"Skipping message {idx}: no sender or system message")
-                continue
-                
-            logger.debug(f"Processing message {idx} from sender: {msg['sender']}")
-            stats = user_stats[msg["sender"]]
-            stats["message_count"] += 1
-            stats["word_count"] += msg["word_count"]
-            stats["character_count"] += msg["character_count"]
-            stats["emoji_count"] += msg["emoji_count"]
-            stats["media_count"] += 1 if msg["type"] == "media" else 0
-            stats["questions_asked"] += 1 if msg["has_question"] else 0
-            stats["exclamations_used"] += 1 if msg["has_exclamation"] else 0
-            stats["caps_messages"] += 1 if msg["is_caps"] else 0
-            stats["urls_shared"] += len(msg["urls"])
-
-        for user, stats in user_stats.items():
-            logger.debug(f"Calculating averages for user: {user}")
+
+class UserActivityAccumulator(Accumulator):
+    def __init__(self):
+        self.user_stats = defaultdict(_new_user_stats)
+
+    def update(self, batch: MessageTable) -> None:
+        mask = batch.has_sender() & ~batch.is_type("system")
+        codes = batch.sender_codes[mask]
+        columns = {
+            "word_count": batch.word_counts,
+            "character_count": batch.character_counts,
+            "emoji_count": batch.emoji_counts(),
+            "media_count": batch.is_type("media"),
+            "questions_asked": batch.has_flag(FLAG_QUESTION),
+            "exclamations_used": batch.has_flag(FLAG_EXCLAMATION),
+            "caps_messages": batch.has_flag(FLAG_CAPS),
+            "urls_shared": batch.url_counts(),
+        }
+        totals = {
+            key: np.bincount(codes, weights=column[mask].astype(np.float64),
+                             minlength=len(batch.senders)).astype(np.int64).tolist()
+            for key, column in columns.items()
+        }
+        for code, count in _counts_in_order(codes):
+            stats = self.user_stats[batch.senders[code]]
+            stats["message_count"] += count
+            for key in USER_TOTALS:
+                stats[key] += totals[key][code]
+
+    def finalize(self) -> Dict:
+        for stats in self.user_stats.values():
             if stats["message_count"] > 0:
                 stats["average_message_length"] = stats["word_count"] / stats["message_count"]
-                logger.debug(f"User {user} average message length: {stats['average_message_length']:.2f}")
+        return dict(self.user_stats)
 
-        logger.info("User activity analysis completed successfully")
-        return dict(user_stats)
-        
-    except Exception as e:
-        logger.error(f"Error analyzing user activity: {str(e)}", exc_info=True)
-        raise
 
-def analyze_time_patterns(messages: List[Dict]) -> Dict:
-    logger.info("Starting time pattern analysis")
-    
-    try:
-        hour_activity = Counter(msg["hour"] for msg in messages)
-        logger.debug(f"Hourly activity distribution: {dict(hour_activity)}")
-        
-        day_activity = Counter(msg["day_of_week"] for msg in messages)
-        logger.debug(f"Daily activity distribution: {dict(day_activity)}")
-        
-        response_times = []
-        prev_msg = None
-        
-        for idx, msg in enumerate(messages):
-            if prev_msg and msg["sender"] and prev_msg["sender"]:
-                if msg["sender"] != prev_msg["sender"]:
-                    time_diff = (datetime.fromisoformat(msg["timestamp"]) - 
-                               datetime.fromisoformat(prev_msg["timestamp"]))
-                    if time_diff <= timedelta(hours=1):
-                        response_times.append(time_diff.total_seconds())
-                        logger.debug(f"Response time at message {idx}: {time_diff.total_seconds():.2f} seconds")
-            prev_msg = msg
-        
-        logger.debug(f"Collected {len(response_times)} valid response times")
-        
-        avg_response_time = np.mean(response_times) if response_times else 0
-        logger.debug(f"Average response time: {avg_response_time:.2f} seconds")
-        
-        result = {
-            "hourly_activity": dict(hour_activity),
-            "daily_activity": dict(day_activity),
-            "peak_hour": hour_activity.most_common(1)[0][0],
-            "peak_day": day_activity.most_common(1)[0][0],
-            "average_response_time_seconds": avg_response_time,
+class TimePatternsAccumulator(Accumulator):
+    def __init__(self):
+        self.hour_activity = Counter()
+        self.day_activity = Counter()
+        self.response_times = []
+        self.prev_timestamp = None
+        self.prev_sender = None
+
+    def update(self, batch: MessageTable) -> None:
+        for hour, count in _counts_in_order(_hours(batch)):
+            self.hour_activity[hour] += count
+        for day, count in _counts_in_order(batch.days_of_week()):
+            self.day_activity[day] += count
+
+        gaps, changes = adjacent_pairs(batch, self.prev_timestamp, self.prev_sender)
+        replies = changes & (gaps <= RESPONSE_WINDOW_SECONDS)
+        self.response_times.append(gaps[replies].astype(np.float64))
+
+        self.prev_timestamp = batch.timestamps[-1]
+        self.prev_sender = batch.sender_codes[-1]
+
+    def finalize(self) -> Dict:
+        response_times = np.concatenate(self.response_times) if self.response_times else np.empty(0)
+        has_responses = len(response_times) > 0
+        return {
+            "hourly_activity": dict(self.hour_activity),
+            "daily_activity": dict(self.day_activity),
+            "peak_hour": self.hour_activity.most_common(1)[0][0],
+            "peak_day": self.day_activity.most_common(1)[0][0],
+            "average_response_time_seconds": np.mean(response_times) if has_responses else 0,
             "response_time_distribution": {
-                "min": min(response_times) if response_times else 0,
-                "max": max(response_times) if response_times else 0,
-                "median": np.median(response_times) if response_times else 0
+                "min": float(response_times.min()) if has_responses else 0,
+                "max": float(response_times.max()) if has_responses else 0,
+                "median": np.median(response_times) if has_responses else 0
             }
         }
-        
-        logger.info("Time pattern analysis completed successfully")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing time patterns: {str(e)}", exc_info=True)
-        raise
 
-def analyze_content(messages: List[Dict]) -> Dict:
-    logger.info("Starting content analysis")
-    
-    try:
-        words = []
-        emoji_stats = Counter()
-        domains = []
-        
-        for idx, msg in enumerate(messages):
-            logger.debug(f"Processing message {idx} content")
-            
-            if msg["type"] == "normal":
-                msg_words = re.findall(r'\w+', msg["content"].lower())
-                words.extend(msg_words)
-                logger.debug(f"Added {len(msg_words)} words from message {idx}")
-                
-            emoji_count = len(msg["emojis"])
-            if emoji_count > 0:
-                emoji_stats.update(msg["emojis"])
-                logger.debug(f"Added {emoji_count} emojis from message {idx}")
-                
-            for url in msg["urls"]:
-                try:
-                    domain = re.findall(r'https?://(?:www\.)?([^/]+)', url)[0]
-                    domains.append(domain)
-                    logger.debug(f"Extracted domain from URL in message {idx}: {domain}")
-                except Exception as e:
-                    logger.warning(f"Failed to extract domain from URL in message {idx}: {str(e)}")
-                    continue
-        
-        word_freq = Counter(words).most_common(50)
-        logger.debug(f"Found {len(word_freq)} most common words")
-        
-        emoji_freq = emoji_stats.most_common(20)
-        logger.debug(f"Found {len(emoji_freq)} most common emojis")
-        
-        domain_freq = Counter(domains).most_common(10)
-        logger.debug(f"Found {len(domain_freq)} most common domains")
-        
+
+class ContentAccumulator(Accumulator):
+    """
+    Word, emoji and domain frequencies. In "sketch" frequency mode the words
+    are tokenized batch by batch straight into the summary, so the shared
+    features (and their vocabulary of the whole chat) are not built for
+    this analysis; they are still read when another analysis needs them.
+    """
+
+    def __init__(self, mode: str = FREQUENCY_MODE, capacity: Optional[int] = None):
+        self.uses_features = mode != "sketch"
+        self.words = frequency_counter(mode, capacity)
+        self.emoji_stats = frequency_counter(mode, capacity)
+        self.domains = frequency_counter(mode, capacity)
+
+    def update(self, batch: MessageTable) -> None:
+        self.words.add_counts(term_counts(batch))
+        self.emoji_stats.add_counts(Counter(batch.batch_emojis()).items())
+        domains = Counter()
+        for url in batch.batch_urls():
+            try:
+                domains[DOMAIN_PATTERN.findall(url)[0]] += 1
+            except Exception as e:
+                logger.warning(f"Failed to extract domain from URL {url!r}: {str(e)}")
+        self.domains.add_counts(domains.items())
+
+    def finalize(self) -> Dict:
         result = {
-            "word_frequency": dict(word_freq),
-            "emoji_frequency": dict(emoji_freq),
-            "shared_domains": dict(domain_freq)
+            "word_frequency": dict(self.words.most_common(50)),
+            "emoji_frequency": dict(self.emoji_stats.most_common(20)),
+            "shared_domains": dict(self.domains.most_common(10))
         }
-        
-        logger.info("Content analysis completed successfully")
+        if isinstance(self.words, HeavyHitters):
+            result["frequency_bounds"] = {
+                "word_frequency": self.words.bounds(),
+                "emoji_frequency": self.emoji_stats.bounds(),
+                "shared_domains": self.domains.bounds(),
+            }
         return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing content: {str(e)}", exc_info=True)
-        raise
 
-def analyze_sentiment(messages: List[Dict]) -> Dict:
-    logger.info("Starting sentiment analysis")
-    
-    try:
-        user_sentiment = defaultdict(list)
-        overall_sentiment = []
-        
-        for idx, msg in enumerate(messages):
-            if msg["type"] != "normal" or not msg["content"]:
-                logger.debug(f"Skipping message {idx}: not normal type or no content")
-                continue
-                
-            try:
-                sentiment = TextBlob(msg["content"]).sentiment.polarity
-                logger.debug(f"Message {idx} sentiment: {sentiment:.3f}")
-                
-                if msg["sender"]:
-                    user_sentiment[msg["sender"]].append(sentiment)
-                overall_sentiment.append(sentiment)
-                
-            except Exception as e:
-                logger.warning(f"Failed to analyze sentiment for message {idx}: {str(e)}")
+
+class SentimentAccumulator(Accumulator):
+    def __init__(self, scorer: SentimentScorer = None):
+        self.scorer = scorer or get_scorer()
+        self.user_sentiment = defaultdict(list)
+        self.overall_sentiment = []
+
+    def __getstate__(self):
+        # The scorer and its cache are shared by the process; saved state
+        # picks the default one back up when it is loaded
+        state = dict(self.__dict__)
+        del state["scorer"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.scorer = get_scorer()
+
+    def update(self, batch: MessageTable) -> None:
+        rows = np.flatnonzero(batch.is_type("normal") & (batch.content_lengths() > 0))
+        scores = self.scorer.score_many(list(batch.iter_content(rows)))
+        for sentiment, sender in zip(scores, batch.sender_names(rows)):
+            if sentiment is None:
                 continue
-        
+            if sender:
+                self.user_sentiment[sender].append(sentiment)
+            self.overall_sentiment.append(sentiment)
+
+    def finalize(self) -> Dict:
+        logger.debug("Sentiment scoring: %s", self.scorer.stats())
         avg_user_sentiment = {}
-        for user, sentiments in user_sentiment.items():
-            logger.debug(f"Calculating sentiment stats for user: {user}")
+        for user, sentiments in self.user_sentiment.items():
             avg_user_sentiment[user] = {
                 "average": np.mean(sentiments),
                 "std": np.std(sentiments),
                 "min": min(sentiments),
                 "max": max(sentiments)
             }
-            logger.debug(f"User {user} sentiment stats: {avg_user_sentiment[user]}")
-        
-        result = {
+        overall_sentiment = self.overall_sentiment
+        return {
             "overall_sentiment": {
                 "average": np.mean(overall_sentiment) if overall_sentiment else 0,
                 "std": np.std(overall_sentiment) if overall_sentiment else 0
             },
             "user_sentiment": avg_user_sentiment
         }
-        
-        logger.info("Sentiment analysis completed successfully")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing sentiment: {str(e)}", exc_info=True)
-        raise
 
 
-def analyze_burst_silence(messages):
-    logger.info("Starting burst and silence analysis")
-    
-    try:
-        burst_periods = []
-        silence_periods = []
-        prev_time = None
-        
-        for idx, msg in enumerate(messages):
-            if prev_time:
-                time_diff = datetime.fromisoformat(msg['timestamp']) - datetime.fromisoformat(prev_time)
-                diff_seconds = time_diff.total_seconds()
-                
-                if time_diff < timedelta(minutes=5):
-                    burst_periods.append(diff_seconds)
-                    logger.debug(f"Recorded burst period at message {idx}: {diff_seconds:.2f} seconds")
-                else:
-                    silence_periods.append(diff_seconds)
-                    logger.debug(f"Recorded silence period at message {idx}: {diff_seconds:.2f} seconds")
-            
-            prev_time = msg['timestamp']
-        
-        logger.debug(f"Found {len(burst_periods)} burst periods and {len(silence_periods)} silence periods")
-        
-        result = {
-            'burst_avg': np.mean(burst_periods) if burst_periods else 0,
-            'silence_avg': np.mean(silence_periods) if silence_periods else 0
+class BurstSilenceAccumulator(Accumulator):
+    def __init__(self):
+        self.burst_total = 0
+        self.burst_count = 0
+        self.silence_total = 0
+        self.silence_count = 0
+        self.prev_timestamp = None
+        self.prev_sender = None
+
+    def update(self, batch: MessageTable) -> None:
+        gaps, _ = adjacent_pairs(batch, self.prev_timestamp, self.prev_sender)
+        bursts = gaps < BURST_WINDOW_SECONDS
+        self.burst_total += int(gaps[bursts].sum())
+        self.burst_count += int(np.count_nonzero(bursts))
+        self.silence_total += int(gaps[~bursts].sum())
+        self.silence_count += int(len(gaps) - np.count_nonzero(bursts))
+        self.prev_timestamp = batch.timestamps[-1]
+        self.prev_sender = batch.sender_codes[-1]
+
+    def finalize(self) -> Dict:
+        return {
+            'burst_avg': _float_mean(self.burst_total, self.burst_count) if self.burst_count else 0,
+            'silence_avg': _float_mean(self.silence_total, self.silence_count) if self.silence_count else 0
         }
-        
-        logger.info("Burst and silence analysis completed successfully")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing burst and silence patterns: {str(e)}", exc_info=True)
-        raise
 
-def analyze_readability(messages):
-    logger.info("Starting readability analysis")
-    
-    try:
-        readability_scores = {}
-        
-        for idx, msg in enumerate(messages):
-            if msg['type'] == 'normal' and msg['content']:
-                try:
-                    words = msg['content'].split()
-                    sentences = max(1, msg['content'].count('.'))
-                    score = (0.39 * len(words) / sentences) + (11.8 * sum(map(len, words)) / max(1, len(words))) - 15.59
-                    
-                    readability_scores[msg['sender']] = readability_scores.get(msg['sender'], []) + [score]
-                    logger.debug(f"Message {idx} readability score: {score:.2f}")
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to calculate readability for message {idx}: {str(e)}")
-                    continue
-        
-        result = {user: np.mean(scores) for user, scores in readability_scores.items()}
-        logger.debug(f"Calculated average readability scores for {len(result)} users")
-        
-        logger.info("Readability analysis completed successfully")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing readability: {str(e)}", exc_info=True)
-        raise
 
-def analyze_interactions(messages):
-    logger.info("Starting interaction analysis")
-    
-    try:
-        interactions = {}  # Changed from defaultdict to regular dict
-        prev_sender = None
-        
-        for idx, msg in enumerate(messages):
-            if msg['sender'] and prev_sender and msg['sender'] != prev_sender:
-                # Create a string key instead of tuple
-                interaction_key = f"{prev_sender}:{msg['sender']}"
-                interactions[interaction_key] = interactions.get(interaction_key, 0) + 1
-                logger.debug(f"Recorded interaction: {interaction_key}")
-            prev_sender = msg['sender']
-        
-        logger.debug(f"Found {len(interactions)} unique interaction pairs")
-        
-        # Convert to a format that's JSON-serializable
-        result = {
+class SessionsAccumulator(Accumulator):
+    """
+    Splits the chat into conversations at gaps longer than `idle_seconds`,
+    from the adjacent-message gaps shared with time_patterns and
+    burst_silence, in one linear pass. Reports the conversations' count,
+    length and duration and who starts them, reply latency percentiles per
+    participant (a reply being a message from someone other than the
+    previous sender in the same conversation), and runs of messages less
+    than `burst_seconds` apart.
+    """
+
+    def __init__(self, idle_seconds: int = SESSION_IDLE_SECONDS, burst_seconds: int = BURST_WINDOW_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.burst_seconds = burst_seconds
+        self.senders = []
+        self.prev_timestamp = None
+        self.prev_sender = None
+        # Finished conversations: message counts and durations, per batch
+        self.session_messages = []
+        self.session_seconds = []
+        # The conversation still open: [first timestamp, last timestamp, messages]
+        self.current = None
+        self.starters = Counter()
+        self.reply_senders = []
+        self.reply_latencies = []
+        self.in_burst = False
+        self.bursts = 0
+        self.burst_messages = 0
+        self.burst_gap_total = 0
+        self.silences = 0
+        self.silence_total = 0
+        self.longest_silence = 0
+
+    def update(self, batch: MessageTable) -> None:
+        timestamps, codes = batch.timestamps, batch.sender_codes
+        gaps, changes = adjacent_pairs(batch, self.prev_timestamp, self.prev_sender)
+        # The gaps lead into messages[offset:]; the chat's first message has none
+        offset = len(batch) - len(gaps)
+        self.senders = batch.senders
+
+        idle = gaps > self.idle_seconds
+        starts = np.flatnonzero(idle) + offset
+        if offset:
+            starts = np.concatenate(([0], starts))
+        self._update_sessions(timestamps, starts)
+        starters = codes[starts]
+        for code, count in _counts_in_order(starters[starters >= 0]):
+            self.starters[batch.senders[code]] += count
+
+        replies = changes & ~idle
+        self.reply_senders.append(codes[offset:][replies])
+        self.reply_latencies.append(gaps[replies].astype(np.int32))
+
+        burst = gaps < self.burst_seconds
+        began = burst & ~np.concatenate(([self.in_burst], burst[:-1]))
+        self.bursts += int(np.count_nonzero(began))
+        # A burst's messages: the one it starts from, and one per close gap
+        self.burst_messages += int(np.count_nonzero(began) + np.count_nonzero(burst))
+        self.burst_gap_total += int(gaps[burst].sum())
+        if len(burst):
+            self.in_burst = bool(burst[-1])
+        self.silences += int(np.count_nonzero(idle))
+        self.silence_total += int(gaps[idle].sum())
+        if idle.any():
+            self.longest_silence = max(self.longest_silence, int(gaps[idle].max()))
+
+        self.prev_timestamp = int(timestamps[-1])
+        self.prev_sender = int(codes[-1])
+
+    def _update_sessions(self, timestamps: np.ndarray, starts: np.ndarray) -> None:
+        if not len(starts):
+            self.current[1] = int(timestamps[-1])
+            self.current[2] += len(timestamps)
+            return
+        first = int(starts[0])
+        if self.current is not None:
+            if first:
+                self.current[1] = int(timestamps[first - 1])
+                self.current[2] += first
+            self._close(self.current[2], self.current[1] - self.current[0])
+        ends = starts[1:] - 1
+        self.session_messages.append(np.diff(starts))
+        self.session_seconds.append(timestamps[ends] - timestamps[starts[:-1]])
+        last = int(starts[-1])
+        self.current = [int(timestamps[last]), int(timestamps[-1]), len(timestamps) - last]
+
+    def _close(self, messages: int, seconds: int) -> None:
+        self.session_messages.append(np.array([messages]))
+        self.session_seconds.append(np.array([seconds]))
+
+    def finalize(self) -> Dict:
+        # Saved states are resumed after finalize, so the open conversation
+        # is counted here without being closed
+        messages, seconds = list(self.session_messages), list(self.session_seconds)
+        if self.current is not None:
+            messages.append(np.array([self.current[2]]))
+            seconds.append(np.array([self.current[1] - self.current[0]]))
+        messages = np.concatenate(messages) if messages else np.empty(0, np.int64)
+        seconds = np.concatenate(seconds) if seconds else np.empty(0, np.int64)
+        senders = np.concatenate(self.reply_senders) if self.reply_senders else np.empty(0, np.int32)
+        latencies = np.concatenate(self.reply_latencies) if self.reply_latencies else np.empty(0, np.int32)
+
+        overall = grouped_percentiles(np.zeros(len(latencies), np.int32), latencies).get(0, {"count": 0})
+        per_user = {self.senders[code]: stats for code, stats in grouped_percentiles(senders, latencies).items()}
+        starters = self.starters.most_common()
+        total_starts = sum(self.starters.values())
+        return {
+            "idle_threshold_seconds": self.idle_seconds,
+            "sessions": {
+                "count": len(messages),
+                "messages": summarize(messages),
+                "duration_seconds": summarize(seconds),
+            },
+            "conversation_starters": [
+                {"user": user, "count": count, "share": count / total_starts} for user, count in starters
+            ],
+            "reply_latency": {"overall": overall, "per_user": per_user},
+            "bursts": {
+                "window_seconds": self.burst_seconds,
+                "count": self.bursts,
+                "average_messages": self.burst_messages / self.bursts if self.bursts else 0,
+                "average_gap_seconds": (self.burst_gap_total / (self.burst_messages - self.bursts)
+                                        if self.bursts else 0),
+            },
+            "silences": {
+                "count": self.silences,
+                "average_seconds": self.silence_total / self.silences if self.silences else 0,
+                "longest_seconds": self.longest_silence,
+            },
+        }
+
+
+class ReadabilityAccumulator(Accumulator):
+    uses_features = True
+
+    def __init__(self):
+        self.readability_scores = defaultdict(list)
+
+    def update(self, batch: MessageTable) -> None:
+        rows = np.flatnonzero(batch.is_type("normal") & (batch.content_lengths() > 0))
+        features = batch.features()
+        words = features.split_words[rows]
+        sentences = np.maximum(1, features.periods[rows])
+        scores = (0.39 * words / sentences) + (11.8 * features.split_characters[rows] / np.maximum(1, words)) - 15.59
+        for sender, score in zip(batch.sender_names(rows), scores.tolist()):
+            self.readability_scores[sender].append(score)
+
+    def finalize(self) -> Dict:
+        return {user: np.mean(scores) for user, scores in self.readability_scores.items()}
+
+
+class InteractionsAccumulator(Accumulator):
+    def __init__(self):
+        self.interactions = {}
+        self.prev_sender = None
+
+    def update(self, batch: MessageTable) -> None:
+        senders = _with_previous(self.prev_sender, batch.sender_codes).astype(np.int64)
+        prev, cur = senders[:-1], senders[1:]
+        replies = (prev >= 0) & (cur >= 0) & (prev != cur)
+        size = len(batch.senders)
+        for pair, count in _counts_in_order(prev[replies] * size + cur[replies]):
+            source, target = divmod(pair, size)
+            key = (batch.senders[source], batch.senders[target])
+            self.interactions[key] = self.interactions.get(key, 0) + count
+        self.prev_sender = batch.sender_codes[-1]
+
+    def finalize(self) -> Dict:
+        return {
             'interactions': [
-                {
-                    'source': key.split(':')[0],
-                    'target': key.split(':')[1],
-                    'count': count
-                }
-                for key, count in interactions.items()
+                {'source': source, 'target': target, 'count': count}
+                for (source, target), count in self.interactions.items()
             ]
         }
-        
-        logger.info("Interaction analysis completed successfully")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing interactions: {str(e)}", exc_info=True)
-        raise
 
-def analyze_network(messages):
-    logger.info("Starting network analysis")
-    
-    try:
-        G = nx.Graph()
-        
-        for idx, msg in enumerate(messages):
-            if msg['sender']:
-                for mentioned in msg.get('mentions', []):
-                    G.add_edge(msg['sender'], mentioned)
-                    logger.debug(f"Added edge: {msg['sender']} -> {mentioned}")
-        
-        logger.debug(f"Created network with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
-        
+
+class NetworkAccumulator(Accumulator):
+    def __init__(self, graph: str = NETWORK_GRAPH, mode: str = NETWORK_BETWEENNESS):
+        if graph not in NETWORK_GRAPHS:
+            raise ValueError(f"Unknown network graph: {graph}")
+        if mode not in BETWEENNESS_MODES:
+            raise ValueError(f"Unknown betweenness mode: {mode}")
+        import networkx as nx
+
+        self.source = graph
+        self.mode = mode
+        self.graph = nx.Graph()
+        self.replies = InteractionsAccumulator() if graph == "replies" else None
+
+    def update(self, batch: MessageTable) -> None:
+        if self.replies is not None:
+            self.replies.update(batch)
+            return
+        rows = np.flatnonzero(batch.has_sender() & (batch.mention_counts() > 0))
+        for row, sender in zip(rows.tolist(), batch.sender_names(rows)):
+            for mentioned in batch.mentions_at(row):
+                self.graph.add_edge(sender, mentioned)
+
+    def finalize(self) -> Dict:
+        if self.replies is not None:
+            degree, between, info = reply_centrality(self.replies.interactions, self.mode)
+            return {
+                'degree_centrality': [{'user': user, 'centrality': value} for user, value in degree.items()],
+                'betweenness_centrality': [{'user': user, 'centrality': value} for user, value in between.items()],
+                'centrality_mode': {'graph': self.source, **info}
+            }
+
+        import networkx as nx
+
+        G = self.graph
+        logger.debug("Created network with %d nodes and %d edges", G.number_of_nodes(), G.number_of_edges())
+
         try:
-            degree_cent = nx.degree_centrality(G)
-            # Convert to list of objects for better serialization
             degree_centrality = [
                 {'user': user, 'centrality': value}
-                for user, value in degree_cent.items()
+                for user, value in nx.degree_centrality(G).items()
             ]
-            logger.debug(f"Calculated degree centrality for {len(degree_centrality)} nodes")
         except Exception as e:
             logger.warning(f"Failed to calculate degree centrality: {str(e)}")
             degree_centrality = []
-            
+
+        info = {}
         try:
-            between_cent = nx.betweenness_centrality(G)
-            # Convert to list of objects for better serialization
+            values, info = betweenness(G, self.mode)
             betweenness_centrality = [
                 {'user': user, 'centrality': value}
-                for user, value in between_cent.items()
+                for user, value in values.items()
             ]
-            logger.debug(f"Calculated betweenness centrality for {len(betweenness_centrality)} nodes")
         except Exception as e:
             logger.warning(f"Failed to calculate betweenness centrality: {str(e)}")
             betweenness_centrality = []
-        
-        result = {
+
+        return {
             'degree_centrality': degree_centrality,
-            'betweenness_centrality': betweenness_centrality
+            'betweenness_centrality': betweenness_centrality,
+            'centrality_mode': {'graph': self.source, **info}
         }
-        
-        logger.info("Network analysis completed successfully")
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error in network analysis: {str(e)}", exc_info=True)
-        raise
-def analyze_topics(messages, num_topics=5):
-    logger.info(f"Starting topic analysis with {num_topics} topics")
-    
-    try:
-        content_list = [msg['content'] for msg in messages if msg['type'] == 'normal']
-        logger.debug(f"Collected {len(content_list)} messages for topic analysis")
-        
+
+
+class TopicsAccumulator(Accumulator):
+    uses_features = True
+
+    def __init__(self, num_topics=5, mode: str = TOPICS_MODE):
+        if mode not in ("exact", "scalable"):
+            raise ValueError(f"Unknown topics mode: {mode}")
+        self.num_topics = num_topics
+        self.mode = mode
+        self.documents = DocumentTerms()
+        self.timestamps = []
+
+    def update(self, batch: MessageTable) -> None:
+        rows = np.flatnonzero(batch.is_type("normal"))
+        self.documents.add(batch.features(), rows)
+        if self.mode == "scalable":
+            self.timestamps.append(batch.timestamps[rows])
+
+    def finalize(self) -> Dict:
+        from sklearn.decomposition import LatentDirichletAllocation
+
         try:
-            vectorizer = CountVectorizer(stop_words='english')
-            X = vectorizer.fit_transform(content_list)
-            logger.debug(f"Vectorized content with shape: {X.shape}")
-            
-            lda = LatentDirichletAllocation(n_components=num_topics, random_state=42)
+            X, feature_names = self.documents.build()
+            logger.debug("Vectorized content with shape: %s", X.shape)
+            if self.mode == "scalable":
+                timestamps = np.concatenate(self.timestamps)
+                return scalable_topics(X, feature_names, timestamps, self.num_topics)
+
+            lda = LatentDirichletAllocation(n_components=self.num_topics, random_state=42)
             lda.fit(X)
-            logger.debug("LDA model fitted successfully")
-            
-            feature_names = vectorizer.get_feature_names_out()
-            logger.debug(f"Extracted {len(feature_names)} features")
-            
-            topics = {}
-            for topic_idx, topic in enumerate(lda.components_):
-                top_words = [feature_names[i] for i in topic.argsort()[:-11:-1]]
-                topics[f'Topic {topic_idx+1}'] = top_words
-                logger.debug(f"Topic {topic_idx+1} top words: {', '.join(top_words)}")
-            
-            logger.info("Topic analysis completed successfully")
-            return topics
-            
+
+            return top_words(lda.components_, feature_names)
+
         except Exception as e:
             logger.error(f"Error in topic modeling: {str(e)}")
             return {}
-            
-    except Exception as e:
-        logger.error(f"Error in topic analysis: {str(e)}", exc_info=True)
-        raise
 
-def analyze_sleep_patterns(messages):
-    logger.info("Starting sleep pattern analysis")
-    
+
+class SleepPatternsAccumulator(Accumulator):
+    def __init__(self):
+        self.sleep_patterns = defaultdict(Counter)
+
+    def update(self, batch: MessageTable) -> None:
+        mask = batch.has_sender()
+        user_hours = batch.sender_codes[mask].astype(np.int64) * 24 + _hours(batch)[mask]
+        for pair, count in _counts_in_order(user_hours):
+            code, hour = divmod(pair, 24)
+            self.sleep_patterns[batch.senders[code]][hour] += count
+
+    def finalize(self) -> Dict:
+        return {
+            user: {'active_hours': dict(hour_counts)}
+            for user, hour_counts in self.sleep_patterns.items()
+        }
+
+
+class CodeSnippetsAccumulator(Accumulator):
+    def __init__(self):
+        self.code_snippet_count = defaultdict(int)
+
+    def update(self, batch: MessageTable) -> None:
+        rows = np.flatnonzero(batch.is_type("normal"))
+        for content, sender in zip(batch.iter_content(rows), batch.sender_names(rows)):
+            if any(token in content for token in CODE_INDICATORS):
+                self.code_snippet_count[sender] += 1
+
+    def finalize(self) -> Dict:
+        return dict(self.code_snippet_count)
+
+
+class StopwordsAccumulator(Accumulator):
+    """
+    The most common words. In "sketch" frequency mode these are counted with
+    the same summary as content_analysis's word_frequency, whose
+    frequency_bounds therefore apply to them too, and are tokenized per
+    batch like them.
+    """
+
+    def __init__(self, mode: str = FREQUENCY_MODE, capacity: Optional[int] = None):
+        self.uses_features = mode != "sketch"
+        self.word_counts = frequency_counter(mode, capacity)
+
+    def update(self, batch: MessageTable) -> None:
+        self.word_counts.add_counts(term_counts(batch))
+
+    def finalize(self) -> Dict:
+        return dict(self.word_counts.most_common(50))
+
+
+# Every analysis in the complete report, in output order. Each entry builds a
+# fresh accumulator; `generate_complete_analysis` drives all of them from a
+# single pass over the messages.
+ANALYSIS_ACCUMULATORS = {
+    "basic_stats": BasicStatsAccumulator,
+    "user_activity": UserActivityAccumulator,
+    "time_patterns": TimePatternsAccumulator,
+    "content_analysis": ContentAccumulator,
+    "sentiment_analysis": SentimentAccumulator,
+    'interactions': InteractionsAccumulator,
+    'burst_silence': BurstSilenceAccumulator,
+    'readability': ReadabilityAccumulator,
+    'network_analysis': NetworkAccumulator,
+    'topics': TopicsAccumulator,
+    'sleep_patterns': SleepPatternsAccumulator,
+    'code_snippets': CodeSnippetsAccumulator,
+    'stopwords': StopwordsAccumulator,
+    'sessions': SessionsAccumulator
+}
+
+
+def select_analyses(include: Optional[Iterable[str]] = None,
+                    exclude: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Names of the analyses to run, in report order: those in `include` (all
+    of them when it is None) minus those in `exclude`. Work shared between
+    analyses, such as the word lists, is only done when a selected analysis
+    asks for it.
+    """
+    include = set(ANALYSIS_ACCUMULATORS) if include is None else set(include)
+    exclude = set(exclude or ())
+    unknown = sorted((include | exclude) - set(ANALYSIS_ACCUMULATORS))
+    if unknown:
+        raise ValueError(f"Unknown analyses: {', '.join(unknown)}")
+    return [name for name in ANALYSIS_ACCUMULATORS if name in include and name not in exclude]
+
+
+def is_complete_selection(analyses: Optional[List[str]]) -> bool:
+    return analyses is None or len(analyses) == len(ANALYSIS_ACCUMULATORS)
+
+
+def as_table(messages: Messages) -> MessageTable:
+    if isinstance(messages, MessageTable):
+        return messages
+    return MessageTable.from_messages(messages)
+
+
+def _run_analysis(name: str, accumulator: Accumulator, messages: Messages):
+    logger.info(f"Starting {name} analysis for {len(messages)} messages")
+
     try:
-        sleep_patterns = defaultdict(list)
-        
-        for idx, msg in enumerate(messages):
-            if msg['sender']:
-                try:
-                    hour = datetime.fromisoformat(msg['timestamp']).hour
-                    sleep_patterns[msg['sender']].append(hour)
-                    logger.debug(f"Recorded activity hour {hour} for user {msg['sender']}")
-                except Exception as e:
-                    logger.warning(f"Failed to process timestamp for message {idx}: {str(e)}")
-                    continue
-        
-        result = {}
-        for user, hours in sleep_patterns.items():
-            hour_counts = Counter(hours)
-            logger.debug(f"User {user} active hours distribution: {dict(hour_counts)}")
-            result[user] = {'active_hours': dict(hour_counts)}
-        
-        logger.info("Sleep pattern analysis completed successfully")
+        result = run_accumulator(accumulator, as_table(messages))
+        logger.info(f"Completed {name} analysis successfully")
         return result
-        
+
     except Exception as e:
-        logger.error(f"Error analyzing sleep patterns: {str(e)}", exc_info=True)
+        logger.error(f"Error in {name} analysis: {str(e)}", exc_info=True)
         raise
 
+
+def compute_basic_stats(messages: Messages) -> Dict:
+    return _run_analysis("basic_stats", BasicStatsAccumulator(), messages)
+
+def analyze_user_activity(messages: Messages) -> Dict:
+    return _run_analysis("user_activity", UserActivityAccumulator(), messages)
+
+def analyze_time_patterns(messages: Messages) -> Dict:
+    return _run_analysis("time_patterns", TimePatternsAccumulator(), messages)
+
+def analyze_content(messages: Messages, mode: str = FREQUENCY_MODE) -> Dict:
+    return _run_analysis("content_analysis", ContentAccumulator(mode), messages)
+
+def analyze_sentiment(messages: Messages) -> Dict:
+    return _run_analysis("sentiment_analysis", SentimentAccumulator(), messages)
+
+def analyze_burst_silence(messages):
+    return _run_analysis("burst_silence", BurstSilenceAccumulator(), messages)
+
+def analyze_readability(messages):
+    return _run_analysis("readability", ReadabilityAccumulator(), messages)
+
+def analyze_interactions(messages):
+    return _run_analysis("interactions", InteractionsAccumulator(), messages)
+
+def analyze_network(messages, graph: str = NETWORK_GRAPH, mode: str = NETWORK_BETWEENNESS):
+    return _run_analysis("network_analysis", NetworkAccumulator(graph, mode), messages)
+
+def analyze_topics(messages, num_topics=5, mode: str = TOPICS_MODE):
+    return _run_analysis("topics", TopicsAccumulator(num_topics, mode), messages)
+
+def analyze_sleep_patterns(messages):
+    return _run_analysis("sleep_patterns", SleepPatternsAccumulator(), messages)
+
 def analyze_code_snippets(messages):
-    logger.info("Starting code snippet analysis")
-    
-    try:
-        code_snippet_count = defaultdict(int)
-        code_indicators = ['```', 'def ', 'class ', '#include', 'import ', 'console.log']
-        
-        for idx, msg in enumerate(messages):
-            if msg['type'] == 'normal':
-                if any(token in msg['content'] for token in code_indicators):
-                    code_snippet_count[msg['sender']] += 1
-                    logger.debug(f"Found code snippet in message {idx} from {msg['sender']}")
-        
-        logger.debug(f"Found code snippets from {len(code_snippet_count)} users")
-        
-        logger.info("Code snippet analysis completed successfully")
-        return dict(code_snippet_count)
-        
-    except Exception as e:
-        logger.error(f"Error analyzing code snippets: {str(e)}", exc_info=True)
-        raise
+    return _run_analysis("code_snippets", CodeSnippetsAccumulator(), messages)
 
-def analyze_stopwords(messages):
-    logger.info("Starting stopword analysis")
-    
-    try:
-        word_counts = Counter()
-        
-        for idx, msg in enumerate(messages):
-            if msg['type'] == 'normal':
-                try:
-                    words = re.findall(r'\w+', msg['content'].lower())
-                    word_counts.update(words)
-                    logger.debug(f"Processed {len(words)} words from message {idx}")
-                except Exception as e:
-                    logger.warning(f"Failed to process words in message {idx}: {str(e)}")
-                    continue
-        
-        most_common = dict(word_counts.most_common(50))
-        logger.debug(f"Found {len(most_common)} most common words")
-        
-        logger.info("Stopword analysis completed successfully")
-        return most_common
-        
-    except Exception as e:
-        logger.error(f"Error analyzing stopwords: {str(e)}", exc_info=True)
-        raise
+def analyze_stopwords(messages, mode: str = FREQUENCY_MODE):
+    return _run_analysis("stopwords", StopwordsAccumulator(mode), messages)
+
+def analyze_sessions(messages, idle_seconds: int = SESSION_IDLE_SECONDS):
+    return _run_analysis("sessions", SessionsAccumulator(idle_seconds), messages)
+
+def generate_complete_analysis(messages: Messages, mode: str = EXECUTOR_MODE,
+                               on_result: Optional[ResultCallback] = None,
+                               timings: Optional[Dict[str, float]] = None,
+                               analyses: Optional[List[str]] = None) -> Dict:
+    """Run every analysis, or only `analyses` (see `select_analyses`), over the messages."""
+    logger.info(f"Starting complete analysis for {len(messages)} messages ({mode} executor)")
 
-def generate_complete_analysis(messages: List[Dict]) -> Dict:
-    logger.info(f"Starting complete analysis for {len(messages)} messages")
-    
+    factories = ANALYSIS_ACCUMULATORS
+    if analyses is not None:
+        factories = {name: ANALYSIS_ACCUMULATORS[name] for name in analyses}
     try:
-        result = {}
-        
-        analysis_functions = {
-            "basic_stats": compute_basic_stats,
-            "user_activity": analyze_user_activity,
-            "time_patterns": analyze_time_patterns,
-            "content_analysis": analyze_content,
-            "sentiment_analysis": analyze_sentiment,
-            'interactions': analyze_interactions,
-            'burst_silence': analyze_burst_silence,
-            'readability': analyze_readability,
-            'network_analysis': analyze_network,
-            'topics': analyze_topics,
-            'sleep_patterns': analyze_sleep_patterns,
-            'code_snippets': analyze_code_snippets,
-            'stopwords': analyze_stopwords
-        }
-        
-        for analysis_name, analysis_func in analysis_functions.items():
-            try:
-                logger.debug(f"Running {analysis_name} analysis")
-                result[analysis_name] = analysis_func(messages)
-                logger.debug(f"Completed {analysis_name} analysis successfully")
-            except Exception as e:
-                logger.error(f"Error in {analysis_name} analysis: {str(e)}")
-                result[analysis_name] = None
-        
+        result = run_analyses(as_table(messages), factories, mode, on_result=on_result, timings=timings)
         logger.info("Complete analysis generated successfully")
         return result
-        
+
     except Exception as e:
         logger.error(f"Error generating complete analysis: {str(e)}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,221 @@
+import logging
+import os
+import time
+import zipfile
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .analytics import ANALYSIS_ACCUMULATORS, USER_TOTALS, ContentAccumulator, UserActivityAccumulator
+from .engine import run_accumulators
+from .exports import EXPORT_SUFFIX, ExportNotFound, chat_member, parse_path, parse_zip
+from .sketches import HeavyHitters, frequency_counter
+
+logger = logging.getLogger(__name__)
+
+# Processes analyzing chats of a batch, and how many chats each analyzes
+# before it is replaced, which returns the memory a large chat left behind
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+BATCH_TASKS_PER_WORKER = int(os.environ.get("BATCH_TASKS_PER_WORKER", 50))
+# Chats handed to the pool ahead of the ones finished. Bounds how many parsed
+# chats and results exist at once, however many exports the batch has.
+BATCH_MAX_PENDING = int(os.environ.get("BATCH_MAX_PENDING", 2 * BATCH_WORKERS))
+# Entries of each merged frequency in the batch summary
+BATCH_TOP_TERMS = int(os.environ.get("BATCH_TOP_TERMS", 100))
+
+# (name, path, zip member or None) of one export
+ExportSource = Tuple[str, str, Optional[str]]
+ChatCallback = Callable[[Dict], None]
+
+
+def _zip_exports(path: str) -> Iterator[ExportSource]:
+    with zipfile.ZipFile(path) as archive:
+        for member in sorted(archive.namelist()):
+            if member.lower().endswith(EXPORT_SUFFIX) and not member.startswith("__MACOSX/"):
+                yield member, path, member
+
+
+def iter_exports(path: str) -> Iterator[ExportSource]:
+    """
+    The exports of a batch: the .txt files of a zip, or those under a
+    directory, where each .zip is taken for WhatsApp's "export chat" zip
+    and contributes its chat (see exports.chat_member).
+    """
+    if zipfile.is_zipfile(path) and not os.path.isdir(path):
+        yield from _zip_exports(path)
+        return
+    for root, directories, files in os.walk(path):
+        directories.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            relative = os.path.relpath(full, path)
+            if name.lower().endswith(EXPORT_SUFFIX):
+                yield relative, full, None
+            elif name.lower().endswith(".zip") and zipfile.is_zipfile(full):
+                try:
+                    with zipfile.ZipFile(full) as archive:
+                        member = chat_member(archive).filename
+                except ExportNotFound:
+                    logger.warning(f"Skipping {relative}: no chat export in it")
+                    continue
+                yield f"{relative}:{member}", full, member
+
+
+def analyze_export(source: ExportSource, analyses: Optional[List[str]] = None) -> Dict:
+    """
+    Parse and analyze one export; runs in a batch worker process. Besides
+    the chat's report this returns the full word, emoji and domain counts
+    and per-participant totals the batch merges, which the analysis results
+    only carry the top entries of.
+    """
+    name, path, member = source
+    started = time.perf_counter()
+    report = {"name": name}
+    try:
+        table = parse_path(path) if member is None else parse_zip(path, member)
+        if not len(table):
+            raise ValueError("No messages found in chat")
+
+        names = list(ANALYSIS_ACCUMULATORS) if analyses is None else analyses
+        accumulators = {name: ANALYSIS_ACCUMULATORS[name]() for name in names}
+        content = accumulators.setdefault("content_analysis", ContentAccumulator())
+        activity = accumulators.setdefault("user_activity", UserActivityAccumulator())
+        results = run_accumulators(table, accumulators)
+
+        report["messages"] = len(table)
+        report["result"] = {name: results[name] for name in names}
+        # The merged counts come from these two; a chat missing either
+        # is reported as failed rather than merged in part
+        missing = [name for name in ("content_analysis", "user_activity") if results[name] is None]
+        if missing:
+            raise ValueError(f"Failed to compute {', '.join(missing)}")
+        totals = {
+            "words": content.words,
+            "emojis": content.emoji_stats,
+            "domains": content.domains,
+            "participants": results["user_activity"],
+        }
+    except Exception as e:
+        logger.warning(f"Failed to analyze {name}: {e}")
+        report["error"] = str(e)
+        totals = None
+    report["seconds"] = time.perf_counter() - started
+    return {"report": report, "totals": totals}
+
+
+class BatchAggregate:
+    """
+    Merged counts of every chat of a batch, with participants matched by
+    name across chats. In "sketch" frequency mode the merged frequencies are
+    heavy-hitter summaries too, whose error bounds add up over the chats.
+    """
+
+    def __init__(self):
+        self.words = frequency_counter()
+        self.emojis = frequency_counter()
+        self.domains = frequency_counter()
+        self.participants = defaultdict(Counter)
+
+    def add(self, totals: Dict) -> None:
+        self.words.merge(totals["words"])
+        self.emojis.merge(totals["emojis"])
+        self.domains.merge(totals["domains"])
+        for participant, stats in totals["participants"].items():
+            merged = self.participants[participant]
+            merged["chats"] += 1
+            merged["message_count"] += stats["message_count"]
+            for key in USER_TOTALS:
+                merged[key] += stats[key]
+
+    def report(self, top: int = BATCH_TOP_TERMS) -> Dict:
+        participants = {}
+        for participant, stats in sorted(self.participants.items(), key=lambda item: -item[1]["message_count"]):
+            participants[participant] = dict(stats)
+            participants[participant]["average_message_length"] = (
+                stats["word_count"] / stats["message_count"] if stats["message_count"] else 0)
+        report = {
+            "word_frequency": dict(self.words.most_common(top)),
+            "emoji_frequency": dict(self.emojis.most_common(top)),
+            "shared_domains": dict(self.domains.most_common(top)),
+            "participants": participants,
+        }
+        if isinstance(self.words, HeavyHitters):
+            report["frequency_bounds"] = {
+                "word_frequency": self.words.bounds(),
+                "emoji_frequency": self.emojis.bounds(),
+                "shared_domains": self.domains.bounds(),
+            }
+        return report
+
+
+def _batch_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=BATCH_TASKS_PER_WORKER or None)
+
+
+def run_batch(path: str, analyses: Optional[List[str]] = None, on_chat: Optional[ChatCallback] = None,
+              workers: int = BATCH_WORKERS, max_pending: int = BATCH_MAX_PENDING) -> Dict:
+    """
+    Analyze every export under `path` (see iter_exports) on a pool of
+    `workers` processes and return the batch summary: merged frequencies,
+    per-participant totals and throughput. Each chat's report is passed to
+    `on_chat` as soon as it is done, in completion order, and not kept.
+    A chat whose worker process dies is reported as failed like one that
+    raised, and the batch carries on.
+    """
+    started = time.perf_counter()
+    aggregate = BatchAggregate()
+    chats = failed = messages = 0
+    sources = iter_exports(path)
+
+    pool = _batch_pool(workers)
+    pending = {}  # future -> (source, the pool it went to, when it was submitted)
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max(1, max_pending):
+                source = next(sources, None)
+                if source is None:
+                    exhausted = True
+                else:
+                    pending[pool.submit(analyze_export, source, analyses)] = (source, pool, time.perf_counter())
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                source, submitted_to, submitted_at = pending.pop(future)
+                try:
+                    outcome = future.result()
+                except BrokenExecutor as e:
+                    # A worker died (e.g. killed for running out of memory). The
+                    # pool cannot tell which chat did it, so every chat in flight
+                    # fails with it; the rest of the batch goes to a new pool.
+                    logger.warning(f"Failed to analyze {source[0]}: worker process died ({e})")
+                    outcome = {"report": {"name": source[0], "error": f"Worker process died: {e}",
+                                          "seconds": time.perf_counter() - submitted_at},
+                               "totals": None}
+                    if submitted_to is pool:
+                        pool.shutdown(wait=False)
+                        pool = _batch_pool(workers)
+                report = outcome["report"]
+                chats += 1
+                if outcome["totals"] is None:
+                    failed += 1
+                else:
+                    messages += report["messages"]
+                    aggregate.add(outcome["totals"])
+                if on_chat is not None:
+                    on_chat(report)
+    finally:
+        pool.shutdown()
+
+    seconds = time.perf_counter() - started
+    logger.info(f"Batch of {chats} chats ({failed} failed, {messages} messages) analyzed in {seconds:.1f}s")
+    return {
+        "chats": chats,
+        "failed_chats": failed,
+        "messages": messages,
+        "seconds": seconds,
+        "chats_per_minute": chats / seconds * 60 if seconds else 0.0,
+        "messages_per_second": messages / seconds if seconds else 0.0,
+        "aggregates": aggregate.report(),
+    }
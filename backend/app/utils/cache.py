@@ -0,0 +1,343 @@
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .centrality import NETWORK_BETWEENNESS, NETWORK_EXACT_MAX_NODES, NETWORK_GRAPH, NETWORK_PIVOTS
+from .sessions import BURST_WINDOW_SECONDS, SESSION_IDLE_SECONDS
+from .sketches import FREQUENCY_MODE, FREQUENCY_SKETCH_SIZE
+from .table import MessageTable
+from .topics import TOPICS_MODE
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps results in this process, "disk" in RESULT_CACHE_DIR where
+# they survive restarts and are shared by workers; "off" disables caching
+RESULT_CACHE = os.environ.get("RESULT_CACHE", "memory")
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "chatviz-results"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", 24 * 3600))
+# Signs every file of the disk cache, which is only unpickled when its
+# signature matches. Unset, a random key is generated into the cache
+# directory on first use; set it to share a cache between hosts.
+RESULT_CACHE_KEY = os.environ.get("RESULT_CACHE_KEY", "")
+
+# Part of every key; bump it when a change to the analyses alters results
+RESULT_CACHE_VERSION = "4"
+# Settings that change results are part of the key as well
+RESULT_KEY_SEED = (
+    f"{RESULT_CACHE_VERSION}:topics={TOPICS_MODE}:network={NETWORK_GRAPH},"
+    f"{NETWORK_BETWEENNESS},{NETWORK_EXACT_MAX_NODES},{NETWORK_PIVOTS}:"
+    f"frequencies={FREQUENCY_MODE},{FREQUENCY_SKETCH_SIZE}:"
+    f"sessions={SESSION_IDLE_SECONDS},{BURST_WINDOW_SECONDS}"
+).encode()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SIGNING_KEY_FILE = "signing.key"
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+def upload_key(stream) -> str:
+    """Key for the raw bytes of an export. Reads `stream` to the end and rewinds it."""
+    digest = hashlib.sha256(RESULT_KEY_SEED)
+    while chunk := stream.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    stream.seek(0)
+    return f"upload-{digest.hexdigest()}"
+
+
+def table_key(table: MessageTable) -> str:
+    """Key for parsed messages, however they reached the server."""
+    digest = hashlib.sha256(RESULT_KEY_SEED)
+    digest.update(table.fingerprint().encode())
+    return f"table-{digest.hexdigest()}"
+
+
+def selection_key(key: str, analyses: List[str]) -> str:
+    """Key for the result of some of the analyses of the content behind `key`."""
+    return f"{key}-{'+'.join(analyses)}"
+
+
+class ResultCache:
+    """
+    Analysis results by content key, evicted least recently used first once
+    their pickled size passes `max_bytes`, and on lookup once older than
+    `ttl_seconds`.
+
+    This class keeps the index and the policy. Backends only store the
+    pickled bytes, through `_read`, `_write` and `_delete`; those shared
+    with other processes also find entries the index does not know yet
+    (`_adopt`) and resync it before evicting (`_refresh`).
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl_seconds: int = RESULT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.index = OrderedDict()  # key -> (stored_at, size), least recently used first
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _read(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _write(self, key: str, payload: bytes) -> None:
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _adopt(self, key: str) -> Optional[tuple]:
+        """(stored_at, size) of an entry stored behind this index's back, if any."""
+        return None
+
+    def _refresh(self) -> None:
+        """Bring the index and size in line with what is stored."""
+
+    def _drop(self, key: str) -> None:
+        _, size = self.index.pop(key)
+        self.size -= size
+        self._delete(key)
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        """The stored payload for `key`, without counting a hit or miss. Call with the lock held."""
+        entry = self.index.get(key)
+        if entry is None:
+            entry = self._adopt(key)
+            if entry is not None:
+                self.index[key] = entry
+                self.size += entry[1]
+        if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+            self._drop(key)
+            self.evictions += 1
+            entry = None
+        payload = self._read(key) if entry is not None else None
+        if payload is None:
+            if entry is not None:
+                self._drop(key)
+            return None
+        self.index.move_to_end(key)
+        return payload
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            payload = self._lookup(key)
+            self._count(payload is not None)
+        return None if payload is None else pickle.loads(payload)
+
+    def put(self, key: str, result: Dict) -> None:
+        """
+        Store a complete analysis. Results with a failed (None) section are
+        skipped so the failure is retried on the next request.
+        """
+        if any(section is None for section in result.values()):
+            return
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.index:
+                self._drop(key)
+            self._write(key, payload)
+            self.index[key] = (time.time(), len(payload))
+            self.size += len(payload)
+            self._refresh()
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self.index)))
+                self.evictions += 1
+
+    def get_selection(self, key: str, analyses: Optional[List[str]]) -> Optional[Dict]:
+        """
+        The cached result of `analyses` (all of them when None) for `key`,
+        cut from the complete result when that is cached. Counts as one
+        lookup, whichever of the two answered it.
+        """
+        if analyses is None:
+            return self.get(key)
+        with self.lock:
+            payload = self._lookup(selection_key(key, analyses))
+            complete = payload is None
+            if complete:
+                payload = self._lookup(key)
+            self._count(payload is not None)
+        if payload is None:
+            return None
+        result = pickle.loads(payload)
+        return {name: result[name] for name in analyses} if complete else result
+
+    def put_selection(self, key: str, analyses: Optional[List[str]], result: Dict) -> None:
+        self.put(key if analyses is None else selection_key(key, analyses), result)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.index),
+            "bytes": self.size,
+        }
+
+
+class MemoryResultCache(ResultCache):
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl_seconds: int = RESULT_CACHE_TTL):
+        super().__init__(max_bytes, ttl_seconds)
+        self.payloads = {}
+
+    def _read(self, key: str) -> Optional[bytes]:
+        return self.payloads.get(key)
+
+    def _write(self, key: str, payload: bytes) -> None:
+        self.payloads[key] = payload
+
+    def _delete(self, key: str) -> None:
+        self.payloads.pop(key, None)
+
+
+def private_directory(path: str) -> str:
+    """
+    Create `path` if needed, accessible to this user only. A directory that
+    another user owns (e.g. one planted in a shared temp directory ahead of
+    the server) is refused with PermissionError.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def signing_key(directory: str) -> bytes:
+    """RESULT_CACHE_KEY, or the key generated into `directory` by whichever worker got there first."""
+    if RESULT_CACHE_KEY:
+        return RESULT_CACHE_KEY.encode()
+    path = os.path.join(directory, SIGNING_KEY_FILE)
+    if not os.path.exists(path):
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as f:
+            f.write(os.urandom(32))
+        try:
+            # Linking fails if the key exists by now, so all workers end up with the same one
+            os.link(f.name, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(f.name)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class DiskResultCache(ResultCache):
+    """
+    One file per result in `directory`. Files already there are indexed on
+    startup, oldest first, so the budget and TTL carry over restarts.
+
+    Workers pointed at the same directory share it: a key missing from a
+    worker's index is looked for on disk, and the budget covers the whole
+    directory, which is rescanned on every store and trimmed oldest file
+    first.
+
+    The directory is private to the server's user, and every file starts
+    with an HMAC of its pickle: a file that was not written with this
+    cache's key is dropped unread.
+    """
+
+    def __init__(self, directory: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 ttl_seconds: int = RESULT_CACHE_TTL):
+        super().__init__(max_bytes, ttl_seconds)
+        self.directory = private_directory(directory)
+        self.key = signing_key(directory)
+
+        self._refresh()
+
+    def _refresh(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # removed by another worker meanwhile
+                entries.append((stat.st_mtime, entry.name[:-len(".pkl")], stat.st_size))
+        self.index = OrderedDict((key, (stored_at, size)) for stored_at, key, size in sorted(entries))
+        self.size = sum(size for _, _, size in entries)
+
+    def _adopt(self, key: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(self._path(key))
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self.key, payload, hashlib.sha256).digest()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                signature, payload = f.read(SIGNATURE_SIZE), f.read()
+        except OSError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            logger.warning(f"Ignoring cached result {key}: its signature does not match")
+            return None
+        return payload
+
+    def _write(self, key: str, payload: bytes) -> None:
+        path = self._path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            f.write(self._sign(payload))
+            f.write(payload)
+        os.replace(f.name, path)
+
+    def _delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class NullResultCache(ResultCache):
+    """Caches nothing; every lookup is a miss."""
+
+    def _read(self, key: str) -> Optional[bytes]:
+        return None
+
+    def put(self, key: str, result: Dict) -> None:
+        pass
+
+
+def make_result_cache(backend: str = RESULT_CACHE, directory: str = RESULT_CACHE_DIR,
+                      max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl_seconds: int = RESULT_CACHE_TTL) -> ResultCache:
+    if backend == "memory":
+        return MemoryResultCache(max_bytes, ttl_seconds)
+    if backend == "disk":
+        return DiskResultCache(directory, max_bytes, ttl_seconds)
+    if backend == "off":
+        return NullResultCache(max_bytes, ttl_seconds)
+    raise ValueError(f"Unknown result cache backend: {backend}")
+
+
+result_cache = make_result_cache()
@@ -0,0 +1,135 @@
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import networkx as nx
+    from scipy import sparse
+
+# "auto" computes betweenness exactly on graphs of up to
+# NETWORK_EXACT_MAX_NODES participants and samples NETWORK_PIVOTS source
+# nodes above that; "exact" and "approximate" force one or the other
+NETWORK_BETWEENNESS = os.environ.get("NETWORK_BETWEENNESS", "auto")
+NETWORK_EXACT_MAX_NODES = int(os.environ.get("NETWORK_EXACT_MAX_NODES", 500))
+NETWORK_PIVOTS = int(os.environ.get("NETWORK_PIVOTS", 256))
+# "mentions" builds the network from @mentions (the original behaviour);
+# "replies" uses the weighted reply pairs of the interactions analysis
+NETWORK_GRAPH = os.environ.get("NETWORK_GRAPH", "mentions")
+
+BETWEENNESS_MODES = ("auto", "exact", "approximate")
+NETWORK_GRAPHS = ("mentions", "replies")
+SEED = 42
+
+
+def pivot_count(nodes: int, mode: str = NETWORK_BETWEENNESS,
+                max_exact_nodes: int = NETWORK_EXACT_MAX_NODES, pivots: int = NETWORK_PIVOTS) -> Optional[int]:
+    """Number of sources to sample betweenness from, or None to compute it exactly."""
+    if mode == "exact" or (mode == "auto" and nodes <= max_exact_nodes) or nodes <= pivots:
+        return None
+    return pivots
+
+
+def betweenness(G: "nx.Graph", mode: str = NETWORK_BETWEENNESS, **options) -> Tuple[Dict, Dict]:
+    """
+    Betweenness centrality of every node, and how it was computed.
+
+    Exact betweenness is O(VE). The approximation runs the same shortest
+    path counting from a sample of source nodes only, with a fixed seed so
+    the same graph always gets the same values.
+    """
+    import networkx as nx
+
+    k = pivot_count(G.number_of_nodes(), mode, **options)
+    if k is None:
+        return nx.betweenness_centrality(G), {"betweenness": "exact"}
+    return nx.betweenness_centrality(G, k=k, seed=SEED), {"betweenness": "approximate", "pivots": k}
+
+
+def sparse_betweenness(lengths: "sparse.csr_array", sources: np.ndarray) -> np.ndarray:
+    """
+    Brandes' dependency accumulation from `sources` over a symmetric matrix
+    of edge lengths, unnormalized.
+
+    Shortest distances come from scipy's Dijkstra. With the nodes ranked by
+    distance from the source, the shortest path DAG is triangular, so the
+    path counts and the dependencies are each one sparse triangular solve:
+    (I - P) sigma = e_s over predecessor edges P, and (I - S) delta = S 1
+    with S[v, w] = sigma[v] / sigma[w] over successor edges.
+    """
+    from scipy import sparse
+    from scipy.sparse import csgraph
+    from scipy.sparse.linalg import spsolve_triangular
+
+    n = lengths.shape[0]
+    edges = lengths.tocoo()
+    heads, tails, weights = edges.row, edges.col, edges.data
+    identity = sparse.identity(n, format="csr")
+    start = np.zeros(n)
+    start[0] = 1
+    total = np.zeros(n)
+
+    for distances in csgraph.dijkstra(lengths, indices=sources):
+        order = np.argsort(distances, kind="stable")
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        # Lengths are sums of 1/count, so equal paths can differ by rounding;
+        # networkx compares them exactly and may drop one of the ties
+        on_path = np.isfinite(distances[heads]) & np.isclose(
+            distances[heads] + weights, distances[tails], rtol=1e-9, atol=0)
+        before, after = rank[heads[on_path]], rank[tails[on_path]]
+
+        predecessors = sparse.csr_array((np.ones(len(before)), (after, before)), shape=(n, n))
+        sigma = spsolve_triangular(identity - predecessors, start, lower=True, unit_diagonal=True)
+        shares = sparse.csr_array((sigma[before] / sigma[after], (before, after)), shape=(n, n))
+        delta = spsolve_triangular(identity - shares, shares @ np.ones(n), lower=False, unit_diagonal=True)
+        delta[0] = 0  # the source itself
+        total[order] += delta
+    return total
+
+
+def reply_graph(pairs: Dict[Tuple[str, str], int]) -> Tuple[List[str], "sparse.csr_array"]:
+    """
+    Participants and the symmetric reply-count matrix between them, built
+    from the (source, target) -> count pairs of the interactions analysis.
+    """
+    from scipy import sparse
+
+    users = list(dict.fromkeys(user for pair in pairs for user in pair))
+    index = {user: i for i, user in enumerate(users)}
+    sources = np.fromiter((index[source] for source, _ in pairs), dtype=np.int64, count=len(pairs))
+    targets = np.fromiter((index[target] for _, target in pairs), dtype=np.int64, count=len(pairs))
+    counts = np.fromiter(pairs.values(), dtype=np.float64, count=len(pairs))
+    replies = sparse.csr_array((counts, (sources, targets)), shape=(len(users), len(users)))
+    return users, (replies + replies.T).tocsr()
+
+
+def reply_centrality(pairs: Dict[Tuple[str, str], int], mode: str = NETWORK_BETWEENNESS,
+                     **options) -> Tuple[Dict, Dict, Dict]:
+    """
+    Degree and betweenness centrality on the weighted reply graph.
+
+    Degree centrality is the share of other participants someone has
+    exchanged replies with, read off the sparse matrix. For betweenness an
+    edge's length is the inverse of its reply count, so shortest paths run
+    along the busiest conversations. Both are normalized like networkx.
+    """
+    users, replies = reply_graph(pairs)
+    n = len(users)
+    if n < 2:
+        # Replies always involve two people, so this is the empty graph
+        return {}, {}, {"betweenness": "exact"}
+    degree = np.diff(replies.indptr) / (n - 1)
+
+    lengths = replies.copy()
+    lengths.data = 1 / lengths.data
+    k = pivot_count(n, mode, **options)
+    if k is None:
+        sources, info = np.arange(n), {"betweenness": "exact"}
+    else:
+        sources = np.sort(np.random.default_rng(SEED).choice(n, size=k, replace=False))
+        info = {"betweenness": "approximate", "pivots": k}
+    between = sparse_betweenness(lengths, sources)
+    if n > 2:
+        between *= n / len(sources) / ((n - 1) * (n - 2))
+    return dict(zip(users, degree.tolist())), dict(zip(users, between.tolist())), info
@@ -0,0 +1,68 @@
+import re
+from typing import Dict, Iterable, List
+
+import emoji
+
+
+def _start_class(chars: Iterable[str]) -> str:
+    """
+    A regex class matching at least `chars`. The engine looks code points
+    up in a table for the Basic Multilingual Plane but tests every range
+    above it in turn, so the astral ones are merged into a single range;
+    the trie walk rejects the few extra code points that lets through.
+    """
+    bmp = sorted(char for char in chars if ord(char) <= 0xFFFF)
+    astral = sorted(char for char in chars if ord(char) > 0xFFFF)
+    members = "".join(map(re.escape, bmp))
+    if astral:
+        members += f"{re.escape(astral[0])}-{re.escape(astral[-1])}"
+    return f"[{members}]"
+
+
+class EmojiMatcher:
+    """
+    Finds whole emoji sequences in text: skin-tone variants, ZWJ sequences
+    such as families, flags and keycaps come out as one emoji each, as the
+    `emoji` package itself lists them, instead of as their code points.
+
+    Python's regex engine tries the alternatives of a large alternation one
+    by one, so a pattern over all sequences is slower than a per-character
+    lookup. Instead a character class of the code points that start a
+    sequence finds candidates, and a trie walk from each candidate takes
+    the longest sequence there. No sequence is pure ASCII, so ASCII-only
+    messages, most of a chat, are skipped without a scan.
+    """
+
+    def __init__(self, sequences: Iterable[str]):
+        self.trie: Dict = {}
+        for sequence in sequences:
+            node = self.trie
+            for char in sequence:
+                node = node.setdefault(char, {})
+            node[None] = sequence
+        self.starts = re.compile(_start_class(self.trie))
+
+    def findall(self, text: str) -> List[str]:
+        if text.isascii():
+            return []
+        found = []
+        match = self.starts.search(text)
+        while match:
+            position = start = match.start()
+            node, sequence, end = self.trie, None, start + 1
+            while position < len(text):
+                node = node.get(text[position])
+                if node is None:
+                    break
+                position += 1
+                if None in node:
+                    sequence, end = node[None], position
+            if sequence is not None:
+                found.append(sequence)
+            match = self.starts.search(text, end)
+        return found
+
+
+# Built once, when the parser is imported
+EMOJI_MATCHER = EmojiMatcher(emoji.EMOJI_DATA)
+find_emojis = EMOJI_MATCHER.findall
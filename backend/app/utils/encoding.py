@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+import msgpack
+import numpy as np
+import orjson
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; responses fall back to gzip without it
+    brotli = None
+
+# Response bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 5))
+# Quality 4 compresses better than gzip at a similar speed; the top
+# qualities are meant for static assets
+BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 4))
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Media types clients use for MessagePack, the standard one first
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+FORMATS = {JSON: JSON, **{media_type: MSGPACK for media_type in MSGPACK_TYPES}}
+
+# Content codings in order of preference when a client accepts several
+CONTENT_CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _plain(value):
+    """Python equivalent of the numpy values that json and msgpack cannot encode."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_json(content) -> bytes:
+    """
+    Compact UTF-8 JSON, with numpy scalars and arrays encoded natively.
+    Strings orjson rejects, such as lone surrogates sent in by a client,
+    go through the json module instead.
+    """
+    try:
+        return orjson.dumps(content, default=_plain, option=JSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"),
+                          default=_plain).encode("utf-8", "surrogatepass")
+
+
+def encode_msgpack(content) -> bytes:
+    return msgpack.packb(content, default=_plain, use_bin_type=True)
+
+
+ENCODERS = {JSON: encode_json, MSGPACK: encode_msgpack}
+
+
+def encode(content, media_type: str) -> bytes:
+    return ENCODERS[media_type](content)
+
+
+def _preferences(header: Optional[str]) -> Dict[str, float]:
+    """{value: q} of an Accept or Accept-Encoding header."""
+    preferences = {}
+    for item in (header or "").split(","):
+        value, *parameters = item.strip().split(";")
+        quality = 1.0
+        for parameter in parameters:
+            name, _, number = parameter.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            preferences[value.strip().lower()] = quality
+    return preferences
+
+
+def choose_format(accept: Optional[str]) -> str:
+    """
+    MSGPACK when the client lists a MessagePack type at least as high as
+    JSON, JSON otherwise. MessagePack is opt-in, so wildcards mean JSON.
+    """
+    preferences = _preferences(accept)
+    msgpack_quality = max((preferences.get(media_type, 0.0) for media_type in MSGPACK_TYPES), default=0.0)
+    if msgpack_quality > 0 and msgpack_quality >= preferences.get(JSON, 0.0):
+        return MSGPACK
+    return JSON
+
+
+def choose_coding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The accepted content coding we prefer, or None to send the body as is."""
+    preferences = _preferences(accept_encoding)
+    wildcard = preferences.get("*", 0.0)
+    accepted = [(preferences.get(coding, wildcard), -rank) for rank, coding in enumerate(CONTENT_CODINGS)]
+    quality, rank = max(accepted)
+    return CONTENT_CODINGS[-rank] if quality > 0 else None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks: Iterable[bytes], coding: str) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk into one gzip member or brotli stream."""
+    if coding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress_chunk, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress_chunk, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        compressed = compress_chunk(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
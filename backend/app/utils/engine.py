@@ -0,0 +1,111 @@
+import logging
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+from .table import MessageTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 65536
+
+# Called with (name, result) as each analysis finishes
+ResultCallback = Callable[[str, object], None]
+
+
+class Accumulator:
+    """
+    State for one analysis, fed by the engine one batch of messages at a time.
+
+    `update` is called with consecutive MessageTable slices in chat order and
+    `finalize` once at the end to produce the analysis result. Analyses that
+    read `batch.features()` set `uses_features` so the features are computed
+    once for the whole table rather than per batch.
+    """
+
+    uses_features = False
+
+    def update(self, batch: MessageTable) -> None:
+        raise NotImplementedError
+
+    def finalize(self):
+        raise NotImplementedError
+
+
+def iter_batches(table: MessageTable, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[MessageTable]:
+    for start in range(0, len(table), batch_size):
+        yield table.slice(start, min(start + batch_size, len(table)))
+
+
+def _prepare_features(table: MessageTable, accumulators: Dict[str, Accumulator]) -> set:
+    """
+    Compute the features for the accumulators that use them. If that fails
+    only those fail: their names are returned, and the rest still run.
+    """
+    users = {name for name, acc in accumulators.items() if acc.uses_features}
+    if not users:
+        return set()
+    try:
+        table.features()
+    except Exception as e:
+        for name in users:
+            logger.error(f"Error in {name} analysis: {str(e)}")
+        return users
+    return set()
+
+
+def run_accumulator(accumulator: Accumulator, table: MessageTable, batch_size: int = DEFAULT_BATCH_SIZE):
+    if accumulator.uses_features:
+        table.features()
+    for batch in iter_batches(table, batch_size):
+        accumulator.update(batch)
+    return accumulator.finalize()
+
+
+def run_accumulators(table: MessageTable, accumulators: Dict[str, Accumulator],
+                     batch_size: int = DEFAULT_BATCH_SIZE, on_result: Optional[ResultCallback] = None,
+                     timings: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    Drive every accumulator from a single pass over `table`.
+
+    An accumulator that raises is dropped for the rest of the pass and its
+    result is None, so one failing analysis never affects the others.
+    `on_result` is called as each result is finalized, and the seconds spent
+    in each accumulator are added to `timings` when it is given. Timing is
+    per batch, so it costs nothing measurable either way.
+    """
+    failed = _prepare_features(table, accumulators)
+    hooks = [(name, acc.update) for name, acc in accumulators.items() if name not in failed]
+    elapsed = dict.fromkeys(accumulators, 0.0)
+    clock = time.perf_counter
+
+    for batch in iter_batches(table, batch_size):
+        for name, update in hooks:
+            started = clock()
+            try:
+                update(batch)
+            except Exception as e:
+                logger.error(f"Error in {name} analysis: {str(e)}")
+                failed.add(name)
+            elapsed[name] += clock() - started
+        if failed:
+            hooks = [(name, update) for name, update in hooks if name not in failed]
+
+    result = {}
+    for name, acc in accumulators.items():
+        if name in failed:
+            result[name] = None
+        else:
+            started = clock()
+            try:
+                result[name] = acc.finalize()
+            except Exception as e:
+                logger.error(f"Error in {name} analysis: {str(e)}")
+                result[name] = None
+            elapsed[name] += clock() - started
+        if on_result is not None:
+            on_result(name, result[name])
+
+    if timings is not None:
+        for name, seconds in elapsed.items():
+            timings[name] = timings.get(name, 0.0) + seconds
+    return result
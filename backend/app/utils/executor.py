@@ -0,0 +1,270 @@
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .engine import Accumulator, ResultCallback, run_accumulators
+from .metrics import record_analyses
+from .table import MessageTable
+
+logger = logging.getLogger(__name__)
+
+# "serial" runs every analysis in one pass on the calling thread, "thread"
+# and "process" spread them over a pool of ANALYSIS_WORKERS workers.
+EXECUTOR_MODES = ("serial", "thread", "process")
+EXECUTOR_MODE = os.environ.get("ANALYSIS_EXECUTOR", "serial")
+EXECUTOR_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", os.cpu_count() or 1))
+# How the "process" workers are started. Forking would copy the server's
+# threads and locks mid-request, so the workers come from a fork server
+# (or are spawned where there is none), once for the server's lifetime.
+EXECUTOR_START_METHOD = os.environ.get(
+    "ANALYSIS_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# CPU-heavy analyses that get a task of their own; the rest share one pass
+ISOLATED_ANALYSES = ("sentiment_analysis", "topics", "network_analysis")
+
+AccumulatorFactories = Dict[str, Callable[[], Accumulator]]
+
+
+def plan_tasks(names: List[str]) -> List[List[str]]:
+    isolated = [[name] for name in names if name in ISOLATED_ANALYSES]
+    shared = [name for name in names if name not in ISOLATED_ANALYSES]
+    return ([shared] if shared else []) + isolated
+
+
+TaskOutcome = Tuple[Dict, Dict[str, float], Optional[Dict[str, Accumulator]]]
+
+
+def _run_task(table: MessageTable, factories: AccumulatorFactories,
+              on_result: Optional[ResultCallback] = None, keep_state: bool = False) -> TaskOutcome:
+    """
+    Results of one task, the seconds each of its analyses took and, with
+    `keep_state`, its accumulators as they were left.
+    """
+    timings = {}
+    accumulators = {name: factory() for name, factory in factories.items()}
+    results = run_accumulators(table, accumulators, on_result=on_result, timings=timings)
+    return results, timings, accumulators if keep_state else None
+
+
+class SharedTable:
+    """
+    A MessageTable serialized once into shared memory for worker processes.
+
+    The table is pickled with protocol 5 so its NumPy columns travel as
+    out-of-band buffers. Each buffer gets its own block, and workers map
+    the columns straight onto those blocks instead of receiving a copy.
+    """
+
+    def __init__(self, table: MessageTable):
+        buffers = []
+        payload = pickle.dumps(table, protocol=5, buffer_callback=buffers.append)
+        self.blocks, self.handles = [], []
+        for data in [memoryview(payload)] + [buffer.raw() for buffer in buffers]:
+            block = SharedMemory(create=True, size=max(1, data.nbytes))
+            block.buf[:data.nbytes] = data
+            self.blocks.append(block)
+            self.handles.append((block.name, data.nbytes))
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def start_process_pool() -> ProcessPoolExecutor:
+    """
+    The pool of EXECUTOR_WORKERS processes the "process" mode runs on,
+    started on first use. The server starts it at startup and shuts it
+    down on shutdown (see main.lifespan); every request shares it.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            context = multiprocessing.get_context(EXECUTOR_START_METHOD)
+            if EXECUTOR_START_METHOD == "forkserver":
+                # Workers are forked with NumPy and the analyses already imported
+                context.set_forkserver_preload(["app.utils.analytics"])
+            _process_pool = ProcessPoolExecutor(max_workers=EXECUTOR_WORKERS, mp_context=context)
+            # The first task starts every worker (they are never started on
+            # demand outside the fork start method), so they start here
+            _process_pool.submit(int)
+        return _process_pool
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _discard_broken_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died and took the pool with it; the next request starts a new one
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not pool:
+            return
+        _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _load_shared_task(blocks: List[SharedMemory], handles: List[Tuple[str, int]],
+                      factories: AccumulatorFactories, keep_state: bool) -> bytes:
+    views = [block.buf[:size] for block, (_, size) in zip(blocks, handles)]
+    table = pickle.loads(views[0], buffers=views[1:])
+    # Pickled here, while the columns are mapped: kept accumulators can
+    # hold views of them
+    return pickle.dumps(_run_task(table, factories, keep_state=keep_state), protocol=5)
+
+
+def _run_worker_task(handles: List[Tuple[str, int]], factories: AccumulatorFactories,
+                     keep_state: bool = False) -> bytes:
+    """
+    Run one task in a pool worker on the SharedTable of `handles`, mapped
+    for this task only, and return its outcome pickled.
+    """
+    # Pool workers share the parent's resource tracker, so attaching here
+    # does not change who unlinks the blocks: the parent does, in close().
+    blocks = [SharedMemory(name=name) for name, _ in handles]
+    try:
+        return _load_shared_task(blocks, handles, factories, keep_state)
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Still viewed from the traceback of a failed task; unmapped
+                # once that is gone
+                pass
+
+
+def run_analyses(table: MessageTable, factories: AccumulatorFactories,
+                 mode: str = EXECUTOR_MODE, max_workers: Optional[int] = None,
+                 on_result: Optional[ResultCallback] = None,
+                 timings: Optional[Dict[str, float]] = None,
+                 states: Optional[Dict[str, Accumulator]] = None) -> Dict:
+    """
+    Run the analyses in `factories` over `table` and return their results
+    in `factories` order.
+
+    The thread mode starts a pool of `max_workers` threads per call; the
+    process mode runs on the shared pool of start_process_pool, with the
+    table passed through shared memory (see SharedTable). Either falls back
+    to the serial mode when `max_workers` is 1.
+
+    As with the serial pass, an analysis that fails is logged and reported
+    as None without affecting the others; in the pool modes that also
+    covers a task that dies as a whole (e.g. a crashed worker process).
+
+    `on_result` is called with each result as it becomes available. When it
+    is given, the serial mode runs the planned tasks one after another
+    instead of in one fused pass, so the cheap analyses report before the
+    isolated heavy ones.
+
+    The seconds spent in each analysis are recorded as metrics and, when
+    `timings` is given, added to it.
+
+    When `states` is given, it receives the accumulator of every analysis
+    that ran to completion, as finalize left it, so a caller can save them
+    and later resume. In the process mode they are sent back from the
+    workers.
+    """
+    if mode not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown executor mode: {mode}")
+    if max_workers is None:
+        max_workers = EXECUTOR_WORKERS
+    started = time.perf_counter()
+    task_timings = {}
+    results = _run_analyses(table, factories, mode, max_workers, on_result, task_timings, states)
+    record_analyses(len(table), task_timings, results, time.perf_counter() - started)
+    if timings is not None:
+        timings.update(task_timings)
+    return results
+
+
+def _run_analyses(table: MessageTable, factories: AccumulatorFactories, mode: str, max_workers: int,
+                  on_result: Optional[ResultCallback], timings: Dict[str, float],
+                  states: Optional[Dict[str, Accumulator]] = None) -> Dict:
+    tasks = [{name: factories[name] for name in names} for names in plan_tasks(list(factories))]
+    keep_state = states is not None
+
+    def keep(task_results: Dict, task_states: Optional[Dict[str, Accumulator]]) -> None:
+        if keep_state:
+            states.update({name: task_states[name] for name, result in task_results.items() if result is not None})
+
+    if mode == "serial" or max_workers <= 1:
+        if on_result is None:
+            results, task_timings, task_states = _run_task(table, factories, keep_state=keep_state)
+            timings.update(task_timings)
+            keep(results, task_states)
+            return results
+        results = {}
+        for task in tasks:
+            task_results, task_timings, task_states = _run_task(table, task, on_result, keep_state)
+            results.update(task_results)
+            timings.update(task_timings)
+            keep(task_results, task_states)
+        return {name: results[name] for name in factories}
+
+    results = {}
+    shared = None
+    pool = None
+    try:
+        if mode == "thread":
+            pool = ThreadPoolExecutor(max_workers=max_workers)
+            futures = {pool.submit(_run_task, table, task, None, keep_state): task for task in tasks}
+        else:
+            shared = SharedTable(table)
+
+            def submit(process_pool):
+                return {process_pool.submit(_run_worker_task, shared.handles, task, keep_state): task
+                        for task in tasks}
+
+            process_pool = start_process_pool()
+            try:
+                futures = submit(process_pool)
+            except BrokenExecutor:
+                # A worker died since the last request
+                _discard_broken_pool(process_pool)
+                process_pool = start_process_pool()
+                futures = submit(process_pool)
+
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                outcome = future.result()
+                task_results, task_timings, task_states = outcome if mode == "thread" else pickle.loads(outcome)
+                timings.update(task_timings)
+                keep(task_results, task_states)
+            except Exception as e:
+                if isinstance(e, BrokenExecutor) and mode == "process":
+                    _discard_broken_pool(process_pool)
+                task_results = {}
+                for name in task:
+                    logger.error(f"Error in {name} analysis: {str(e)}")
+                    task_results[name] = None
+            results.update(task_results)
+            if on_result is not None:
+                for name, result in task_results.items():
+                    on_result(name, result)
+    finally:
+        # The process pool is shared and outlives the request; the blocks
+        # are unlinked once every task of this one is done
+        if pool is not None:
+            pool.shutdown()
+        if shared is not None:
+            shared.close()
+
+    return {name: results.get(name) for name in factories}
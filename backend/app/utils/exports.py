@@ -0,0 +1,148 @@
+import logging
+import mmap
+import os
+import zipfile
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+
+from .parser import CHUNK_SIZE, parse_chunks, parse_stream
+from .table import MessageTable
+
+logger = logging.getLogger(__name__)
+
+# Bytes of a memory-mapped export handed to the parser at a time; larger
+# chunks only raise the peak by the lines decoded from each at once
+MMAP_CHUNK_SIZE = int(os.environ.get("MMAP_CHUNK_SIZE", CHUNK_SIZE))
+
+# Local file headers a zip starts with; the second is an empty archive
+ZIP_SIGNATURES = (b"PK\x03\x04", b"PK\x05\x06")
+EXPORT_SUFFIX = ".txt"
+# Chat file names of WhatsApp's export zips: iOS uses "_chat.txt", Android
+# "WhatsApp Chat with <name>.txt" (in the phone's language)
+CHAT_NAMES = ("_chat.txt",)
+CHAT_PREFIX = "whatsapp"
+
+ExportPath = Union[str, os.PathLike]
+
+
+class ExportNotFound(ValueError):
+    """A zip without a chat export (.txt) in it."""
+
+
+def is_zip(stream: BinaryIO) -> bool:
+    """Whether a seekable binary stream holds a zip, leaving its position where it was."""
+    position = stream.tell()
+    signature = stream.read(4)
+    stream.seek(position)
+    return signature in ZIP_SIGNATURES
+
+
+def _is_ignored(info: zipfile.ZipInfo) -> bool:
+    return info.is_dir() or info.filename.startswith("__MACOSX/")
+
+
+def chat_member(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    """
+    The chat export inside a zip: the file WhatsApp names as the chat, or
+    else the largest .txt, since an "export with media" zip may also carry
+    text documents that were shared in the chat.
+    """
+    candidates = [info for info in archive.infolist()
+                  if not _is_ignored(info) and info.filename.lower().endswith(EXPORT_SUFFIX)]
+    if not candidates:
+        raise ExportNotFound("No chat export (.txt) found in the zip")
+    for info in candidates:
+        name = os.path.basename(info.filename).lower()
+        if name in CHAT_NAMES or name.startswith(CHAT_PREFIX):
+            return info
+    return max(candidates, key=lambda info: info.file_size)
+
+
+def media_entries(archive: zipfile.ZipFile) -> List[Dict]:
+    """
+    Name and size of every file of an export zip besides the chat, read
+    from the zip's directory without decompressing any of them.
+    """
+    chat = chat_member(archive).filename
+    return [{"name": info.filename, "size": info.file_size}
+            for info in archive.infolist() if not _is_ignored(info) and info.filename != chat]
+
+
+def parse_zip(file: Union[ExportPath, BinaryIO], member: Optional[str] = None,
+              chunk_size: int = CHUNK_SIZE) -> MessageTable:
+    """
+    Parse the chat of an export zip (or the `member` given), decompressing
+    it chunk by chunk straight into the parser. Nothing is extracted to
+    disk and the media entries are never read.
+    """
+    with zipfile.ZipFile(file) as archive:
+        name = member if member is not None else chat_member(archive).filename
+        logger.debug(f"Parsing {name} from zip")
+        with archive.open(name) as stream:
+            return parse_stream(stream, chunk_size)
+
+
+def _iter_views(mapped: mmap.mmap, view: memoryview, chunk_size: int) -> Iterator[memoryview]:
+    # Whole pages per chunk, so a parsed chunk's pages can be dropped
+    chunk_size = max(mmap.PAGESIZE, chunk_size - chunk_size % mmap.PAGESIZE)
+    for start in range(0, len(view), chunk_size):
+        with view[start:start + chunk_size] as chunk:
+            yield chunk
+        if hasattr(mapped, "madvise"):
+            # Unmap the parsed pages from this process; they stay in the
+            # page cache, but no longer count towards its memory
+            mapped.madvise(mmap.MADV_DONTNEED, start, min(chunk_size, len(view) - start))
+
+
+@contextmanager
+def mapped_chunks(path: ExportPath, chunk_size: int = MMAP_CHUNK_SIZE) -> Iterator[Iterator[memoryview]]:
+    """
+    A local file as consecutive views of its memory map, so it is parsed
+    without being read into (or copied around) the heap, and only the
+    chunk being parsed is resident.
+    """
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            # An empty file cannot be mapped
+            yield iter(())
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                yield _iter_views(mapped, view, chunk_size)
+            finally:
+                # The map cannot close while a view of it is alive
+                view.release()
+
+
+def parse_path(path: ExportPath) -> MessageTable:
+    """Parse a local export, either a .txt (memory-mapped) or an export zip."""
+    if zipfile.is_zipfile(path):
+        return parse_zip(path)
+    with mapped_chunks(path) as chunks:
+        return parse_chunks(chunks)
+
+
+def parse_upload(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> MessageTable:
+    """
+    Parse an uploaded export, either the plain text of the chat or an
+    export zip (which needs a seekable stream, as UploadFile's spooled file
+    is). This blocks, so the routers run it on a work pool.
+    """
+    if is_zip(stream):
+        return parse_zip(stream, chunk_size=chunk_size)
+    return parse_stream(stream, chunk_size)
+
+
+def upload_media(stream: BinaryIO) -> List[Dict]:
+    """`media_entries` of an uploaded export zip; none for a plain text upload. Rewinds `stream`."""
+    stream.seek(0)
+    if not is_zip(stream):
+        return []
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            return media_entries(archive)
+    finally:
+        stream.seek(0)
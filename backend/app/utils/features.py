@@ -0,0 +1,152 @@
+import re
+from array import array
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class MessageFeatures:
+    """
+    Text features of a MessageTable's rows, computed in one pass over the
+    content and shared by every analysis that would otherwise tokenize the
+    messages itself.
+
+    Tokens are the lowercased `\\w+` words of normal messages, interned into
+    `vocabulary` by first appearance; row i owns
+    `token_ids[token_offsets[i]:token_offsets[i + 1]]`. `split_words`,
+    `split_characters` and `periods` are the whitespace-separated word
+    count, the characters in those words and the number of '.' of each
+    row. Other message types have no tokens and zero counts.
+
+    Like the table, slices share the token buffer and the vocabulary, so
+    offsets are absolute and token ids mean the same in every slice.
+    """
+
+    def __init__(self, vocabulary: List[str], token_ids: np.ndarray, token_offsets: np.ndarray,
+                 split_words: np.ndarray, split_characters: np.ndarray, periods: np.ndarray,
+                 term_masks: Dict[str, np.ndarray] = None):
+        self.vocabulary = vocabulary
+        self.token_ids = token_ids
+        self.token_offsets = token_offsets
+        self.split_words = split_words
+        self.split_characters = split_characters
+        self.periods = periods
+        self.term_masks = {} if term_masks is None else term_masks
+
+    def slice(self, start: int, stop: int) -> "MessageFeatures":
+        return MessageFeatures(
+            self.vocabulary, self.token_ids, self.token_offsets[start:stop + 1],
+            self.split_words[start:stop], self.split_characters[start:stop], self.periods[start:stop],
+            self.term_masks,
+        )
+
+    def batch_token_ids(self) -> np.ndarray:
+        return self.token_ids[self.token_offsets[0]:self.token_offsets[-1]]
+
+    def token_rows(self) -> np.ndarray:
+        """Row of each token in `batch_token_ids`, relative to this slice."""
+        counts = np.diff(self.token_offsets)
+        return np.repeat(np.arange(len(counts)), counts)
+
+    def term_mask(self, name: str, keep: Callable[[str], bool]) -> np.ndarray:
+        """Boolean mask over the vocabulary of the terms `keep` accepts, computed once per name."""
+        mask = self.term_masks.get(name)
+        if mask is None:
+            mask = self.term_masks[name] = np.fromiter(
+                map(keep, self.vocabulary), dtype=bool, count=len(self.vocabulary))
+        return mask
+
+
+# Normal messages are joined with this separator and processed a chunk at a
+# time. It is whitespace and not a word character, so no token spans two
+# messages; a chunk whose messages contain it is processed row by row.
+SEPARATOR = "\x1e"
+TOKEN_PATTERN = re.compile(r'\w+|' + SEPARATOR)
+CHUNK_ROWS = 65536
+# Whether each code point is whitespace to str.split(); none above U+3000 are,
+# and the last entry stands for all of those
+WHITESPACE = np.array([chr(c).isspace() for c in range(0x3002)])
+
+
+def _segment_sums(mask: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """Number of True values of `mask` between consecutive `bounds`."""
+    return np.diff(np.searchsorted(np.flatnonzero(mask), bounds))
+
+
+def _chunk_features(contents: List[str], intern: Callable[[str], int]):
+    """Token ids (0 for the separator) and per-message counts of one chunk of joined messages."""
+    text = SEPARATOR.join(contents)
+    ids = np.frombuffer(array("i", map(intern, TOKEN_PATTERN.findall(text.lower()))), dtype=np.int32)
+    separators = ids == 0
+    token_counts = np.diff(np.concatenate(([-1], np.flatnonzero(separators), [len(ids)]))) - 1
+
+    # JSON can carry lone surrogates ("\ud83d"); they are single code points here too
+    points = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    bounds = np.concatenate(([0], np.flatnonzero(points == ord(SEPARATOR)), [len(points)]))
+    space = WHITESPACE[np.minimum(points, len(WHITESPACE) - 1)]
+    starts = ~space
+    starts[1:] &= space[:-1]
+    return (
+        ids[~separators] - 1, token_counts,
+        _segment_sums(starts, bounds),
+        _segment_sums(~space, bounds),
+        _segment_sums(points == ord('.'), bounds),
+    )
+
+
+def _row_features(contents: List[str], intern: Callable[[str], int]):
+    """Same as `_chunk_features`, one message at a time."""
+    ids = array("i")
+    token_counts, split_words, split_characters, periods = [], [], [], []
+    for content in contents:
+        tokens = WORD_PATTERN.findall(content.lower())
+        ids.extend(map(intern, tokens))
+        token_counts.append(len(tokens))
+        words = content.split()
+        split_words.append(len(words))
+        split_characters.append(sum(map(len, words)))
+        periods.append(content.count('.'))
+    return (np.frombuffer(ids, dtype=np.int32) - 1, token_counts, split_words, split_characters, periods)
+
+
+def compute_features(table) -> MessageFeatures:
+    normal = np.flatnonzero(table.is_type("normal"))
+    # Id 0 is the separator; terms are numbered from 1 here and shifted down
+    vocabulary = defaultdict()
+    vocabulary.default_factory = vocabulary.__len__
+    intern = vocabulary.__getitem__
+    intern(SEPARATOR)
+
+    token_ids = []
+    columns = [np.zeros(len(table), dtype=np.int32) for _ in range(4)]
+    for start in range(0, len(normal), CHUNK_ROWS):
+        rows = normal[start:start + CHUNK_ROWS]
+        contents = list(table.iter_content(rows))
+        if any(SEPARATOR in content for content in contents):
+            ids, *counts = _row_features(contents, intern)
+        else:
+            ids, *counts = _chunk_features(contents, intern)
+        token_ids.append(ids)
+        for column, values in zip(columns, counts):
+            column[rows] = values
+
+    token_counts, split_words, split_characters, periods = columns
+    token_offsets = np.zeros(len(table) + 1, dtype=np.int64)
+    np.cumsum(token_counts, out=token_offsets[1:])
+    return MessageFeatures(
+        list(vocabulary)[1:], np.concatenate(token_ids) if token_ids else np.empty(0, dtype=np.int32),
+        token_offsets, split_words, split_characters, periods,
+    )
+
+
+def count_terms(table) -> List[Tuple[str, int]]:
+    """
+    (token, count) pairs of the tokens of `table`'s normal messages, in
+    order of first appearance: the counts the features give, without
+    building the features' vocabulary for the whole chat.
+    """
+    text = "\n".join(table.iter_content(np.flatnonzero(table.is_type("normal"))))
+    return list(Counter(WORD_PATTERN.findall(text.lower())).items())
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from .analytics import ANALYSIS_ACCUMULATORS, TopicsAccumulator, generate_complete_analysis, is_complete_selection
+from .cache import RESULT_CACHE, RESULT_CACHE_DIR, RESULT_CACHE_TTL, RESULT_KEY_SEED, make_result_cache
+from .engine import ResultCallback
+from .executor import EXECUTOR_MODE, run_analyses
+from .table import MessageTable
+
+logger = logging.getLogger(__name__)
+
+# Keep the accumulator state of every analyzed chat so a longer export of
+# the same chat only has to feed in its new messages. Off by default: every
+# complete analysis then pickles all of its state, per-message sentiment and
+# readability lists included, which only pays off for deployments that see
+# the same chats re-uploaded as they grow.
+INCREMENTAL_ANALYSIS = os.environ.get("INCREMENTAL_ANALYSIS", "0") == "1"
+ANALYSIS_STATE_MAX_BYTES = int(os.environ.get("ANALYSIS_STATE_MAX_BYTES", 512 * 1024 * 1024))
+
+# A chat's saved state is found by the fingerprint of its first messages, so
+# only exports of at least this many messages save state or resume; shorter
+# chats are analyzed in full each time, however few messages were added
+ANCHOR_ROWS = 100
+
+# Analyses whose result is recomputed over the whole chat on every resume.
+# Topics refit LDA on all messages, so only the new text is carried over
+# from the table rather than saved; the network keeps its mention graph but
+# betweenness has to be recomputed on all of it.
+FULL_RECOMPUTE_ANALYSES = ("topics", "network_analysis")
+
+state_store = make_result_cache(
+    RESULT_CACHE, os.path.join(RESULT_CACHE_DIR, "state"), ANALYSIS_STATE_MAX_BYTES, RESULT_CACHE_TTL
+)
+
+
+def chat_anchor(table: MessageTable) -> str:
+    """Key of the saved state for `table`; states built under other settings are not found."""
+    digest = hashlib.sha256(RESULT_KEY_SEED)
+    digest.update(table.slice(0, min(len(table), ANCHOR_ROWS)).fingerprint().encode())
+    return f"state-{digest.hexdigest()}"
+
+
+def _resumed(accumulator):
+    return accumulator
+
+
+def _resume(table: MessageTable, anchor: str) -> Tuple[int, Optional[Dict]]:
+    """Rows already folded into the saved state for `anchor`, and that state, if `table` extends it."""
+    state = state_store.get(anchor)
+    if state is None or state["rows"] > len(table):
+        return 0, None
+    if table.slice(0, state["rows"]).fingerprint() != state["fingerprint"]:
+        logger.info("Saved analysis state does not match the start of this chat; starting over")
+        return 0, None
+    return state["rows"], state["accumulators"]
+
+
+def generate_incremental_analysis(table: MessageTable, on_result: Optional[ResultCallback] = None,
+                                  mode: str = EXECUTOR_MODE,
+                                  timings: Optional[Dict[str, float]] = None,
+                                  analyses: Optional[List[str]] = None,
+                                  save_state: bool = True) -> Tuple[Dict, Optional[Dict]]:
+    """
+    `generate_complete_analysis` that resumes from the saved state of an
+    earlier, shorter export of the same chat when there is one.
+
+    The overlap is found by matching the fingerprint of the rows the state
+    was built from against the same number of rows at the start of `table`;
+    only the rows after it are fed to the accumulators. Returns the result,
+    identical to a full run, and a summary of what was resumed (None when
+    incremental analysis is turned off or has nothing to resume from).
+
+    Chats shorter than ANCHOR_ROWS neither resume nor save state.
+
+    A subset of the `analyses` resumes from saved state as well, but only a
+    run of all of them saves it, since the state has to cover every analysis.
+    With `save_state` False nothing is saved either: for views derived from
+    a chat, such as a filtered part of it, whose states would only push the
+    chats' own out of the store.
+    """
+    complete = is_complete_selection(analyses)
+    if not INCREMENTAL_ANALYSIS or len(table) < ANCHOR_ROWS:
+        return generate_complete_analysis(table, mode, on_result, timings, analyses), None
+
+    anchor = chat_anchor(table)
+    start, accumulators = _resume(table, anchor)
+    if accumulators is None:
+        if not complete or not save_state:
+            return generate_complete_analysis(table, mode, on_result, timings, analyses), None
+        accumulators = {name: factory() for name, factory in ANALYSIS_ACCUMULATORS.items() if name != "topics"}
+    names = list(ANALYSIS_ACCUMULATORS) if complete else analyses
+    resumed = dict(accumulators)
+    if "topics" in names:
+        resumed["topics"] = TopicsAccumulator()
+        if start:
+            resumed["topics"].update(table.slice(0, start))
+
+    new_rows = table.slice(start, len(table))
+    # Picklable, so the process mode can ship the resumed state to its workers
+    factories = {name: partial(_resumed, resumed[name]) for name in names}
+    # The accumulators come back from the workers in the process mode, so
+    # every mode leaves the state to save in `states`
+    states = {}
+    result = run_analyses(new_rows, factories, mode, on_result=on_result, timings=timings, states=states)
+
+    if complete and save_state and all(section is not None for section in result.values()):
+        state_store.put(anchor, {
+            "rows": len(table),
+            "fingerprint": table.fingerprint(),
+            "accumulators": {name: states[name] for name in accumulators},
+        })
+
+    info = {
+        "resumed_rows": start,
+        "new_rows": len(new_rows),
+        "recomputed": [name for name in FULL_RECOMPUTE_ANALYSES if name in names] if start else list(names),
+    }
+    logger.info(f"Incremental analysis: {info['resumed_rows']} rows resumed, {info['new_rows']} new "
+                f"({mode} executor)")
+    return result, info
@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .analytics import ANALYSIS_ACCUMULATORS, Messages, as_table
+from .cache import result_cache, table_key
+from .incremental import generate_incremental_analysis
+from .table import InvalidMessage
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs are kept this long for polling, and at most this many jobs
+# are kept at all; the oldest finished ones go first
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+MAX_JOBS = int(os.environ.get("MAX_JOBS", 1000))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Per-analysis states
+PENDING = "pending"
+
+
+class JobError(Exception):
+    """A job failure whose message is safe to show to the client."""
+
+
+class Job:
+    """
+    One background analysis. Worker threads record results on it while the
+    API reads snapshots, so every access goes through `lock`.
+    """
+
+    def __init__(self, analyses: List[str]):
+        self.id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.status = QUEUED
+        self.error = None
+        self.message_count = None
+        self.incremental = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.analyses = {name: PENDING for name in analyses}
+        self.results = {}
+
+    def start(self) -> None:
+        with self.lock:
+            self.status = RUNNING
+            self.started_at = time.time()
+
+    def set_message_count(self, count: int) -> None:
+        with self.lock:
+            self.message_count = count
+
+    def set_incremental(self, info: Optional[Dict]) -> None:
+        with self.lock:
+            self.incremental = info
+
+    def record(self, name: str, result) -> None:
+        with self.lock:
+            self.results[name] = result
+            self.analyses[name] = DONE if result is not None else FAILED
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self.lock:
+            self.status = FAILED if error else DONE
+            self.error = error
+            self.finished_at = time.time()
+
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def status_snapshot(self) -> Dict:
+        with self.lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "message_count": self.message_count,
+                "progress": {
+                    "completed": len(self.results),
+                    "total": len(self.analyses),
+                },
+                "analyses": dict(self.analyses),
+                "incremental": self.incremental,
+                "elapsed_seconds": round(end - (self.started_at or end), 3),
+            }
+
+    def result_snapshot(self) -> Dict:
+        """Results finished so far, in the order of the complete analysis."""
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "complete": self.status == DONE,
+                "results": {name: self.results[name] for name in self.analyses if name in self.results},
+            }
+
+
+class JobStore:
+    """In-process registry of jobs, pruned by age and count as jobs are added."""
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS, max_jobs: int = MAX_JOBS):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def create(self, analyses: Optional[List[str]] = None) -> Job:
+        job = Job(list(ANALYSIS_ACCUMULATORS) if analyses is None else analyses)
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def discard(self, job_id: str) -> None:
+        with self.lock:
+            self.jobs.pop(job_id, None)
+
+    def _prune(self) -> None:
+        now = time.time()
+        finished = sorted(
+            (job for job in self.jobs.values() if job.is_finished()),
+            key=lambda job: job.finished_at,
+        )
+        expired = [job for job in finished if now - job.finished_at > self.ttl_seconds]
+        overflow = len(self.jobs) + 1 - self.max_jobs
+        if overflow > len(expired):
+            expired = finished[:overflow]
+        for job in expired:
+            del self.jobs[job.id]
+
+
+def run_job(job: Job, load: Callable[[], Messages], key: Optional[str] = None,
+            analyses: Optional[List[str]] = None) -> None:
+    """
+    Load a job's messages and run `analyses` on them (all when None),
+    recording each analysis on the job as it completes. Runs on a work pool
+    thread and never raises.
+
+    A cached result for `key` is used without calling `load`. Without a
+    key, the loaded table's own key is looked up instead.
+    """
+    job.start()
+    try:
+        result = result_cache.get_selection(key, analyses) if key else None
+        if result is None:
+            table = as_table(load())
+            if not len(table):
+                raise JobError("No messages found in chat")
+            job.set_message_count(len(table))
+            if key is None:
+                key = table_key(table)
+                result = result_cache.get_selection(key, analyses)
+
+        if result is None:
+            result, info = generate_incremental_analysis(table, on_result=job.record, analyses=analyses)
+            job.set_incremental(info)
+            result_cache.put_selection(key, analyses, result)
+        else:
+            for name, section in result.items():
+                job.record(name, section)
+        job.finish()
+    except (JobError, InvalidMessage) as e:
+        logger.warning(f"Job {job.id} failed: {e}")
+        job.finish(str(e))
+    except Exception as e:
+        logger.error(f"Error in analysis job {job.id}: {e}", exc_info=True)
+        job.finish("Internal server error during analysis")
+
+
+job_store = JobStore()
@@ -0,0 +1,216 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Label values of one sample, in the order of the metric's `labels`
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    """
+    One metric family in the Prometheus text format. Values are updated
+    once per stage or batch, never per message, so a lock is cheap enough.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set_total(self, value: float, *labels: str) -> None:
+        """Mirror a count kept elsewhere, such as a cache's hit counter."""
+        with self.lock:
+            self.values[labels] = value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        with self.lock:
+            self.values[labels] = value
+
+
+class Summary(Metric):
+    """Count and sum of observations, e.g. seconds spent in a stage."""
+
+    kind = "summary"
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self.lock:
+            count, total = self.values.get(labels, (0, 0.0))
+            self.values[labels] = (count + 1, total + value)
+
+    def _samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for key, (count, total) in items:
+            yield f"{self.name}_count", key, count
+            yield f"{self.name}_sum", key, total
+
+
+class Registry:
+    """
+    Metrics to expose, plus collectors that refresh gauges from live
+    objects (pools, caches) when the metrics are scraped.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+PARSE_SECONDS = registry.register(Summary(
+    "chatviz_parse_seconds", "Time spent parsing exports"))
+PARSE_LINES = registry.register(Counter(
+    "chatviz_parse_lines_total", "Export lines read by the parser"))
+PARSE_MESSAGES = registry.register(Counter(
+    "chatviz_parse_messages_total", "Messages produced by the parser"))
+PARSE_SKIPPED_LINES = registry.register(Counter(
+    "chatviz_parse_skipped_lines_total", "Non-blank export lines that were not a message"))
+PARSE_LINES_PER_SECOND = registry.register(Gauge(
+    "chatviz_parse_lines_per_second", "Parser throughput of the most recent export"))
+
+ANALYSIS_SECONDS = registry.register(Summary(
+    "chatviz_analysis_seconds", "Time spent in each analysis", ("analysis",)))
+ANALYSIS_MESSAGES = registry.register(Counter(
+    "chatviz_analysis_messages_total", "Messages fed to the analyses"))
+ANALYSIS_FAILURES = registry.register(Counter(
+    "chatviz_analysis_failures_total", "Analyses that failed and reported None", ("analysis",)))
+ANALYSIS_MESSAGES_PER_SECOND = registry.register(Gauge(
+    "chatviz_analysis_messages_per_second", "Throughput of the most recent complete analysis"))
+
+
+_thread_state = threading.local()
+
+
+@contextmanager
+def unrecorded():
+    """
+    Keep work done on this thread inside the block, such as the warm-up's,
+    out of the metrics; other threads keep recording.
+    """
+    _thread_state.unrecorded = True
+    try:
+        yield
+    finally:
+        _thread_state.unrecorded = False
+
+
+def recording() -> bool:
+    """Whether work on this thread counts towards the metrics (see unrecorded)."""
+    return not getattr(_thread_state, "unrecorded", False)
+
+
+def record_parse(lines: int, messages: int, skipped: int, seconds: float) -> None:
+    if not recording():
+        return
+    PARSE_SECONDS.observe(seconds)
+    PARSE_LINES.inc(lines)
+    PARSE_MESSAGES.inc(messages)
+    PARSE_SKIPPED_LINES.inc(skipped)
+    if seconds > 0:
+        PARSE_LINES_PER_SECOND.set(lines / seconds)
+
+
+def record_analyses(messages: int, timings: Dict[str, float], results: Dict,
+                    wall_seconds: Optional[float] = None) -> None:
+    if not recording():
+        return
+    ANALYSIS_MESSAGES.inc(messages)
+    for name, seconds in timings.items():
+        ANALYSIS_SECONDS.observe(seconds, name)
+    for name, result in results.items():
+        if result is None:
+            ANALYSIS_FAILURES.inc(1, name)
+    if messages and wall_seconds:
+        ANALYSIS_MESSAGES_PER_SECOND.set(messages / wall_seconds)
+
+
+class Profile:
+    """
+    Timing breakdown of one request: named stages plus the seconds each
+    analysis took. Building one costs a few clock reads per request; it is
+    only returned to the client when asked for.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.analyses = {}
+        self.details = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def report(self) -> Dict:
+        return {
+            "total_seconds": self.elapsed(),
+            "stages": dict(self.stages),
+            "analyses": dict(self.analyses),
+            **self.details,
+        }
@@ -1,93 +1,268 @@
+import codecs
+import itertools
 import re
+import time
 from datetime import datetime
-from typing import List, Dict
-import emoji
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+from .emojis import find_emojis
+from .metrics import record_parse
+from .table import EPOCH, MessageTable, MessageTableBuilder, legacy_message
+
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024
+
+# Enhanced pattern to catch system messages and media. The timestamp is split
+# into day/month (in export order), year, hour, minute, optional second and
+# the a/p of an optional am/pm marker.
+LINE_PATTERN = re.compile(
+    r'(\d{1,2})/(\d{1,2})/(\d{2,4}),\s*(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\s*([AaPp])[Mm])?'
+    r'\s*-\s*(?:([^:]+):\s*)?(.+)'
+)
+MENTION_PATTERN = re.compile(r'@\w+')
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+# Date orders a WhatsApp export can use, depending on the phone's locale
+DAY_FIRST = "day_first"
+MONTH_FIRST = "month_first"
+# Lines held back waiting for a date that settles the date order. An export
+# without one in its first lines is read day-first, so one whose dates are
+# all ambiguous (day and month both 12 or less) is not held whole.
+DATE_ORDER_MAX_HELD_LINES = 5000
+
 class MessageType:
     NORMAL = "normal"
     MEDIA = "media"
     SYSTEM = "system"
     DELETED = "deleted"
 
+class LineSplitter:
+    """
+    Turns a stream of byte chunks into complete text lines.
+
+    UTF-8 is decoded incrementally, so multi-byte characters and lines split
+    across chunk boundaries come out whole.
+    """
+
+    def __init__(self, encoding: str = "utf-8"):
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.pending = ""
+
+    def feed(self, chunk: bytes) -> List[str]:
+        lines = (self.pending + self.decoder.decode(chunk)).split("\n")
+        self.pending = lines.pop()
+        return lines
+
+    def close(self) -> List[str]:
+        tail = self.pending + self.decoder.decode(b"", final=True)
+        self.pending = ""
+        return [tail] if tail else []
+
+def iter_chunk_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    splitter = LineSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+def line_date_order(line: str) -> Optional[str]:
+    """
+    The date order `line` settles, if any: a first field above 12 means
+    day-first and a second field above 12 means month-first.
+    """
+    match = LINE_PATTERN.match(line.strip())
+    if match:
+        if int(match.group(1)) > 12:
+            return DAY_FIRST
+        if int(match.group(2)) > 12:
+            return MONTH_FIRST
+    return None
+
+def detect_date_order(lines: Iterable[str]) -> str:
+    """
+    Decide whether an export writes dates day- or month-first, from its
+    first date that settles it. Exports where every date is ambiguous are
+    read day-first.
+    """
+    for line in lines:
+        order = line_date_order(line)
+        if order is not None:
+            return order
+    return DAY_FIRST
+
+@lru_cache(maxsize=4096)
+def _day_start(year: int, month: int, day: int) -> int:
+    # Raises ValueError for impossible dates; exceptions are not cached
+    return (datetime(year, month, day) - EPOCH).days * 86400
+
+def decode_timestamp(first: str, second: str, year: str, hour: str, minute: str,
+                     second_of_minute: Optional[str], meridiem: Optional[str], date_order: str) -> int:
+    """
+    Turn the timestamp groups of LINE_PATTERN into epoch seconds.
+
+    Dates go through a small cache of day starts, so strptime never runs per
+    line. Two-digit years follow strptime's %y (69-99 are 1900s). Raises
+    ValueError for out-of-range fields.
+    """
+    if date_order == DAY_FIRST:
+        day, month = int(first), int(second)
+    else:
+        month, day = int(first), int(second)
+
+    if len(year) == 2:
+        year = int(year)
+        year += 2000 if year < 69 else 1900
+    elif len(year) == 4:
+        year = int(year)
+    else:
+        raise ValueError(f"unsupported year {year!r}")
+
+    hour, minute = int(hour), int(minute)
+    seconds = int(second_of_minute) if second_of_minute else 0
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"hour {hour} out of range for 12-hour clock")
+        hour = hour % 12 + (12 if meridiem in "Pp" else 0)
+    elif hour > 23:
+        raise ValueError(f"hour {hour} out of range")
+    if minute > 59 or seconds > 59:
+        raise ValueError("minute or second out of range")
+
+    return _day_start(year, month, day) + hour * 3600 + minute * 60 + seconds
+
+def parse_line(line: str, line_number: int, date_order: str = DAY_FIRST) -> Optional[Tuple]:
+    """
+    Parse one export line into a message row (the arguments of
+    MessageTableBuilder.append), or None for blank and unparseable lines.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    match = LINE_PATTERN.match(line)
+    if not match:
+        # Usually the continuation of a multi-line message; counted in the
+        # parse metrics rather than logged
+        logger.debug("Line %d: No match found - %.50s", line_number, line)
+        return None
+
+    first, second, year, hour, minute, second_of_minute, meridiem, sender, content = match.groups()
+
+    try:
+        timestamp = decode_timestamp(first, second, year, hour, minute, second_of_minute, meridiem, date_order)
+    except ValueError:
+        logger.warning("Line %d: Failed to parse timestamp '%s'",
+                       line_number, line[:match.start(8 if sender else 9)])
+        return None
+
+    # Determine message type
+    msg_type = MessageType.NORMAL
+    if not sender:
+        msg_type = MessageType.SYSTEM
+    elif "<Media omitted>" in content:
+        msg_type = MessageType.MEDIA
+    elif "This message was deleted" in content:
+        msg_type = MessageType.DELETED
+
+    # Extract emojis, whole sequences such as 👍🏽 or 🇮🇳 as one each
+    emojis_list = find_emojis(content)
+
+    # Extract mentions (assuming they start with @)
+    mentions = MENTION_PATTERN.findall(content)
+
+    # Extract URLs
+    urls = URL_PATTERN.findall(content)
+
+    return (
+        timestamp,
+        sender.strip() if sender else None,
+        content.strip(),
+        msg_type,
+        len(content.split()) if msg_type == MessageType.NORMAL else 0,
+        len(content),
+        emojis_list,
+        mentions,
+        urls,
+        "?" in content,
+        "!" in content,
+        content.isupper() if len(content) > 3 else False
+    )
+
+def iter_message_rows(lines: Iterable[str], first_line: int = 1,
+                      date_order: Optional[str] = None) -> Iterator[Tuple]:
+    """
+    Parse `lines` into message rows. Without an explicit `date_order`, the
+    lines are held back until one whose date settles the order (see
+    line_date_order) and then parsed with it, so only the ambiguous lines
+    before it wait. Without such a line in the first
+    DATE_ORDER_MAX_HELD_LINES lines, the export is read day-first.
+    """
+    lines = iter(lines)
+    held = []
+    if date_order is None:
+        for line in lines:
+            held.append(line)
+            date_order = line_date_order(line)
+            if date_order is not None or len(held) >= DATE_ORDER_MAX_HELD_LINES:
+                break
+        date_order = date_order or DAY_FIRST
+
+    for line_number, line in enumerate(itertools.chain(held, lines), start=first_line):
+        row = parse_line(line, line_number, date_order)
+        if row is not None:
+            yield row
+
+def iter_messages(lines: Iterable[str]) -> Iterator[Dict]:
+    """Lazily parse `lines` into message dicts, one at a time."""
+    for row in iter_message_rows(lines):
+        yield legacy_message(*row)
+
 def parse_chat_file(file_content) -> List[Dict]:
-    messages = []
-    
-    # Enhanced pattern to catch system messages and media
-    pattern = r'(\d{1,2}/\d{1,2}/\d{2,4},\s*\d{1,2}:\d{2}(?::\d{2})?(?:\s*[AaPp][Mm])?)\s*-\s*(?:([^:]+):\s*)?(.+)'
-    
-    for line_number, line in enumerate(file_content, start=1):
-        line = line.strip()
-        if not line:
-            continue
-
-        match = re.match(pattern, line)
-        if match:
-            timestamp_str, sender, content = match.groups()
-            logger.debug(f"Line {line_number}: Matched regex - Timestamp: {timestamp_str}, Sender: {sender}, Content: {content[:50]}")
-
-            # Parse timestamp with multiple formats
-            timestamp = None
-            for fmt in ["%d/%m/%y, %I:%M %p", "%d/%m/%y, %H:%M", 
-                        "%d/%m/%Y, %I:%M %p", "%d/%m/%Y, %H:%M"]:
-                try:
-                    timestamp = datetime.strptime(timestamp_str.strip(), fmt)
-                    break
-                except ValueError:
-                    continue
-            
-            if not timestamp:
-                logger.warning(f"Line {line_number}: Failed to parse timestamp '{timestamp_str}'")
-                continue
-
-            # Determine message type
-            msg_type = MessageType.NORMAL
-            if not sender:
-                msg_type = MessageType.SYSTEM
-            elif "<Media omitted>" in content:
-                msg_type = MessageType.MEDIA
-            elif "This message was deleted" in content:
-                msg_type = MessageType.DELETED
-
-            # Extract emojis
-            emojis_list = [c for c in content if c in emoji.EMOJI_DATA]
-
-            # Extract mentions (assuming they start with @)
-            mentions = re.findall(r'@\w+', content)
-
-            # Extract URLs
-            urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', content)
-
-            message = {
-                "timestamp": timestamp.isoformat(),
-                "date": timestamp.date().isoformat(),
-                "time": timestamp.time().isoformat(),
-                "hour": timestamp.hour,
-                "minute": timestamp.minute,
-                "day_of_week": timestamp.weekday(),
-                "sender": sender.strip() if sender else None,
-                "content": content.strip(),
-                "type": msg_type,
-                "word_count": len(content.split()) if msg_type == MessageType.NORMAL else 0,
-                "character_count": len(content),
-                "emojis": emojis_list,
-                "emoji_count": len(emojis_list),
-                "mentions": mentions,
-                "urls": urls,
-                "has_question": "?" in content,
-                "has_exclamation": "!" in content,
-                "is_caps": content.isupper() if len(content) > 3 else False
-            }
-
-            logger.debug(f"Line {line_number}: Parsed message - {message}")
-
-            messages.append(message)
-        else:
-            logger.warning(f"Line {line_number}: No match found - {line[:50]}")
-
-    logger.info(f"Parsing complete: {len(messages)} messages extracted.")
-    return messages
+    return list(iter_messages(file_content))
+
+def parse_chat_table(file_content) -> MessageTable:
+    builder = MessageTableBuilder()
+    for row in iter_message_rows(file_content):
+        builder.append(*row)
+
+    logger.info(f"Parsing complete: {len(builder)} messages extracted.")
+    return builder.build()
+
+def parse_chunks(chunks: Iterable[bytes]) -> MessageTable:
+    """
+    Parse an export arriving as byte chunks, so the raw bytes and decoded
+    text are never held in memory all at once. Only lines before the first
+    date that settles the date order are held, up to
+    DATE_ORDER_MAX_HELD_LINES of them (see iter_message_rows).
+    """
+    started = time.perf_counter()
+    builder = MessageTableBuilder()
+    splitter = LineSplitter()
+    line_count = 0
+
+    def chunk_lines() -> Iterator[List[str]]:
+        nonlocal line_count
+        for chunk in chunks:
+            lines = splitter.feed(chunk)
+            line_count += len(lines)
+            yield lines
+        lines = splitter.close()
+        line_count += len(lines)
+        yield lines
+
+    for row in iter_message_rows(itertools.chain.from_iterable(chunk_lines())):
+        builder.append(*row)
+
+    seconds = time.perf_counter() - started
+    record_parse(line_count, len(builder), line_count - len(builder), seconds)
+    logger.info(f"Parsing complete: {len(builder)} messages extracted in {seconds:.3f}s.")
+    return builder.build()
+
+def parse_stream(stream, chunk_size: int = CHUNK_SIZE) -> MessageTable:
+    """
+    Parse a binary file object (such as an UploadFile's underlying `file`)
+    chunk by chunk. This blocks, so the routers run it on a work pool.
+    """
+    return parse_chunks(iter(lambda: stream.read(chunk_size), b""))
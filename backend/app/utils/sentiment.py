@@ -0,0 +1,195 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .metrics import recording
+
+logger = logging.getLogger(__name__)
+
+# "textblob" scores every distinct message with TextBlob. "lexicon" scores
+# plain-word messages with a vectorized lookup in TextBlob's own lexicon and
+# hands everything else to TextBlob, with identical polarities.
+SENTIMENT_BACKEND = os.environ.get("SENTIMENT_BACKEND", "textblob")
+SENTIMENT_CACHE_SIZE = int(os.environ.get("SENTIMENT_CACHE_SIZE", 100_000))
+
+# Messages made only of letters and single spaces tokenize to exactly their
+# words in TextBlob, which is what lets the lexicon path skip its tokenizer.
+PLAIN_WORDS_PATTERN = re.compile(r'[A-Za-z]+(?: [A-Za-z]+)*')
+
+
+@lru_cache(maxsize=None)
+def _textblob():
+    # TextBlob pulls in nltk, so it is imported on first use rather than
+    # by every process that loads the analytics
+    from textblob import TextBlob
+    return TextBlob
+
+
+def textblob_polarity(text: str) -> float:
+    return _textblob()(text).sentiment.polarity
+
+
+class LexiconScorer:
+    """
+    Vectorized polarity for plain-word messages using TextBlob's lexicon.
+
+    TextBlob's polarity is the mean polarity of the known words, adjusted
+    for negations, modifiers ("very"), exclamation marks and emoticons. A
+    message with none of those scores exactly the plain mean, which is
+    computed here for a whole batch with np.bincount. Everything else is
+    reported as unsupported and falls back to TextBlob.
+    """
+
+    def __init__(self):
+        from textblob.en import sentiment as lexicon
+
+        lexicon.load()
+        self.word_ids = {}
+        polarities = []
+        self.modifiers = set()
+        for word, entries in lexicon.items():
+            if any(pos in entries for pos in lexicon.modifiers):
+                self.modifiers.add(word)
+            self.word_ids[word] = len(polarities)
+            polarities.append(entries[None][0])
+        self.polarities = np.array(polarities, dtype=np.float64)
+        self.blocked = self.modifiers | set(lexicon.negations)
+
+    def supports(self, text: str) -> bool:
+        return PLAIN_WORDS_PATTERN.fullmatch(text) is not None
+
+    def score_many(self, texts: Sequence[str]) -> List[Optional[float]]:
+        """Polarity per text, or None where the text needs the full TextBlob rules."""
+        word_ids, blocked = self.word_ids, self.blocked
+        rows, ids = [], []
+        supported = []
+        for index, text in enumerate(texts):
+            if not self.supports(text):
+                supported.append(False)
+                continue
+            words = text.lower().split()
+            if blocked.intersection(words):
+                supported.append(False)
+                continue
+            supported.append(True)
+            for word in words:
+                word_id = word_ids.get(word)
+                if word_id is not None:
+                    rows.append(index)
+                    ids.append(word_id)
+
+        totals = np.bincount(rows, weights=self.polarities[ids], minlength=len(texts)) if rows else np.zeros(len(texts))
+        counts = np.bincount(rows, minlength=len(texts)) if rows else np.zeros(len(texts), dtype=np.int64)
+        return [
+            float(total / (count or 1)) if ok else None
+            for ok, total, count in zip(supported, totals.tolist(), counts.tolist())
+        ]
+
+
+class SentimentScorer:
+    """
+    Polarity scoring with a content-keyed LRU cache shared across chats.
+
+    `score_many` deduplicates a batch, serves repeats from the cache and
+    scores only the unseen strings, so repeated short messages ("ok",
+    "lol") are scored once.
+    """
+
+    def __init__(self, backend: str = SENTIMENT_BACKEND, max_entries: int = SENTIMENT_CACHE_SIZE):
+        if backend not in ("textblob", "lexicon"):
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+        self.backend = backend
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.lexicon = None
+        self.hits = 0
+        self.misses = 0
+        self.lexicon_scored = 0
+
+    def _lookup(self, texts: Sequence[str]) -> Dict[str, float]:
+        """Cached scores of the (distinct) `texts`, counting each found one as a hit and the rest as misses."""
+        found = {}
+        with self.lock:
+            for text in texts:
+                if text in self.cache:
+                    self.cache.move_to_end(text)
+                    found[text] = self.cache[text]
+            if recording():
+                self.hits += len(found)
+                self.misses += len(texts) - len(found)
+        return found
+
+    def _store(self, scores: Dict[str, Optional[float]]) -> None:
+        # Work kept out of the metrics (the warm-up's sample chat) stays
+        # out of the cache as well, which then reports what requests did
+        if not recording():
+            return
+        with self.lock:
+            for text, score in scores.items():
+                if score is None:
+                    continue
+                self.cache[text] = score
+                self.cache.move_to_end(text)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+    def _score_unique(self, texts: List[str]) -> Dict[str, Optional[float]]:
+        scores = {}
+        if self.backend == "lexicon":
+            if self.lexicon is None:
+                self.lexicon = LexiconScorer()
+            for text, score in zip(texts, self.lexicon.score_many(texts)):
+                if score is not None:
+                    scores[text] = score
+            with self.lock:
+                self.lexicon_scored += len(scores)
+
+        for text in texts:
+            if text in scores:
+                continue
+            try:
+                scores[text] = textblob_polarity(text)
+            except Exception as e:
+                logger.warning(f"Failed to analyze sentiment: {str(e)}")
+                scores[text] = None
+        return scores
+
+    def score_many(self, texts: Sequence[str]) -> List[Optional[float]]:
+        """Polarity per text, None where scoring failed."""
+        unique = list(dict.fromkeys(texts))
+        scores = self._lookup(unique)
+        missing = [text for text in unique if text not in scores]
+
+        if missing:
+            fresh = self._score_unique(missing)
+            self._store(fresh)
+            scores.update(fresh)
+        return [scores[text] for text in texts]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "lexicon_scored": self.lexicon_scored,
+            "cache_entries": len(self.cache),
+        }
+
+
+_default_scorer = None
+
+
+def get_scorer() -> SentimentScorer:
+    global _default_scorer
+    if _default_scorer is None:
+        _default_scorer = SentimentScorer()
+    return _default_scorer
@@ -0,0 +1,72 @@
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .table import MessageTable
+
+# A gap longer than this between two messages ends a conversation; replies
+# (a message from someone other than the previous sender) are only timed
+# within one
+SESSION_IDLE_SECONDS = int(os.environ.get("SESSION_IDLE_SECONDS", 60 * 60))
+# A message closer than this to the previous one continues a burst
+BURST_WINDOW_SECONDS = int(os.environ.get("BURST_WINDOW_SECONDS", 5 * 60))
+
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def _gaps(batch: MessageTable) -> np.ndarray:
+    return np.diff(batch.timestamps)
+
+
+def _sender_changes(batch: MessageTable) -> np.ndarray:
+    codes = batch.sender_codes
+    previous, current = codes[:-1], codes[1:]
+    return (previous >= 0) & (current >= 0) & (previous != current)
+
+
+def adjacent_pairs(batch: MessageTable, previous_timestamp: Optional[int] = None,
+                   previous_sender: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Seconds since the previous message, and whether its sender differs
+    (both messages having one), for each message of `batch` after the
+    first; for the first too when the previous batch's last message is
+    given. The within-batch part is computed once and shared by the
+    analyses reading the batch.
+    """
+    gaps = batch.shared("gaps", _gaps)
+    changes = batch.shared("sender_changes", _sender_changes)
+    if previous_timestamp is None:
+        return gaps, changes
+    first = int(batch.sender_codes[0])
+    change = previous_sender >= 0 and first >= 0 and previous_sender != first
+    return (np.concatenate(([batch.timestamps[0] - previous_timestamp], gaps)),
+            np.concatenate(([change], changes)))
+
+
+def summarize(values: np.ndarray) -> Dict:
+    if not len(values):
+        return {"mean": 0, "median": 0, "max": 0}
+    return {"mean": float(values.mean()), "median": float(np.median(values)), "max": int(values.max())}
+
+
+def grouped_percentiles(groups: np.ndarray, values: np.ndarray,
+                        percentiles: Sequence[int] = LATENCY_PERCENTILES) -> Dict[int, Dict]:
+    """
+    Count and `percentiles` of `values` for each (non-negative) group code,
+    in linear time: a radix sort by group, then selection within each.
+    """
+    if not len(values):
+        return {}
+    # numpy sorts 16-bit integers stably with a radix sort
+    keys = groups.astype(np.int16) if groups.max() < np.iinfo(np.int16).max else groups
+    ordered = values[np.argsort(keys, kind="stable")]
+    counts = np.bincount(groups)
+    ends = np.cumsum(counts)
+    result = {}
+    for group in np.flatnonzero(counts).tolist():
+        segment = ordered[ends[group] - counts[group]:ends[group]]
+        points = np.percentile(segment, percentiles)
+        result[group] = {"count": int(counts[group]),
+                         **{f"p{p}": float(value) for p, value in zip(percentiles, points)}}
+    return result
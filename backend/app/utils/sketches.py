@@ -0,0 +1,92 @@
+import os
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# "exact" counts every word, emoji and domain of a chat (the original
+# behaviour); "sketch" keeps a bounded heavy-hitter summary of each instead,
+# tokenizing batch by batch rather than through the shared features, so the
+# frequencies' memory no longer grows with a huge chat's vocabulary. The
+# readability and topics analyses still build the features when selected.
+FREQUENCY_MODE = os.environ.get("FREQUENCY_MODE", "exact")
+# Items each summary keeps in "sketch" mode. Counts are exact until a chat
+# has more distinct items than this; past it, every reported count is at
+# most total / (FREQUENCY_SKETCH_SIZE + 1) below the true one.
+FREQUENCY_SKETCH_SIZE = int(os.environ.get("FREQUENCY_SKETCH_SIZE", 20_000))
+
+FREQUENCY_MODES = ("exact", "sketch")
+
+
+class HeavyHitters(Counter):
+    """
+    Misra-Gries summary of weighted item counts, as a Counter that never
+    holds more than `capacity` items between updates.
+
+    Each `add_counts` call merges its counts in and, when that leaves more
+    than `capacity` items, subtracts the (capacity + 1)-th largest count
+    from all of them and drops those left at zero or below. A kept count is
+    therefore a lower bound of the true one, by at most `max_error` (the
+    sum of the amounts subtracted), and any item making up more than
+    1 / (capacity + 1) of `total` is always kept. Until the first pruning
+    the counts, and their order for ties, are those of a plain Counter.
+    """
+
+    def __init__(self, capacity: int = FREQUENCY_SKETCH_SIZE):
+        super().__init__()
+        if capacity < 1:
+            raise ValueError(f"Sketch capacity must be positive: {capacity}")
+        self.capacity = capacity
+        self.total = 0
+        self.max_error = 0
+
+    def __reduce__(self):
+        # Counter pickles as a plain dict of counts; keep the bounds too
+        return self.__class__, (self.capacity,), self.__dict__, None, iter(self.items())
+
+    def add_counts(self, pairs: Iterable[Tuple[object, int]]) -> None:
+        for item, count in pairs:
+            self[item] += count
+            self.total += count
+        if len(self) > self.capacity:
+            self._prune()
+
+    def merge(self, other: Counter) -> None:
+        """Fold in another summary or exact counts; the errors of the two add up."""
+        self.add_counts(other.items())
+        if isinstance(other, HeavyHitters):
+            self.total += other.total - sum(other.values())
+            self.max_error += other.max_error
+
+    def _prune(self) -> None:
+        counts = np.fromiter(self.values(), dtype=np.int64, count=len(self))
+        threshold = int(np.partition(counts, len(counts) - self.capacity - 1)[len(counts) - self.capacity - 1])
+        survivors = [(item, count - threshold) for item, count in self.items() if count > threshold]
+        self.clear()
+        dict.update(self, survivors)
+        self.max_error += threshold
+
+    def bounds(self) -> Dict:
+        """How far the counts may be off: each is low by at most `max_error`, out of `total`."""
+        return {"capacity": self.capacity, "total": self.total, "max_error": self.max_error,
+                "exact": self.max_error == 0}
+
+
+class ExactCounts(Counter):
+    """A plain Counter with the `add_counts` interface of HeavyHitters."""
+
+    def add_counts(self, pairs: Iterable[Tuple[object, int]]) -> None:
+        for item, count in pairs:
+            self[item] += count
+
+    def merge(self, other: Counter) -> None:
+        self.add_counts(other.items())
+
+
+def frequency_counter(mode: str = FREQUENCY_MODE, capacity: Optional[int] = None) -> Counter:
+    """Counter of item frequencies for `mode`: exact, or a HeavyHitters summary."""
+    if mode not in FREQUENCY_MODES:
+        raise ValueError(f"Unknown frequency mode: {mode}")
+    if mode == "exact":
+        return ExactCounts()
+    return HeavyHitters(FREQUENCY_SKETCH_SIZE if capacity is None else capacity)
@@ -0,0 +1,366 @@
+import functools
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .table import MessageTable, from_epoch
+
+logger = logging.getLogger(__name__)
+
+# Parsed chats are kept here so later questions about them ("what did March
+# look like?", "just these three people") need neither a re-upload nor a
+# re-parse
+CHAT_STORE_DIR = os.environ.get("CHAT_STORE_DIR", os.path.join(tempfile.gettempdir(), "chatviz-chats"))
+# Stored chats kept memory-mapped between requests; the least recently used
+# one is unmapped when another is opened past this
+CHAT_STORE_MAX_OPEN = int(os.environ.get("CHAT_STORE_MAX_OPEN", 64))
+
+# Bump when the file layout changes; chats stored under another version are not read
+CHAT_STORE_VERSION = 1
+
+NUMERIC_COLUMNS = ("timestamps", "sender_codes", "type_codes", "flags", "word_counts", "character_counts",
+                   "content_offsets", "emoji_offsets", "mention_offsets", "url_offsets")
+STRING_COLUMNS = ("content", "emojis", "mentions", "urls")
+
+
+class ChatNotFound(KeyError):
+    pass
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, stop) for each pair, without a Python loop."""
+    counts = stops - starts
+    before = np.cumsum(counts) - counts
+    return np.arange(int(counts.sum()), dtype=np.int64) + np.repeat(starts - before, counts)
+
+
+def _first_appearance_codes(codes: np.ndarray, categories: List[str]):
+    """
+    Renumber category `codes` (-1 for none) by first appearance, as
+    MessageTableBuilder numbers them, with the category list to match.
+    """
+    present = codes >= 0
+    used, first = np.unique(codes[present], return_index=True)
+    order = used[np.argsort(first)]
+    mapping = np.full(max(len(categories), 1), -1, dtype=codes.dtype)
+    mapping[order] = np.arange(len(order), dtype=codes.dtype)
+    return np.where(present, mapping[np.maximum(codes, 0)], -1).astype(codes.dtype), \
+        [categories[code] for code in order.tolist()]
+
+
+def _mapped(method):
+    """Map the chat's files for the duration of `method`, if they were unmapped by `close`."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            if self.columns is None:
+                self._map()
+            self.readers += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            with self.lock:
+                self.readers -= 1
+                if self.closed and not self.readers:
+                    self._unmap()
+    return wrapper
+
+
+class StoredChat:
+    """
+    One chat on disk, opened memory-mapped: every column of its
+    MessageTable as a .npy file, the strings of `content` and the emoji,
+    mention and URL lists as UTF-8 blobs with byte offsets, and two indexes.
+
+    The time index is the row order by timestamp with the timestamps in that
+    order, so a range is two binary searches. The sender index lists each
+    sender's rows, grouped by sender code, so a sender's messages are one
+    slice of it. A query reads only the rows it selects from the mapped
+    files and builds a table of just those messages.
+
+    `close` unmaps the files once the queries running on the chat are done.
+    A query on a closed chat maps them again for its own duration.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.lock = threading.Lock()
+        self.readers = 0
+        self.closed = False
+        self._map()
+
+    def _map(self) -> None:
+        self.columns = {name: self._array(name) for name in NUMERIC_COLUMNS}
+        self.blobs = {name: self._blob(name) for name in STRING_COLUMNS}
+        self.string_offsets = {name: self._array(f"{name}_bytes") for name in STRING_COLUMNS}
+        self.time_order = self._array("time_order")
+        self.sorted_times = self._array("sorted_times")
+        self.sender_rows = self._array("sender_rows")
+        self.sender_starts = self._array("sender_starts")
+
+    def _array(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def _blob(self, name: str):
+        with open(os.path.join(self.directory, f"{name}.bin"), "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _unmap(self) -> None:
+        for blob in self.blobs.values():
+            if isinstance(blob, mmap.mmap):
+                blob.close()
+        # The .npy maps go with the last reference to them
+        self.columns = self.blobs = self.string_offsets = None
+        self.time_order = self.sorted_times = self.sender_rows = self.sender_starts = None
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            if not self.readers and self.columns is not None:
+                self._unmap()
+
+    def __len__(self) -> int:
+        return self.meta["messages"]
+
+    def _strings(self, name: str, items: np.ndarray) -> List[str]:
+        blob, offsets = self.blobs[name], self.string_offsets[name]
+        starts, stops = offsets[items].tolist(), offsets[items + 1].tolist()
+        return [blob[start:stop].decode("utf-8", "surrogatepass") for start, stop in zip(starts, stops)]
+
+    def _content(self, rows: np.ndarray) -> str:
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            # A run of rows, such as a date range of a chat in time order, is one read
+            offsets = self.string_offsets["content"]
+            return self.blobs["content"][offsets[rows[0]]:offsets[rows[-1] + 1]].decode("utf-8", "surrogatepass")
+        return "".join(self._strings("content", rows))
+
+    @_mapped
+    def rows(self, start: Optional[int] = None, end: Optional[int] = None,
+             senders: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Row numbers, in chat order, of the messages sent at or after `start`
+        and before `end` (epoch seconds) by any of `senders`.
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.sorted_times, start, "left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.sorted_times, end, "left"))
+        if senders is None:
+            return np.sort(self.time_order[lo:max(lo, hi)])
+
+        codes = [self.meta["senders"].index(name) for name in senders if name in self.meta["senders"]]
+        if start is not None or end is not None:
+            in_range = hi - lo
+            by_sender = sum(int(self.sender_starts[code + 1] - self.sender_starts[code]) for code in codes)
+            if in_range < by_sender:
+                # Fewer messages in the range than from the senders: check the
+                # range's rows for the senders instead
+                rows = np.sort(self.time_order[lo:max(lo, hi)])
+                return rows[np.isin(self.columns["sender_codes"][rows], codes)]
+
+        rows = np.sort(np.concatenate(
+            [self.sender_rows[self.sender_starts[code]:self.sender_starts[code + 1]] for code in codes]
+            or [np.empty(0, dtype=np.int64)]))
+        times = self.columns["timestamps"][rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= times >= start
+        if end is not None:
+            keep &= times < end
+        return rows[keep]
+
+    @_mapped
+    def table(self, rows: Optional[np.ndarray] = None) -> MessageTable:
+        """The messages at `rows` (all of them when None) as a MessageTable."""
+        if rows is None:
+            rows = np.arange(len(self))
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = self.columns
+
+        def take(name):
+            return np.ascontiguousarray(columns[name][rows])
+
+        def lists(name, offsets_name):
+            offsets = columns[offsets_name]
+            starts, stops = offsets[rows], offsets[rows + 1]
+            row_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(stops - starts, out=row_offsets[1:])
+            return self._strings(name, _ranges(starts, stops)), row_offsets
+
+        sender_codes, senders = _first_appearance_codes(take("sender_codes"), self.meta["senders"])
+        content_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(columns["content_offsets"][rows + 1] - columns["content_offsets"][rows], out=content_offsets[1:])
+        emojis, emoji_offsets = lists("emojis", "emoji_offsets")
+        mentions, mention_offsets = lists("mentions", "mention_offsets")
+        urls, url_offsets = lists("urls", "url_offsets")
+        return MessageTable(
+            timestamps=take("timestamps"),
+            sender_codes=sender_codes,
+            senders=senders,
+            type_codes=take("type_codes"),
+            types=list(self.meta["types"]),
+            flags=take("flags"),
+            word_counts=take("word_counts"),
+            character_counts=take("character_counts"),
+            content=self._content(rows),
+            content_offsets=content_offsets,
+            emojis=emojis,
+            emoji_offsets=emoji_offsets,
+            mentions=mentions,
+            mention_offsets=mention_offsets,
+            urls=urls,
+            url_offsets=url_offsets,
+        )
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None,
+              senders: Optional[Sequence[str]] = None) -> MessageTable:
+        if start is None and end is None and senders is None:
+            return self.table()
+        return self.table(self.rows(start, end, senders))
+
+    def info(self) -> Dict:
+        return dict(self.meta)
+
+
+def _write_strings(directory: str, name: str, strings) -> None:
+    offsets = [0]
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for string in strings:
+            encoded = string.encode("utf-8", "surrogatepass")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(os.path.join(directory, f"{name}_bytes.npy"), np.array(offsets, dtype=np.int64))
+
+
+class ChatStore:
+    """
+    Parsed chats by id, one StoredChat directory each under `directory`.
+    The id is derived from the messages, so storing the same chat again
+    returns the id it already has. The `max_open` most recently used chats
+    are kept mapped; older ones are closed.
+    """
+
+    def __init__(self, directory: str = CHAT_STORE_DIR, max_open: int = CHAT_STORE_MAX_OPEN):
+        self.directory = directory
+        self.max_open = max_open
+        self.open_chats = OrderedDict()  # chat id -> StoredChat, least recently used first
+        self.lock = threading.Lock()
+
+    def _path(self, chat_id: str) -> str:
+        return os.path.join(self.directory, chat_id)
+
+    def save(self, table: MessageTable) -> str:
+        chat_id = table.fingerprint()[:32]
+        path = self._path(chat_id)
+        if os.path.isdir(path):
+            return chat_id
+
+        started = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            # Columns of a slice may start at a non-zero offset into the shared buffers
+            base = {"content_offsets": 0, "emoji_offsets": 0, "mention_offsets": 0, "url_offsets": 0}
+            for name in NUMERIC_COLUMNS:
+                column = getattr(table, name)
+                if name in base:
+                    column = column - column[0]
+                np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(column))
+            _write_strings(staging, "content", table.iter_content(np.arange(len(table))))
+            for name, offsets in (("emojis", table.emoji_offsets), ("mentions", table.mention_offsets),
+                                  ("urls", table.url_offsets)):
+                _write_strings(staging, name, getattr(table, name)[offsets[0]:offsets[-1]])
+
+            time_order = np.argsort(table.timestamps, kind="stable")
+            np.save(os.path.join(staging, "time_order.npy"), time_order)
+            np.save(os.path.join(staging, "sorted_times.npy"), table.timestamps[time_order])
+            with_sender = np.flatnonzero(table.sender_codes >= 0)
+            sender_rows = with_sender[np.argsort(table.sender_codes[with_sender], kind="stable")]
+            counts = np.bincount(table.sender_codes[with_sender], minlength=len(table.senders))
+            sender_starts = np.zeros(len(table.senders) + 1, dtype=np.int64)
+            np.cumsum(counts, out=sender_starts[1:])
+            np.save(os.path.join(staging, "sender_rows.npy"), sender_rows)
+            np.save(os.path.join(staging, "sender_starts.npy"), sender_starts)
+
+            meta = {
+                "chat_id": chat_id,
+                "version": CHAT_STORE_VERSION,
+                "messages": len(table),
+                "senders": list(table.senders),
+                "types": list(table.types),
+                "first_timestamp": from_epoch(table.timestamps.min()).isoformat() if len(table) else None,
+                "last_timestamp": from_epoch(table.timestamps.max()).isoformat() if len(table) else None,
+                "stored_at": time.time(),
+            }
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            try:
+                os.rename(staging, path)
+            except OSError:
+                # Stored concurrently by another request
+                if not os.path.isdir(path):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        logger.info(f"Stored chat {chat_id}: {len(table)} messages in {time.perf_counter() - started:.3f}s")
+        return chat_id
+
+    def _meta(self, chat_id: str) -> Dict:
+        path = os.path.join(self._path(chat_id), "meta.json")
+        if not chat_id.isalnum() or not os.path.isfile(path):
+            raise ChatNotFound(chat_id)
+        with open(path) as f:
+            meta = json.load(f)
+        if meta.get("version") != CHAT_STORE_VERSION:
+            raise ChatNotFound(chat_id)
+        return meta
+
+    def get(self, chat_id: str) -> StoredChat:
+        with self.lock:
+            chat = self.open_chats.get(chat_id)
+            if chat is not None:
+                self.open_chats.move_to_end(chat_id)
+                return chat
+            self._meta(chat_id)
+            chat = self.open_chats[chat_id] = StoredChat(self._path(chat_id))
+            while len(self.open_chats) > max(1, self.max_open):
+                _, evicted = self.open_chats.popitem(last=False)
+                evicted.close()
+        return chat
+
+    def delete(self, chat_id: str) -> None:
+        self._meta(chat_id)
+        with self.lock:
+            chat = self.open_chats.pop(chat_id, None)
+        if chat is not None:
+            chat.close()
+        shutil.rmtree(self._path(chat_id), ignore_errors=True)
+
+    def list(self) -> List[Dict]:
+        chats = []
+        if not os.path.isdir(self.directory):
+            return chats
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and not entry.name.startswith("."):
+                try:
+                    # Read from meta.json, so listing does not map every chat
+                    chats.append(self._meta(entry.name))
+                except (ChatNotFound, OSError, ValueError):
+                    continue
+        return sorted(chats, key=lambda meta: meta["stored_at"])
+
+
+chat_store = ChatStore()
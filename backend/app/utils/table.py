@@ -0,0 +1,419 @@
+import hashlib
+import json
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .features import MessageFeatures, compute_features
+
+EPOCH = datetime(1970, 1, 1)
+
+# Bits of MessageTable.flags
+FLAG_QUESTION = 1
+FLAG_EXCLAMATION = 2
+FLAG_CAPS = 4
+
+# Fixed type codes for the parser's message types; anything else coming in
+# through the JSON API is appended to the table's own category list.
+MESSAGE_TYPES = ("normal", "media", "system", "deleted")
+
+
+class InvalidMessage(ValueError):
+    """A message of the JSON API that cannot be loaded, e.g. for a malformed timestamp."""
+
+
+def to_epoch(timestamp: datetime) -> int:
+    return (timestamp - EPOCH) // timedelta(seconds=1)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    An ISO timestamp as the naive local time the table stores. An offset is
+    dropped rather than converted, keeping the time of day the message was
+    written at, as the exports themselves have it.
+    """
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        raise InvalidMessage(f"Invalid timestamp: {value!r}") from None
+
+
+def from_epoch(seconds: int) -> datetime:
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+def legacy_message(timestamp: int, sender: Optional[str], content: str, msg_type: str,
+                   word_count: int, character_count: int, emojis: List[str], mentions: List[str],
+                   urls: List[str], has_question: bool, has_exclamation: bool, is_caps: bool) -> Dict:
+    """Expand one row (the arguments of MessageTableBuilder.append) into the JSON API dict."""
+    moment = from_epoch(timestamp)
+    return {
+        "timestamp": moment.isoformat(),
+        "date": moment.date().isoformat(),
+        "time": moment.time().isoformat(),
+        "hour": moment.hour,
+        "minute": moment.minute,
+        "day_of_week": moment.weekday(),
+        "sender": sender,
+        "content": content,
+        "type": msg_type,
+        "word_count": word_count,
+        "character_count": character_count,
+        "emojis": emojis,
+        "emoji_count": len(emojis),
+        "mentions": mentions,
+        "urls": urls,
+        "has_question": has_question,
+        "has_exclamation": has_exclamation,
+        "is_caps": is_caps
+    }
+
+
+def _ragged(values: list, offsets: np.ndarray) -> List[list]:
+    offsets = offsets.tolist()
+    return [values[start:stop] for start, stop in zip(offsets, offsets[1:])]
+
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8", "surrogatepass")
+
+
+class MessageTableBuilder:
+    """Collects messages row by row and freezes them into a MessageTable."""
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.sender_codes = array("i")
+        self.sender_index = {}
+        self.type_codes = array("b")
+        self.type_index = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+        self.flags = array("B")
+        self.word_counts = array("i")
+        self.character_counts = array("i")
+        self.content = []
+        self.content_offsets = array("q", [0])
+        self.emojis = []
+        self.emoji_offsets = array("q", [0])
+        self.mentions = []
+        self.mention_offsets = array("q", [0])
+        self.urls = []
+        self.url_offsets = array("q", [0])
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, sender: Optional[str], content: str, msg_type: str,
+               word_count: int, character_count: int, emojis: List[str], mentions: List[str],
+               urls: List[str], has_question: bool, has_exclamation: bool, is_caps: bool) -> None:
+        if sender:
+            code = self.sender_index.get(sender)
+            if code is None:
+                code = self.sender_index[sender] = len(self.sender_index)
+        else:
+            code = -1
+        type_code = self.type_index.get(msg_type)
+        if type_code is None:
+            type_code = self.type_index[msg_type] = len(self.type_index)
+
+        self.timestamps.append(timestamp)
+        self.sender_codes.append(code)
+        self.type_codes.append(type_code)
+        self.flags.append(
+            (FLAG_QUESTION if has_question else 0)
+            | (FLAG_EXCLAMATION if has_exclamation else 0)
+            | (FLAG_CAPS if is_caps else 0)
+        )
+        self.word_counts.append(word_count)
+        self.character_counts.append(character_count)
+        self.content.append(content)
+        self.content_offsets.append(self.content_offsets[-1] + len(content))
+        self.emojis.extend(emojis)
+        self.emoji_offsets.append(len(self.emojis))
+        self.mentions.extend(mentions)
+        self.mention_offsets.append(len(self.mentions))
+        self.urls.extend(urls)
+        self.url_offsets.append(len(self.urls))
+
+    def build(self) -> "MessageTable":
+        return MessageTable(
+            timestamps=np.frombuffer(self.timestamps, dtype=np.int64),
+            sender_codes=np.frombuffer(self.sender_codes, dtype=np.int32),
+            senders=list(self.sender_index),
+            type_codes=np.frombuffer(self.type_codes, dtype=np.int8),
+            types=list(self.type_index),
+            flags=np.frombuffer(self.flags, dtype=np.uint8),
+            word_counts=np.frombuffer(self.word_counts, dtype=np.int32),
+            character_counts=np.frombuffer(self.character_counts, dtype=np.int32),
+            content="".join(self.content),
+            content_offsets=np.frombuffer(self.content_offsets, dtype=np.int64),
+            emojis=self.emojis,
+            emoji_offsets=np.frombuffer(self.emoji_offsets, dtype=np.int64),
+            mentions=self.mentions,
+            mention_offsets=np.frombuffer(self.mention_offsets, dtype=np.int64),
+            urls=self.urls,
+            url_offsets=np.frombuffer(self.url_offsets, dtype=np.int64),
+        )
+
+
+class MessageTable:
+    """
+    Columnar store of parsed messages.
+
+    Timestamps are int64 seconds since 1970-01-01 (the export's local time,
+    no timezone). Senders and types are categorical codes into `senders` and
+    `types`, with sender code -1 for system messages. The question,
+    exclamation and caps booleans are packed into `flags`. Message text lives
+    in one `content` buffer, and emojis, mentions and URLs in flat lists;
+    row i owns `offsets[i]:offsets[i + 1]` of each.
+
+    Slices share the buffers and category lists with the table they were
+    cut from, so offsets are always absolute. Data derived with `shared` is
+    kept per table object and not passed on to slices; the text `features`
+    are, once computed.
+    """
+
+    def __init__(self, timestamps, sender_codes, senders, type_codes, types, flags,
+                 word_counts, character_counts, content, content_offsets,
+                 emojis, emoji_offsets, mentions, mention_offsets, urls, url_offsets,
+                 features: Optional[MessageFeatures] = None):
+        self.timestamps = timestamps
+        self.sender_codes = sender_codes
+        self.senders = senders
+        self.type_codes = type_codes
+        self.types = types
+        self.flags = flags
+        self.word_counts = word_counts
+        self.character_counts = character_counts
+        self.content = content
+        self.content_offsets = content_offsets
+        self.emojis = emojis
+        self.emoji_offsets = emoji_offsets
+        self.mentions = mentions
+        self.mention_offsets = mention_offsets
+        self.urls = urls
+        self.url_offsets = url_offsets
+        self._features = features
+        self._features_lock = threading.Lock()
+        self._shared = {}
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        del state["_features_lock"]
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._features_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def slice(self, start: int, stop: int) -> "MessageTable":
+        return MessageTable(
+            self.timestamps[start:stop], self.sender_codes[start:stop], self.senders,
+            self.type_codes[start:stop], self.types, self.flags[start:stop],
+            self.word_counts[start:stop], self.character_counts[start:stop],
+            self.content, self.content_offsets[start:stop + 1],
+            self.emojis, self.emoji_offsets[start:stop + 1],
+            self.mentions, self.mention_offsets[start:stop + 1],
+            self.urls, self.url_offsets[start:stop + 1],
+            self._features.slice(start, stop) if self._features is not None else None,
+        )
+
+    def fingerprint(self) -> str:
+        """
+        SHA-256 of everything the analyses read, so tables built from the
+        same messages, whether parsed or sent as JSON, hash the same. The
+        first n rows of a table hash like a table of just those messages.
+        """
+        digest = hashlib.sha256()
+        for column in (self.timestamps, self.sender_codes, self.type_codes, self.flags,
+                       self.word_counts, self.character_counts):
+            digest.update(np.ascontiguousarray(column).tobytes())
+        for values, offsets in ((self.content, self.content_offsets), (self.emojis, self.emoji_offsets),
+                                (self.mentions, self.mention_offsets), (self.urls, self.url_offsets)):
+            digest.update((offsets - offsets[0]).tobytes())
+            digest.update(_json_bytes(values[offsets[0]:offsets[-1]]))
+        # Categories are numbered by first appearance, so a prefix of a chat
+        # uses a prefix of its category lists
+        used_senders = int(self.sender_codes.max(initial=-1)) + 1
+        used_types = int(self.type_codes.max(initial=-1)) + 1
+        digest.update(_json_bytes([self.senders[:used_senders], self.types[:used_types]]))
+        return digest.hexdigest()
+
+    # Derived columns
+
+    def hours(self) -> np.ndarray:
+        return (self.timestamps // 3600) % 24
+
+    def days_of_week(self) -> np.ndarray:
+        # 1970-01-01 was a Thursday (weekday 3)
+        return (self.timestamps // 86400 + 3) % 7
+
+    def has_sender(self) -> np.ndarray:
+        return self.sender_codes >= 0
+
+    def is_type(self, msg_type: str) -> np.ndarray:
+        if msg_type not in self.types:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_codes == self.types.index(msg_type)
+
+    def has_flag(self, flag: int) -> np.ndarray:
+        return (self.flags & flag) != 0
+
+    def content_lengths(self) -> np.ndarray:
+        return np.diff(self.content_offsets)
+
+    def emoji_counts(self) -> np.ndarray:
+        return np.diff(self.emoji_offsets)
+
+    def mention_counts(self) -> np.ndarray:
+        return np.diff(self.mention_offsets)
+
+    def url_counts(self) -> np.ndarray:
+        return np.diff(self.url_offsets)
+
+    def features(self) -> MessageFeatures:
+        """
+        Tokens and word statistics of every row. Computed on first use;
+        slices cut afterwards reuse them, so the engine computes them once
+        on the table it is given before cutting it into batches.
+        """
+        if self._features is None:
+            with self._features_lock:
+                if self._features is None:
+                    self._features = compute_features(self)
+        return self._features
+
+    def has_features(self) -> bool:
+        """Whether `features` is already computed, for this table or the one it was sliced from."""
+        return self._features is not None
+
+    def shared(self, name: str, compute: Callable[["MessageTable"], object]):
+        """
+        `compute(self)`, computed on first use and kept under `name`, so the
+        analyses reading one batch share the work and analyses that are not
+        run never cause it.
+        """
+        try:
+            return self._shared[name]
+        except KeyError:
+            value = self._shared[name] = compute(self)
+            return value
+
+    # Row access
+
+    def content_at(self, row: int) -> str:
+        return self.content[self.content_offsets[row]:self.content_offsets[row + 1]]
+
+    def iter_content(self, rows: np.ndarray) -> Iterator[str]:
+        """Yield the content of each row index in `rows`, in order."""
+        content = self.content
+        starts = self.content_offsets[rows].tolist()
+        stops = self.content_offsets[rows + 1].tolist()
+        for start, stop in zip(starts, stops):
+            yield content[start:stop]
+
+    def sender_names(self, rows: np.ndarray) -> List[Optional[str]]:
+        senders = self.senders
+        return [senders[code] if code >= 0 else None for code in self.sender_codes[rows].tolist()]
+
+    def batch_emojis(self) -> List[str]:
+        return self.emojis[self.emoji_offsets[0]:self.emoji_offsets[-1]]
+
+    def batch_urls(self) -> List[str]:
+        return self.urls[self.url_offsets[0]:self.url_offsets[-1]]
+
+    def mentions_at(self, row: int) -> List[str]:
+        return self.mentions[self.mention_offsets[row]:self.mention_offsets[row + 1]]
+
+    # Legacy dict shape
+
+    @classmethod
+    def from_messages(cls, messages: List[Dict]) -> "MessageTable":
+        builder = MessageTableBuilder()
+        for msg in messages:
+            builder.append(
+                to_epoch(parse_timestamp(msg["timestamp"])),
+                msg["sender"],
+                msg["content"],
+                msg["type"],
+                msg.get("word_count", 0),
+                msg.get("character_count", len(msg["content"])),
+                msg.get("emojis", []),
+                msg.get("mentions", []),
+                msg.get("urls", []),
+                msg.get("has_question", False),
+                msg.get("has_exclamation", False),
+                msg.get("is_caps", False),
+            )
+        return builder.build()
+
+    def to_messages(self) -> List[Dict]:
+        """The rows as `legacy_message` dicts, with the timestamp fields derived for all rows at once."""
+        messages = []
+        senders, types = self.senders, self.types
+        content, emojis, mentions, urls = self.content, self.emojis, self.mentions, self.urls
+        # "YYYY-MM-DDTHH:MM:SS", as datetime.isoformat() gives for whole seconds
+        stamps = np.datetime_as_string(self.timestamps.astype("datetime64[s]")).tolist()
+        columns = zip(
+            stamps, self.hours().tolist(), ((self.timestamps // 60) % 60).tolist(),
+            self.days_of_week().tolist(),
+            self.sender_codes.tolist(), self.type_codes.tolist(),
+            self.flags.tolist(), self.word_counts.tolist(), self.character_counts.tolist(),
+            self.content_offsets[:-1].tolist(), self.content_offsets[1:].tolist(),
+            self.emoji_offsets[:-1].tolist(), self.emoji_offsets[1:].tolist(),
+            self.mention_offsets[:-1].tolist(), self.mention_offsets[1:].tolist(),
+            self.url_offsets[:-1].tolist(), self.url_offsets[1:].tolist(),
+        )
+        for (stamp, hour, minute, weekday, sender, type_code, flags, word_count, character_count,
+             c0, c1, e0, e1, m0, m1, u0, u1) in columns:
+            message_emojis = emojis[e0:e1]
+            messages.append({
+                "timestamp": stamp,
+                "date": stamp[:10],
+                "time": stamp[11:],
+                "hour": hour,
+                "minute": minute,
+                "day_of_week": weekday,
+                "sender": senders[sender] if sender >= 0 else None,
+                "content": content[c0:c1],
+                "type": types[type_code],
+                "word_count": word_count,
+                "character_count": character_count,
+                "emojis": message_emojis,
+                "emoji_count": len(message_emojis),
+                "mentions": mentions[m0:m1],
+                "urls": urls[u0:u1],
+                "has_question": bool(flags & FLAG_QUESTION),
+                "has_exclamation": bool(flags & FLAG_EXCLAMATION),
+                "is_caps": bool(flags & FLAG_CAPS)
+            })
+        return messages
+
+    # Columnar shape
+
+    def to_columns(self) -> Dict[str, list]:
+        """
+        The rows as columns: the legacy fields minus the ones derived from
+        `timestamp`, which is epoch seconds here. `sender` and `type` are
+        codes into `senders` and `types`, with sender -1 for system messages.
+        """
+        content, offsets = self.content, self.content_offsets.tolist()
+        return {
+            "timestamp": self.timestamps.tolist(),
+            "sender": self.sender_codes.tolist(),
+            "type": self.type_codes.tolist(),
+            "content": [content[start:stop] for start, stop in zip(offsets, offsets[1:])],
+            "word_count": self.word_counts.tolist(),
+            "character_count": self.character_counts.tolist(),
+            "emojis": _ragged(self.emojis, self.emoji_offsets),
+            "mentions": _ragged(self.mentions, self.mention_offsets),
+            "urls": _ragged(self.urls, self.url_offsets),
+            "has_question": self.has_flag(FLAG_QUESTION).tolist(),
+            "has_exclamation": self.has_flag(FLAG_EXCLAMATION).tolist(),
+            "is_caps": self.has_flag(FLAG_CAPS).tolist(),
+        }
@@ -0,0 +1,230 @@
+import logging
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Sequence
+
+import numpy as np
+
+from .features import MessageFeatures
+
+logger = logging.getLogger(__name__)
+
+# "exact" fits batch LDA on every normal message with an uncapped
+# vocabulary (the original behaviour); "scalable" uses the settings below
+TOPICS_MODE = os.environ.get("TOPICS_MODE", "exact")
+
+# Vocabulary caps: most frequent terms kept, and documents a term must
+# appear in
+TOPICS_MAX_FEATURES = int(os.environ.get("TOPICS_MAX_FEATURES", 5000))
+TOPICS_MIN_DF = int(os.environ.get("TOPICS_MIN_DF", 2))
+# Online LDA: documents per minibatch and passes over the documents
+TOPICS_BATCH_SIZE = int(os.environ.get("TOPICS_BATCH_SIZE", 1024))
+TOPICS_MAX_EPOCHS = int(os.environ.get("TOPICS_MAX_EPOCHS", 3))
+# Documents kept by stratified sampling (0 keeps all of them)
+TOPICS_SAMPLE_SIZE = int(os.environ.get("TOPICS_SAMPLE_SIZE", 20_000))
+# Consecutive messages closer than this are merged into one document
+# (0 keeps one document per message)
+TOPICS_SESSION_GAP_SECONDS = int(os.environ.get("TOPICS_SESSION_GAP_SECONDS", 300))
+# Wall-clock budget for fitting; the best model so far is used once it runs out
+TOPICS_TIME_BUDGET_SECONDS = float(os.environ.get("TOPICS_TIME_BUDGET_SECONDS", 20))
+
+TOP_WORDS = 10
+EVALUATION_DOCUMENTS = 1000
+SEED = 42
+# The E-step loops over documents in Python; capping its iterations per
+# document roughly halves an epoch for about 2% higher perplexity
+DOC_UPDATE_ITERATIONS = 30
+DOC_UPDATE_TOLERANCE = 1e-2
+# Relative perplexity improvement below which another epoch is not worth it
+CONVERGENCE_TOLERANCE = 0.01
+
+
+def top_words(components: np.ndarray, feature_names: Sequence[str], count: int = TOP_WORDS) -> Dict:
+    return {
+        f'Topic {topic_idx+1}': [feature_names[i] for i in topic.argsort()[:-count - 1:-1]]
+        for topic_idx, topic in enumerate(components)
+    }
+
+
+@lru_cache(maxsize=None)
+def english_stop_words() -> frozenset:
+    # scikit-learn takes about a second to import, so it is only imported
+    # once topics are modeled (as for scipy and LDA below)
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+
+def is_topic_term(term: str) -> bool:
+    """Terms CountVectorizer(stop_words='english') keeps: two or more characters, not a stop word."""
+    return len(term) > 1 and term not in english_stop_words()
+
+
+class DocumentTerms:
+    """
+    Document-term counts built batch by batch from the shared token ids.
+
+    The matrix is laid out exactly as CountVectorizer(stop_words='english')
+    lays out the same documents: columns sorted by term, and within a row,
+    entries in order of each term's first appearance. LDA sums over a row's
+    entries in that order, so fitting it gives the same topics bit for bit.
+    Terms are kept as strings, so batches with different token ids (e.g.
+    tables tokenized separately) combine correctly.
+    """
+
+    def __init__(self):
+        self.terms = {}  # term -> column, in order of first appearance
+        self.blocks = []
+
+    def add(self, features: MessageFeatures, rows: np.ndarray) -> None:
+        """Add the rows of `features` at `rows` as documents; only those rows may have tokens."""
+        from scipy import sparse
+
+        ids = features.batch_token_ids()
+        token_rows = features.token_rows()
+        keep = features.term_mask("topics", is_topic_term)[ids]
+        ids, token_rows = ids[keep], token_rows[keep]
+
+        documents = np.full(len(features.split_words), -1, dtype=np.int64)
+        documents[rows] = np.arange(len(rows))
+        columns = np.empty(len(ids), dtype=np.int64)
+        if len(ids):
+            distinct, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+            vocabulary, terms = features.vocabulary, self.terms
+            distinct = distinct.tolist()
+            ordinals = np.empty(len(distinct), dtype=np.int64)
+            for i in np.argsort(first).tolist():
+                ordinals[i] = terms.setdefault(vocabulary[distinct[i]], len(terms))
+            columns = ordinals[inverse]
+
+        block = sparse.csr_array((np.ones(len(ids), dtype=np.int64), (documents[token_rows], columns)),
+                                 shape=(len(rows), len(self.terms)))
+        block.sum_duplicates()
+        self.blocks.append(block)
+
+    def build(self):
+        """The document-term matrix and its feature names."""
+        from scipy import sparse
+
+        if not self.terms:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        width = len(self.terms)
+        X = sparse.vstack([
+            sparse.csr_array((block.data, block.indices, block.indptr), shape=(block.shape[0], width))
+            for block in self.blocks
+        ], format="csr")
+        names = sorted(self.terms)
+        columns = np.empty(width, dtype=X.indices.dtype)
+        columns[[self.terms[name] for name in names]] = np.arange(width)
+        X.indices = columns.take(X.indices)
+        return X, np.array(names, dtype=object)
+
+
+def limit_vocabulary(X, feature_names: np.ndarray, max_features: int, min_df: int):
+    """Drop terms in fewer than `min_df` documents, then keep the `max_features` most frequent, as CountVectorizer does."""
+    document_frequency = np.bincount(X.indices, minlength=X.shape[1])
+    mask = document_frequency >= min_df
+    if max_features and mask.sum() > max_features:
+        totals = np.asarray(X.sum(axis=0)).ravel()
+        top = (-totals[mask]).argsort()[:max_features]
+        limited = np.zeros(len(mask), dtype=bool)
+        limited[np.flatnonzero(mask)[top]] = True
+        mask = limited
+    kept = np.flatnonzero(mask)
+    if not len(kept):
+        raise ValueError("After pruning, no terms remain. Try a lower min_df.")
+    return X[:, kept], feature_names[kept]
+
+
+def session_documents(X, timestamps: np.ndarray, gap_seconds: int):
+    """
+    Merge the rows of runs of messages less than `gap_seconds` apart into
+    one document by summing their counts. Returns the documents and the
+    timestamp each one starts at.
+    """
+    from scipy import sparse
+
+    if gap_seconds <= 0 or not X.shape[0]:
+        return X, timestamps
+    starts = np.diff(timestamps, prepend=timestamps[0] - gap_seconds) >= gap_seconds
+    sessions = np.cumsum(starts) - 1
+    merge = sparse.csr_array((np.ones(len(sessions), dtype=X.dtype), (sessions, np.arange(len(sessions)))),
+                             shape=(int(sessions[-1]) + 1, len(sessions)))
+    return (merge @ X).tocsr(), timestamps[starts]
+
+
+def stratified_sample(timestamps: np.ndarray, sample_size: int, seed: int = SEED) -> np.ndarray:
+    """
+    Indices of about `sample_size` documents, drawn from each calendar month
+    in proportion to its size so quiet stretches of the chat stay covered.
+    """
+    if sample_size <= 0 or len(timestamps) <= sample_size:
+        return np.arange(len(timestamps))
+    months = timestamps.astype("datetime64[s]").astype("datetime64[M]")
+    rng = np.random.default_rng(seed)
+    chosen = []
+    for month in np.unique(months):
+        members = np.flatnonzero(months == month)
+        take = max(1, round(len(members) * sample_size / len(timestamps)))
+        chosen.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(chosen))
+
+
+def fit_online_topics(X, feature_names: np.ndarray, num_topics: int = 5,
+                      max_features: int = TOPICS_MAX_FEATURES, min_df: int = TOPICS_MIN_DF,
+                      batch_size: int = TOPICS_BATCH_SIZE, max_epochs: int = TOPICS_MAX_EPOCHS,
+                      time_budget: float = TOPICS_TIME_BUDGET_SECONDS, seed: int = SEED) -> Dict:
+    """
+    Fit LDA with online minibatch updates over a capped vocabulary.
+
+    After every epoch the model is scored by perplexity on a fixed subset of
+    the documents and the best components are kept. When `time_budget`
+    runs out (checked between minibatches, after at least one) or an epoch
+    improves perplexity by less than CONVERGENCE_TOLERANCE, fitting stops
+    and the best model seen so far is used.
+    """
+    from sklearn.decomposition import LatentDirichletAllocation
+
+    deadline = time.perf_counter() + time_budget
+    X, feature_names = limit_vocabulary(X, feature_names, max_features,
+                                        min(min_df, max(1, X.shape[0] // 2)))
+
+    order = np.random.default_rng(seed).permutation(X.shape[0])
+    evaluation = X[order[:EVALUATION_DOCUMENTS]]
+    lda = LatentDirichletAllocation(n_components=num_topics, learning_method="online",
+                                    total_samples=X.shape[0], random_state=seed,
+                                    max_doc_update_iter=DOC_UPDATE_ITERATIONS,
+                                    mean_change_tol=DOC_UPDATE_TOLERANCE)
+
+    best_components, best_perplexity = None, np.inf
+    batches = 0
+    for epoch in range(max_epochs):
+        for start in range(0, len(order), batch_size):
+            lda.partial_fit(X[order[start:start + batch_size]])
+            batches += 1
+            if time.perf_counter() > deadline:
+                break
+        perplexity = lda.perplexity(evaluation)
+        converged = perplexity > best_perplexity * (1 - CONVERGENCE_TOLERANCE)
+        if perplexity < best_perplexity:
+            best_components, best_perplexity = lda.components_.copy(), perplexity
+        if converged:
+            break
+        if time.perf_counter() > deadline:
+            logger.info(f"Topic model stopped by its {time_budget}s budget after {batches} minibatches")
+            break
+
+    logger.debug(f"Online topic model: {X.shape[0]} documents, {X.shape[1]} terms, "
+                 f"{batches} minibatches, perplexity {best_perplexity:.1f}")
+    return top_words(best_components, feature_names)
+
+
+def scalable_topics(X, feature_names: np.ndarray, timestamps: np.ndarray, num_topics: int = 5,
+                    session_gap: int = TOPICS_SESSION_GAP_SECONDS,
+                    sample_size: int = TOPICS_SAMPLE_SIZE, **fit_options) -> Dict:
+    """Topics for a large chat: session documents, stratified sample, online LDA."""
+    X, starts = session_documents(X, timestamps, session_gap)
+    keep = stratified_sample(starts, sample_size)
+    if len(keep) < X.shape[0]:
+        X = X[keep]
+    return fit_online_topics(X, feature_names, num_topics, **fit_options)
@@ -0,0 +1,67 @@
+import logging
+import os
+import threading
+import time
+
+from .analytics import generate_complete_analysis
+from .metrics import unrecorded
+from .parser import parse_chat_table
+
+logger = logging.getLogger(__name__)
+
+# The heavy analytics dependencies (scikit-learn, TextBlob/nltk, networkx,
+# scipy) are imported by the analyses that use them, so by default the
+# first request needing them pays for loading them. "background" loads them
+# in a thread as soon as the server starts, while it already serves
+# requests; "startup" does it before the server accepts any, for
+# deployments that send traffic to a worker once it is up.
+WARMUP = os.environ.get("WARMUP", "off")
+
+WARMUP_MODES = ("off", "background", "startup")
+
+# Enough of a chat for every analysis to run its real code path
+SAMPLE_CHAT = [
+    "01/02/24, 09:00 - Alice: Good morning everyone! Meeting notes are at https://example.com/notes 🙂",
+    "01/02/24, 09:02 - Bob: Thanks @Alice, the project timeline looks great",
+    "01/02/24, 09:05 - Carol: I think the design review needs another week?",
+    "01/02/24, 09:06 - Alice: <Media omitted>",
+    "01/02/24, 11:30 - Bob: def review(): return the budget spreadsheet",
+    "02/02/24, 22:15 - Carol: Sorry, terrible day. Let's discuss the timeline tomorrow",
+    "02/02/24, 22:16 - Alice: No problem @Carol, the project can wait",
+]
+
+
+def warm_up() -> float:
+    """
+    Run every analysis on a tiny chat, importing what they depend on, and
+    return the seconds taken. The run is kept out of the metrics. Raises
+    RuntimeError if an analysis failed, since its dependencies may not be
+    loaded.
+    """
+    started = time.perf_counter()
+    with unrecorded():
+        result = generate_complete_analysis(parse_chat_table(SAMPLE_CHAT))
+    seconds = time.perf_counter() - started
+    failed = [name for name, section in result.items() if section is None]
+    if failed:
+        raise RuntimeError(f"Warm-up analyses failed: {', '.join(failed)}")
+    logger.info(f"Warm-up done in {seconds:.2f}s")
+    return seconds
+
+
+def _warm_up_quietly() -> None:
+    try:
+        warm_up()
+    except Exception as e:
+        # A failed warm-up only means the first request does the loading
+        logger.warning(f"Warm-up failed: {e}", exc_info=True)
+
+
+def start_warm_up(mode: str = WARMUP) -> None:
+    """Warm up as configured by `mode` (see WARMUP); called when the server starts."""
+    if mode not in WARMUP_MODES:
+        raise ValueError(f"Unknown warm-up mode: {mode}")
+    if mode == "background":
+        threading.Thread(target=_warm_up_quietly, name="warm-up", daemon=True).start()
+    elif mode == "startup":
+        _warm_up_quietly()
@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Jobs running at once per pool, and jobs allowed to wait for a slot.
+# Anything beyond that is turned away instead of piling up behind the loop.
+MAX_IN_FLIGHT = int(os.environ.get("WORK_POOL_IN_FLIGHT", 2))
+MAX_QUEUED = int(os.environ.get("WORK_POOL_QUEUED", 8))
+
+# Jobs at or below these sizes go to a pool of their own, so a burst of
+# large uploads cannot keep small chats waiting
+SMALL_JOB_BYTES = int(os.environ.get("WORK_POOL_SMALL_BYTES", 256 * 1024))
+SMALL_JOB_MESSAGES = int(os.environ.get("WORK_POOL_SMALL_MESSAGES", 2000))
+# Small jobs are quick, so fewer threads keep up with them
+SMALL_MAX_IN_FLIGHT = int(os.environ.get("WORK_POOL_SMALL_IN_FLIGHT", max(1, MAX_IN_FLIGHT // 2)))
+
+# Seconds a rejected client is asked to wait before retrying
+RETRY_AFTER_SECONDS = 5
+
+
+class WorkPoolBusy(Exception):
+    """Raised when a WorkPool is full; the API answers it with a 503."""
+
+    def __init__(self, pool: str):
+        super().__init__(f"{pool} work pool is full")
+        self.pool = pool
+
+
+class WorkPool:
+    """
+    Runs blocking parse and analysis jobs off the event loop.
+
+    At most `max_in_flight` jobs run on the pool's threads and at most
+    `max_queued` more wait for one; `submit` raises WorkPoolBusy for anything
+    past that. A job holds its place until its thread finishes, even if
+    the request awaiting it has gone away. The counter is only touched from
+    the event loop, so it needs no lock.
+    """
+
+    def __init__(self, name: str, max_in_flight: int = MAX_IN_FLIGHT, max_queued: int = MAX_QUEUED):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"{name}-pool")
+        self.pending = 0
+        self.rejected = 0
+
+    def has_room(self) -> bool:
+        return self.pending < self.max_in_flight + self.max_queued
+
+    def submit(self, func: Callable, *args, **kwargs) -> asyncio.Future:
+        """
+        Start `func` on the pool and return its future without waiting, for
+        jobs that outlive the request that submitted them. Must be called
+        from the event loop.
+        """
+        if not self.has_room():
+            self.rejected += 1
+            logger.warning(f"Rejecting job: {self.name} pool has {self.pending} pending jobs")
+            raise WorkPoolBusy(self.name)
+
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: asyncio.Future) -> None:
+        self.pending -= 1
+
+    async def run(self, func: Callable, *args, **kwargs):
+        return await self.submit(func, *args, **kwargs)
+
+    def stats(self) -> Dict:
+        return {
+            "running": min(self.pending, self.max_in_flight),
+            "queued": max(0, self.pending - self.max_in_flight),
+            "rejected": self.rejected,
+        }
+
+
+small_pool = WorkPool("small", max_in_flight=SMALL_MAX_IN_FLIGHT)
+large_pool = WorkPool("large")
+
+
+def pool_for(size_bytes: Optional[int] = None, message_count: Optional[int] = None) -> WorkPool:
+    """Pick the pool for a job from its upload size or message count; unknown sizes count as large."""
+    if size_bytes is not None and size_bytes <= SMALL_JOB_BYTES:
+        return small_pool
+    if message_count is not None and message_count <= SMALL_JOB_MESSAGES:
+        return small_pool
+    return large_pool
@@ -0,0 +1,99 @@
+"""
+Compare the complete analysis against the implementation it replaced: the
+baseline's generate_complete_analysis, one pass over the message dicts per
+analysis, loaded from the baseline commit with `git show`.
+
+    python -m benchmarks.bench_analysis --sizes 10000 100000 1000000
+    python -m benchmarks.bench_analysis --baseline <commit> --exclude
+
+Both sides start from the message dicts the JSON API receives, so the
+current side includes building the MessageTable from them. Only the
+analyses the baseline has are run.
+"""
+import argparse
+import logging
+import subprocess
+import time
+import types
+
+from app.utils import analytics
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+BASELINE_COMMIT = "6b6a272"
+BASELINE_PATH = "backend/app/utils/analytics.py"
+
+# The functions the baseline's generate_complete_analysis runs, in its order
+BASELINE_FUNCTIONS = {
+    "basic_stats": "compute_basic_stats",
+    "user_activity": "analyze_user_activity",
+    "time_patterns": "analyze_time_patterns",
+    "content_analysis": "analyze_content",
+    "sentiment_analysis": "analyze_sentiment",
+    "interactions": "analyze_interactions",
+    "burst_silence": "analyze_burst_silence",
+    "readability": "analyze_readability",
+    "network_analysis": "analyze_network",
+    "topics": "analyze_topics",
+    "sleep_patterns": "analyze_sleep_patterns",
+    "code_snippets": "analyze_code_snippets",
+    "stopwords": "analyze_stopwords",
+}
+
+
+def load_baseline(commit: str) -> types.ModuleType:
+    source = subprocess.run(["git", "show", f"{commit}:{BASELINE_PATH}"], capture_output=True,
+                            text=True, check=True).stdout
+    module = types.ModuleType("baseline_analytics")
+    exec(compile(source, f"{commit}:{BASELINE_PATH}", "exec"), module.__dict__)
+    return module
+
+
+def run_baseline(baseline, messages, names):
+    # What the baseline's generate_complete_analysis does, for `names` only
+    result = {}
+    for name in names:
+        try:
+            result[name] = getattr(baseline, BASELINE_FUNCTIONS[name])(messages)
+        except Exception:
+            result[name] = None
+    return result
+
+
+def run_current(messages, names, mode):
+    return analytics.generate_complete_analysis(MessageTable.from_messages(messages), mode, analyses=names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--baseline", default=BASELINE_COMMIT, help="commit to take the old analytics from")
+    parser.add_argument("--mode", default="serial", help="executor mode of the current implementation")
+    parser.add_argument("--exclude", nargs="*", default=["sentiment_analysis", "topics"],
+                        help="analyses to leave out (TextBlob and LDA dominate otherwise); "
+                             "pass it empty to run every analysis")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    baseline = load_baseline(args.baseline)
+    names = [name for name in BASELINE_FUNCTIONS if name not in args.exclude]
+
+    print(f"{'messages':>10} {'baseline (s)':>14} {'current (s)':>12} {'speedup':>8}")
+    for size in args.sizes:
+        messages = synthetic_messages(size)
+
+        start = time.perf_counter()
+        old = run_baseline(baseline, messages, names)
+        baseline_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = run_current(messages, names, args.mode)
+        current_time = time.perf_counter() - start
+
+        failed = sorted(name for name in names if (old[name] is None) != (new[name] is None))
+        assert not failed, f"analyses failing on one side only: {failed}"
+        print(f"{size:>10} {baseline_time:>14.2f} {current_time:>12.2f} {baseline_time / current_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
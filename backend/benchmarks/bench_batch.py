@@ -0,0 +1,58 @@
+"""
+Batch mode throughput: chats per minute analyzing a directory of synthetic
+exports of mixed sizes with 1, 2, ... worker processes, and the peak memory
+bounded by --max-pending.
+
+    python -m benchmarks.bench_batch --chats 200 --messages 5000
+    python -m benchmarks.bench_batch --workers 1 4 8 --exclude topics sentiment_analysis
+"""
+import argparse
+import logging
+import os
+import random
+import resource
+import tempfile
+
+from app.utils.analytics import select_analyses
+from app.utils.batch import BATCH_MAX_PENDING, run_batch
+from benchmarks.synthetic import write_export
+
+
+def write_batch(directory: str, chats: int, messages: int, seed: int = 0) -> None:
+    """`chats` exports averaging `messages` messages, from a tenth of that to double it."""
+    rng = random.Random(seed)
+    for i in range(chats):
+        count = rng.randint(max(1, messages // 10), messages * 2)
+        write_export(os.path.join(directory, f"chat-{i:05d}.txt"), count,
+                     participants=rng.randint(2, 12), seed=seed + i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=5000, help="average messages per chat")
+    parser.add_argument("--workers", type=int, nargs="*",
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help=f"chats in flight at once (default: twice the workers, BATCH_MAX_PENDING={BATCH_MAX_PENDING})")
+    parser.add_argument("--include", nargs="*")
+    parser.add_argument("--exclude", nargs="*")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    analyses = select_analyses(args.include, args.exclude)
+    with tempfile.TemporaryDirectory() as directory:
+        write_batch(directory, args.chats, args.messages)
+        print(f"{args.chats} chats, ~{args.messages} messages each")
+        print(f"{'workers':>8} {'seconds':>9} {'chats/min':>10} {'messages/s':>11} {'peak worker RSS (MB)':>21}")
+        for workers in args.workers:
+            max_pending = args.max_pending or 2 * workers
+            summary = run_batch(directory, analyses, workers=workers, max_pending=max_pending)
+            # Largest resident set of any worker that has exited so far
+            peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            print(f"{workers:>8} {summary['seconds']:>9.2f} {summary['chats_per_minute']:>10.1f} "
+                  f"{summary['messages_per_second']:>11.0f} {peak:>21.0f}")
+
+
+if __name__ == "__main__":
+    main()
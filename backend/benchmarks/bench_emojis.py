@@ -0,0 +1,73 @@
+"""
+Emoji extraction: the per-character EMOJI_DATA lookup the parser used
+against the sequence matcher, on a synthetic chat in Latin script, one in
+Cyrillic and Devanagari (where no message can be skipped as ASCII), or a
+real export. Also counts what the old way split into fragments.
+
+    python -m benchmarks.bench_emojis --messages 200000
+    python -m benchmarks.bench_emojis --chat export.txt
+"""
+import argparse
+import logging
+import random
+import time
+
+import emoji
+
+from app.utils.emojis import find_emojis
+from app.utils.parser import parse_chat_table
+from benchmarks.synthetic import EMOJIS, synthetic_messages
+
+NON_LATIN_WORDS = "привет как дела сегодня завтра хорошо спасибо नमस्ते धन्यवाद कल आज".split()
+
+
+def per_character(content):
+    return [c for c in content if c in emoji.EMOJI_DATA]
+
+
+def non_latin_messages(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        words = rng.choices(NON_LATIN_WORDS, k=rng.randint(1, 20))
+        if rng.random() < 0.2:
+            words.extend(rng.choices(EMOJIS, k=rng.randint(1, 3)))
+        messages.append(" ".join(words))
+    return messages
+
+
+def timed(extract, contents):
+    start = time.perf_counter()
+    found = [extract(content) for content in contents]
+    return found, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--chat", help="WhatsApp export to measure instead of the synthetic chats")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    if args.chat:
+        with open(args.chat, encoding="utf-8") as f:
+            table = parse_chat_table(f)
+        corpora = {"export": list(table.iter_content(range(len(table))))}
+    else:
+        corpora = {
+            "latin": [message["content"] for message in synthetic_messages(args.messages)],
+            "non-latin": non_latin_messages(args.messages),
+        }
+
+    print(f"{'chat':>10} {'per char (s)':>13} {'matcher (s)':>12} {'speedup':>8} "
+          f"{'emojis':>9} {'fragments':>10}")
+    for name, contents in corpora.items():
+        old, old_time = timed(per_character, contents)
+        new, new_time = timed(find_emojis, contents)
+        emojis = sum(map(len, new))
+        print(f"{name:>10} {old_time:>13.3f} {new_time:>12.3f} {old_time / new_time:>7.1f}x "
+              f"{emojis:>9} {sum(map(len, old)):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Response encoding on a large chat: payload size and serialize time of the
+analysis result and of the /parse/chat message list, before (FastAPI's
+jsonable_encoder + json, json.dumps per message) and after (orjson,
+columnar MessagePack), raw and compressed.
+
+    python -m benchmarks.bench_encoding --messages 200000
+"""
+import argparse
+import json
+import logging
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.routers.parsing import RESPONSE_BATCH_SIZE, iter_messages_json, iter_messages_msgpack
+from app.utils.analytics import generate_complete_analysis, select_analyses
+from app.utils.encoding import CONTENT_CODINGS, compress, encode_json, encode_msgpack
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+
+def starlette_json(content) -> bytes:
+    """What a route returning a dict did: jsonable_encoder, then JSONResponse.render."""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def per_message_json(table: MessageTable) -> bytes:
+    """The /parse/chat body as it was encoded before, one json.dumps per message."""
+    chunks = [b'{"messages":[']
+    for start in range(0, len(table), RESPONSE_BATCH_SIZE):
+        batch = table.slice(start, min(start + RESPONSE_BATCH_SIZE, len(table)))
+        encoded = ",".join(json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+                           for message in batch.to_messages())
+        chunks.append((("," if start else "") + encoded).encode("utf-8"))
+    chunks.append(b']}')
+    return b"".join(chunks)
+
+
+def report(name: str, encoder, content):
+    start = time.perf_counter()
+    body = encoder(content)
+    seconds = time.perf_counter() - start
+    line = f"{name:>28} {seconds:>9.3f}s {len(body) / 1e6:>9.2f} MB"
+    for coding in CONTENT_CODINGS:
+        start = time.perf_counter()
+        size = len(compress(body, coding))
+        line += f"  {coding} {size / 1e6:>7.2f} MB in {time.perf_counter() - start:.3f}s"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--participants", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    table = MessageTable.from_messages(synthetic_messages(args.messages, args.participants))
+    analysis = generate_complete_analysis(table, analyses=select_analyses(exclude=["sentiment_analysis", "topics"]))
+    print(f"{len(table)} messages, {args.participants} participants")
+
+    print("analysis result")
+    report("jsonable_encoder + json", starlette_json, analysis)
+    report("orjson", encode_json, analysis)
+    report("msgpack", encode_msgpack, analysis)
+
+    print("message list")
+    report("json per message", per_message_json, table)
+    report("orjson", lambda table: b"".join(iter_messages_json(table)), table)
+    report("msgpack columns", lambda table: b"".join(iter_messages_msgpack(table)), table)
+
+
+if __name__ == "__main__":
+    main()
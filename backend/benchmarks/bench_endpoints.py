@@ -0,0 +1,54 @@
+"""
+Compare the two-request upload flow (/parse/chat then /analysis/complete)
+with the single /analyze request: bytes on the wire and end-to-end latency.
+
+    python -m benchmarks.bench_endpoints --sizes 1000 10000 50000
+"""
+import argparse
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks.synthetic import synthetic_export
+
+
+def two_requests(client, export: bytes):
+    parsed = client.post("/parse/chat", files={"file": ("chat.txt", export)})
+    # The frontend posted the bare message list to /analysis/complete
+    messages = parsed.json()["messages"]
+    analysis = client.post("/analysis/complete", json=messages)
+    wire = len(export) + len(parsed.content) + len(analysis.request.content) + len(analysis.content)
+    return analysis, wire
+
+
+def one_request(client, export: bytes):
+    analysis = client.post("/analyze", files={"file": ("chat.txt", export)})
+    return analysis, len(export) + len(analysis.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    client = TestClient(app)
+
+    print(f"{'messages':>10} {'flow':>10} {'wire (MB)':>10} {'latency (s)':>12}")
+    for size in args.sizes:
+        export = synthetic_export(size).encode("utf-8")
+        results = {}
+        for name, flow in (("two-step", two_requests), ("/analyze", one_request)):
+            start = time.perf_counter()
+            response, wire = flow(client, export)
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            results[name] = response.json()
+            print(f"{size:>10} {name:>10} {wire / 1e6:>10.2f} {elapsed:>12.2f}")
+        assert results["two-step"] == results["/analyze"], "/analyze result differs from the two-step flow"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Word, emoji and domain frequencies counted exactly against heavy-hitter
+sketches of a few sizes: time, memory allocated by the content and
+stopwords analyses, and how far the sketched top words are from the exact
+ones. Exact counting reads the shared word features, whose vocabulary of
+the whole chat is part of its peak; the sketches tokenize batch by batch
+and never build them, so they run first. The synthetic chat draws its words from a Zipf distribution, so
+its vocabulary keeps growing with its length like a real chat's does.
+
+    python -m benchmarks.bench_frequencies --messages 2000000
+    python -m benchmarks.bench_frequencies --chat export.txt --sizes 1000 10000
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.utils.analytics import ContentAccumulator, StopwordsAccumulator
+from app.utils.engine import run_accumulators
+from app.utils.parser import parse_chat_table
+
+TOP = 50
+
+
+def zipf_export_lines(count: int, exponent: float = 1.2, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 20, count)
+    words = rng.zipf(exponent, int(lengths.sum()))
+    start = 0
+    for i, length in enumerate(lengths.tolist()):
+        minute = i // 10
+        stamp = f"{1 + minute // 1440 % 28:02d}/{1 + minute // 40320 % 12:02d}/23, {minute // 60 % 24:02d}:{minute % 60:02d}"
+        text = " ".join(f"w{word}" for word in words[start:start + length].tolist())
+        start += length
+        yield f"{stamp} - User {i % 8}: {text}"
+
+
+def measure(table, mode: str, capacity=None):
+    accumulators = {"content_analysis": ContentAccumulator(mode, capacity),
+                    "stopwords": StopwordsAccumulator(mode, capacity)}
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = run_accumulators(table, accumulators)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results["content_analysis"], accumulators["content_analysis"].words, seconds, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--chat", help="WhatsApp export to measure instead of the synthetic chat")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000, 100_000],
+                        help="sketch capacities to compare")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    if args.chat:
+        with open(args.chat, encoding="utf-8") as f:
+            table = parse_chat_table(f)
+    else:
+        table = parse_chat_table(zipf_export_lines(args.messages))
+    sketches = [(size, *measure(table, "sketch", size)) for size in args.sizes]
+    exact, exact_words, seconds, peak = measure(table, "exact")
+    top = list(exact["word_frequency"])
+    print(f"{len(table)} messages, {len(exact_words)} distinct words, {sum(exact_words.values())} words")
+    print(f"{'counts':>14} {'seconds':>8} {'peak MB':>8} {'top-50 kept':>12} {'max error':>10} {'error bound':>12}")
+    print(f"{'exact':>14} {seconds:>8.2f} {peak:>8.1f} {TOP:>12} {0:>10} {0:>12}")
+    for size, result, words, seconds, peak in sketches:
+        kept = len(set(top) & set(result["word_frequency"]))
+        error = max(exact_words[word] - count for word, count in words.items())
+        print(f"{'sketch ' + str(size):>14} {seconds:>8.2f} {peak:>8.1f} {kept:>12} {error:>10} "
+              f"{words.max_error:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Ingestion memory: peak RSS growth and time to parse one synthetic export
+read whole and decoded (as /parse/chat once did), streamed in chunks, memory
+mapped, and stream-decompressed out of an "export with media" zip. Each
+runs in a fresh process, so the peaks don't mix; the parsed table is part of
+every peak, so the difference between them is the ingestion overhead.
+
+    python -m benchmarks.bench_ingest --messages 3000000
+    python -m benchmarks.bench_ingest --chat export.txt
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.bench_suite import peak_rss_mb
+from benchmarks.synthetic import write_export
+
+# Bytes of fake media stored next to the chat in the zip
+MEDIA_BYTES = 64 * 1024 * 1024
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def ingest(method: str, path: str) -> dict:
+    logging.disable(logging.CRITICAL)
+    from app.utils.exports import parse_path
+    from app.utils.parser import parse_chat_table, parse_stream
+
+    before = current_rss_mb()
+    started = time.perf_counter()
+    if method == "read":
+        with open(path, "rb") as f:
+            table = parse_chat_table(f.read().decode("utf-8").splitlines())
+    elif method == "stream":
+        with open(path, "rb") as f:
+            table = parse_stream(f)
+    else:
+        table = parse_path(path)
+    seconds = time.perf_counter() - started
+    return {"messages": len(table), "seconds": seconds, "growth_mb": peak_rss_mb() - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2_000_000)
+    parser.add_argument("--chat", help="WhatsApp export to measure instead of a synthetic one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        text = args.chat or os.path.join(directory, "chat.txt")
+        if not args.chat:
+            write_export(text, args.messages)
+        archive = os.path.join(directory, "WhatsApp Chat.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+            z.write(text, "_chat.txt")
+            z.writestr(zipfile.ZipInfo("IMG-0001.jpg"), os.urandom(MEDIA_BYTES))
+        print(f"export {os.path.getsize(text) / 1e6:.0f} MB, zip {os.path.getsize(archive) / 1e6:.0f} MB")
+        print(f"{'method':>8} {'messages':>10} {'seconds':>9} {'RSS growth (MB)':>16}")
+        for method, path in [("read", text), ("stream", text), ("mmap", text), ("zip", archive)]:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(ingest, method, path).result()
+            print(f"{method:>8} {result['messages']:>10} {result['seconds']:>9.2f} {result['growth_mb']:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
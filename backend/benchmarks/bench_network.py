@@ -0,0 +1,52 @@
+"""
+Network centrality on a large community chat: exact betweenness against
+the sampled approximation, on the mention graph and the weighted reply
+graph. Accuracy is how many of the exact top 20 participants by
+betweenness the approximation also ranks in its top 20.
+
+    python -m benchmarks.bench_network --messages 100000 --participants 1500
+"""
+import argparse
+import logging
+import time
+
+from app.utils.analytics import NetworkAccumulator
+from app.utils.engine import run_accumulator
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+TOP = 20
+
+
+def top_users(result):
+    ranked = sorted(result["betweenness_centrality"], key=lambda entry: -entry["centrality"])
+    return {entry["user"] for entry in ranked[:TOP]}
+
+
+def timed(table, graph, mode):
+    start = time.perf_counter()
+    result = run_accumulator(NetworkAccumulator(graph, mode), table)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--participants", type=int, default=1500)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    table = MessageTable.from_messages(synthetic_messages(args.messages, args.participants))
+    print(f"{len(table)} messages, {args.participants} participants")
+
+    for graph in ("mentions", "replies"):
+        exact, exact_time = timed(table, graph, "exact")
+        approximate, approximate_time = timed(table, graph, "approximate")
+        overlap = len(top_users(exact) & top_users(approximate)) / TOP
+        print(f"{graph:>10} {len(exact['degree_centrality'])} nodes  exact {exact_time:>7.2f}s  "
+              f"approximate {approximate_time:>6.2f}s ({approximate['centrality_mode']})  "
+              f"speedup {exact_time / approximate_time:.1f}x  top-{TOP} overlap {overlap:.0%}")
+
+
+if __name__ == "__main__":
+    main()
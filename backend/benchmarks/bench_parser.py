@@ -0,0 +1,60 @@
+"""
+Parser throughput in lines per second, per timestamp format, plus the cost
+of timestamp decoding alone: the fast path against the strptime format loop
+it replaced.
+
+    python -m benchmarks.bench_parser --messages 200000
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+
+from app.utils.parser import DAY_FIRST, LINE_PATTERN, MONTH_FIRST, decode_timestamp, parse_chat_table
+from benchmarks.synthetic import DATE_FORMATS, synthetic_export
+
+STRPTIME_FORMATS = ["%d/%m/%y, %I:%M %p", "%d/%m/%y, %H:%M", "%d/%m/%Y, %I:%M %p", "%d/%m/%Y, %H:%M"]
+
+
+def strptime_decode(timestamp_str):
+    for fmt in STRPTIME_FORMATS:
+        try:
+            return datetime.strptime(timestamp_str, fmt)
+        except ValueError:
+            continue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'format':>8} {'parse (lines/s)':>16} {'strptime (/s)':>14} {'fast path (/s)':>15}")
+    for name, fmt in DATE_FORMATS.items():
+        lines = synthetic_export(args.messages, timestamp_format=fmt).splitlines()
+
+        start = time.perf_counter()
+        parse_chat_table(lines)
+        parse_rate = len(lines) / (time.perf_counter() - start)
+
+        matches = [LINE_PATTERN.match(line) for line in lines]
+        stamps = [line[:match.start(8 if match.group(8) else 9)].rstrip(" -") for line, match in zip(lines, matches)]
+        groups = [match.groups()[:7] for match in matches]
+
+        start = time.perf_counter()
+        for stamp in stamps:
+            strptime_decode(stamp)
+        strptime_rate = len(stamps) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for fields in groups:
+            decode_timestamp(*fields, MONTH_FIRST if name.startswith("us") else DAY_FIRST)
+        fast_rate = len(groups) / (time.perf_counter() - start)
+
+        print(f"{name:>8} {parse_rate:>16,.0f} {strptime_rate:>14,.0f} {fast_rate:>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
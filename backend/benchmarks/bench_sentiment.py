@@ -0,0 +1,49 @@
+"""
+Sentiment stage timings: one TextBlob per message (the old behaviour)
+against the cached scorer on a cold and a warm cache, for both backends.
+
+    python -m benchmarks.bench_sentiment --messages 50000
+"""
+import argparse
+import logging
+import time
+
+from app.utils.analytics import SentimentAccumulator
+from app.utils.engine import run_accumulator
+from app.utils.sentiment import SentimentScorer, textblob_polarity
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+
+def per_message(table):
+    rows = (table.is_type("normal") & (table.content_lengths() > 0)).nonzero()[0]
+    return [textblob_polarity(content) for content in table.iter_content(rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50_000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    table = MessageTable.from_messages(synthetic_messages(args.messages))
+
+    start = time.perf_counter()
+    per_message(table)
+    baseline = time.perf_counter() - start
+    print(f"{'per-message TextBlob':>28} {baseline:>8.2f}s")
+
+    for backend in ("textblob", "lexicon"):
+        scorer = SentimentScorer(backend=backend)
+        for run in ("cold", "warm"):
+            hits, misses = scorer.hits, scorer.misses
+            start = time.perf_counter()
+            run_accumulator(SentimentAccumulator(scorer), table)
+            elapsed = time.perf_counter() - start
+            hits, misses = scorer.hits - hits, scorer.misses - misses
+            print(f"{backend + ' ' + run:>28} {elapsed:>8.2f}s  saved {baseline - elapsed:>6.2f}s  "
+                  f"hit rate {hits / (hits + misses):.1%}  lexicon-scored {scorer.lexicon_scored}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Sessionization on chats of growing size: the sessions analysis alone, and
+together with the analyses sharing its adjacent-message gaps (time_patterns,
+burst_silence, interactions). Time per million messages staying flat as the
+chat grows shows the pass is linear. Only timestamps and senders matter
+here, so the table is built from NumPy columns rather than parsed.
+
+    python -m benchmarks.bench_sessions --sizes 1000000 2000000 5000000
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from app.utils.analytics import ANALYSIS_ACCUMULATORS
+from app.utils.engine import run_accumulators
+from app.utils.table import MessageTable
+
+GAP_ANALYSES = ("time_patterns", "burst_silence", "interactions")
+
+
+def timing_table(count: int, participants: int = 12, seed: int = 0) -> MessageTable:
+    """
+    Messages whose gaps mix quick exchanges, slower replies and long
+    silences, from participants of uneven activity.
+    """
+    rng = np.random.default_rng(seed)
+    kind = rng.random(count)
+    gaps = np.where(kind < 0.85, rng.exponential(60, count),
+                    np.where(kind < 0.97, rng.exponential(1200, count), rng.uniform(3600, 2 * 86400, count)))
+    timestamps = 1_600_000_000 + np.cumsum(gaps.astype(np.int64))
+    weights = 1 / np.arange(1, participants + 1)
+    senders = rng.choice(participants, count, p=weights / weights.sum()).astype(np.int32)
+    zeros = np.zeros(count, np.int32)
+    empty_offsets = np.zeros(count + 1, np.int64)
+    return MessageTable(
+        timestamps=timestamps, sender_codes=senders, senders=[f"User {i}" for i in range(participants)],
+        type_codes=np.zeros(count, np.int8), types=["normal"], flags=np.zeros(count, np.uint8),
+        word_counts=zeros, character_counts=zeros, content="", content_offsets=empty_offsets,
+        emojis=[], emoji_offsets=empty_offsets, mentions=[], mention_offsets=empty_offsets,
+        urls=[], url_offsets=empty_offsets,
+    )
+
+
+def timed(table: MessageTable, names) -> float:
+    accumulators = {name: ANALYSIS_ACCUMULATORS[name]() for name in names}
+    started = time.perf_counter()
+    run_accumulators(table, accumulators)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000_000, 2_000_000, 5_000_000])
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'messages':>10} {'sessions (s)':>13} {'s/M':>6} {'with gap analyses (s)':>22} {'s/M':>6} "
+          f"{'gap analyses alone (s)':>23}")
+    for size in args.sizes:
+        table = timing_table(size)
+        alone = timed(table, ["sessions"])
+        together = timed(table, ["sessions", *GAP_ANALYSES])
+        without = timed(table, GAP_ANALYSES)
+        millions = size / 1e6
+        print(f"{size:>10} {alone:>13.2f} {alone / millions:>6.2f} {together:>22.2f} "
+              f"{together / millions:>6.2f} {without:>23.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold start: time to `import app.main` and latency of the first and second
+/analyze requests, each in a fresh interpreter, with the analytics
+dependencies loaded lazily (the default), warmed up before the server
+accepts requests (WARMUP=startup), and imported eagerly up front as
+app.main used to.
+
+    python -m benchmarks.bench_startup --runs 5 --messages 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules analytics.py used to import at load time
+EAGER_MODULES = ("sklearn.decomposition", "sklearn.feature_extraction.text", "networkx",
+                 "textblob", "scipy.sparse")
+MODES = {
+    "lazy": {"WARMUP": "off"},
+    "warm-up": {"WARMUP": "startup"},
+    "eager": {"WARMUP": "off"},
+}
+
+
+def child(mode: str, messages: int) -> dict:
+    """One cold start, measured inside the fresh interpreter."""
+    started = time.perf_counter()
+    import app.main
+    if mode == "eager":
+        import importlib
+        for module in EAGER_MODULES:
+            importlib.import_module(module)
+    imported = time.perf_counter() - started
+
+    import logging
+    from fastapi.testclient import TestClient
+    from benchmarks.synthetic import synthetic_export
+
+    logging.disable(logging.CRITICAL)
+    body = synthetic_export(messages).encode()
+    report = {"import_seconds": imported}
+    started = time.perf_counter()
+    # Entering the client runs the app's startup, and with it the warm-up
+    with TestClient(app.main.app) as client:
+        report["startup_seconds"] = time.perf_counter() - started
+        for request in ("first_request_seconds", "second_request_seconds"):
+            started = time.perf_counter()
+            client.post("/analyze", files={"file": ("chat.txt", body)}).raise_for_status()
+            report[request] = time.perf_counter() - started
+            # A slightly different export each time, so nothing is cached
+            body += b"\n"
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per mode; the median is shown")
+    parser.add_argument("--messages", type=int, default=200, help="messages in the analyzed export")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.messages)))
+        return
+
+    columns = ("import_seconds", "startup_seconds", "first_request_seconds", "second_request_seconds")
+    print(f"{'mode':>8} {'import (s)':>11} {'startup (s)':>12} {'1st request (s)':>16} {'2nd request (s)':>16} "
+          f"{'ready to 1st reply (s)':>23}")
+    for mode, environment in MODES.items():
+        env = {**os.environ, **environment, "RESULT_CACHE": "off", "INCREMENTAL_ANALYSIS": "0",
+               "LOG_LEVEL": "WARNING"}
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child", mode,
+                                     "--messages", str(args.messages)],
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        median = {column: statistics.median(run[column] for run in runs) for column in columns}
+        total = median["import_seconds"] + median["startup_seconds"] + median["first_request_seconds"]
+        print(f"{mode:>8} {median['import_seconds']:>11.2f} {median['startup_seconds']:>12.2f} "
+              f"{median['first_request_seconds']:>16.2f} {median['second_request_seconds']:>16.2f} {total:>23.2f}")
+
+
+if __name__ == "__main__":
+    main()
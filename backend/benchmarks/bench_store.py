@@ -0,0 +1,65 @@
+"""
+Stored chat queries: answering "one month" or "three participants" from
+the indexed store against parsing the export again to pick the same
+messages out, plus the one-off cost of storing the chat.
+
+    python -m benchmarks.bench_store --messages 1000000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app.utils.parser import parse_stream
+from app.utils.store import ChatStore
+from app.utils.table import from_epoch, to_epoch
+from benchmarks.synthetic import write_export
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--participants", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chat.txt")
+        write_export(path, args.messages, participants=args.participants)
+        with open(path, "rb") as f:
+            table, parse_time = timed(parse_stream, f)
+
+        store = ChatStore(os.path.join(directory, "store"))
+        chat_id, save_time = timed(store.save, table)
+        chat = store.get(chat_id)
+        size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(store.directory, chat_id)))
+        print(f"{len(table)} messages: parse {parse_time:.2f}s, store {save_time:.2f}s ({size / 1e6:.0f} MB)")
+
+        middle = from_epoch(table.timestamps[len(table) // 2])
+        month = to_epoch(datetime(middle.year, middle.month, 1))
+        next_month = to_epoch(datetime(middle.year + middle.month // 12, middle.month % 12 + 1, 1))
+        senders = table.senders[:3]
+        queries = {
+            "whole chat": (None, None, None),
+            "one month": (month, next_month, None),
+            "3 senders": (None, None, senders),
+            "month, 3 senders": (month, next_month, senders),
+        }
+
+        print(f"{'query':>18} {'messages':>9} {'rows (s)':>9} {'table (s)':>10} {'re-parse (s)':>13}")
+        for name, query in queries.items():
+            rows, rows_time = timed(chat.rows, *query)
+            result, query_time = timed(chat.query, *query)
+            print(f"{name:>18} {len(result):>9} {rows_time:>9.4f} {query_time:>10.3f} {parse_time:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
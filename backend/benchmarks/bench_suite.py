@@ -0,0 +1,227 @@
+"""
+End-to-end performance suite on synthetic exports: parser throughput,
+per-analysis wall time, peak memory and HTTP latency through an
+in-process test client, at several chat sizes. Results are written as
+JSON so runs on different commits can be compared.
+
+    python -m benchmarks.bench_suite --sizes 10000 100000 1000000 5000000 --output suite.json
+    python -m benchmarks.bench_suite --sizes 10000 100000 --baseline suite.json
+
+Each size runs in a fresh process, so peak RSS is not inflated by the
+sizes before it. The result cache and incremental analysis are turned off
+so every request does the full work. The message-list routes
+(/parse/chat, /analysis/complete) and `parse_chat_file` hold every message
+as a dict, so they only run up to --dict-max-messages.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+from benchmarks.synthetic import DATE_FORMATS, write_export
+
+# Settings that change what is measured, recorded with every run
+SETTINGS = ("ANALYSIS_EXECUTOR", "ANALYSIS_WORKERS", "SENTIMENT_BACKEND", "TOPICS_MODE",
+            "NETWORK_GRAPH", "NETWORK_BETWEENNESS")
+# Timings this short are mostly noise and never reported as regressions
+MIN_COMPARED_SECONDS = 0.05
+
+
+def reset_peak_rss() -> bool:
+    """Restart the process's peak RSS from its current RSS; only possible on Linux."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class Stage:
+    """Wall time and peak RSS of a block, as a dict for the report."""
+
+    def __enter__(self):
+        self.report = {"per_stage_rss": reset_peak_rss()}
+        self.started = time.perf_counter()
+        return self.report
+
+    def __exit__(self, *exc_info):
+        self.report["seconds"] = time.perf_counter() - self.started
+        self.report["peak_rss_mb"] = peak_rss_mb()
+
+
+def post_timed(client, url, **kwargs):
+    started = time.perf_counter()
+    response = client.post(url, **kwargs)
+    seconds = time.perf_counter() - started
+    response.raise_for_status()
+    return response, {"seconds": seconds, "response_bytes": len(response.content)}
+
+
+def run_size(size: int, options: dict) -> dict:
+    """Benchmark one chat size; runs in its own process."""
+    # Imported here so the settings the parent put in the environment apply
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.utils.analytics import generate_complete_analysis, select_analyses
+    from app.utils.parser import parse_chat_file, parse_stream
+
+    logging.disable(logging.CRITICAL)
+    analyses = select_analyses(exclude=options["exclude"])
+    exclude = {"exclude": ",".join(options["exclude"])} if options["exclude"] else {}
+    with_dicts = size <= options["dict_max_messages"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "chat.txt")
+        lines = write_export(path, size, **options["generator"])
+        report = {"messages": size, "lines": lines, "bytes": os.path.getsize(path)}
+
+        with open(path, "rb") as f, Stage() as stage:
+            table = parse_stream(f)
+        stage.update(messages=len(table), lines_per_second=lines / stage["seconds"])
+        report["parse_stream"] = stage
+
+        report["parse_chat_file"] = None
+        if with_dicts:
+            with open(path, encoding="utf-8") as f, Stage() as stage:
+                messages = parse_chat_file(f)
+            stage.update(messages=len(messages), lines_per_second=lines / stage["seconds"])
+            report["parse_chat_file"] = stage
+            del messages
+
+        timings = {}
+        with Stage() as stage:
+            generate_complete_analysis(table, mode="serial", timings=timings, analyses=analyses)
+        stage["analyses"] = timings
+        report["analysis"] = stage
+        del table
+
+        client = TestClient(app)
+        http = report["http"] = {}
+        with open(path, "rb") as f:
+            _, http["/analyze"] = post_timed(client, "/analyze", files={"file": ("chat.txt", f)}, params=exclude)
+        if with_dicts:
+            with open(path, "rb") as f:
+                parsed, http["/parse/chat"] = post_timed(client, "/parse/chat", files={"file": ("chat.txt", f)})
+            messages = parsed.json()["messages"]
+            del parsed
+            _, http["/analysis/complete"] = post_timed(client, "/analysis/complete", json=messages, params=exclude)
+    return report
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {name: os.environ[name] for name in SETTINGS if name in os.environ},
+    }
+
+
+def metrics(report: dict) -> dict:
+    """Flat {name: (value, higher_is_better)} of one size's report, for comparisons."""
+    flat = {"parse_stream lines/s": (report["parse_stream"]["lines_per_second"], True),
+            "parse_stream peak MB": (report["parse_stream"]["peak_rss_mb"], False),
+            "analysis s": (report["analysis"]["seconds"], False),
+            "analysis peak MB": (report["analysis"]["peak_rss_mb"], False)}
+    if report["parse_chat_file"]:
+        flat["parse_chat_file lines/s"] = (report["parse_chat_file"]["lines_per_second"], True)
+    for name, seconds in report["analysis"]["analyses"].items():
+        flat[f"  {name} s"] = (seconds, False)
+    for route, timing in report["http"].items():
+        flat[f"POST {route} s"] = (timing["seconds"], False)
+    return flat
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> int:
+    """Print the change of every metric against `baseline`; returns the number of regressions."""
+    previous = {report["messages"]: report for report in baseline["results"]}
+    regressions = 0
+    for report in current["results"]:
+        if report["messages"] not in previous:
+            continue
+        print(f"\n{report['messages']:,} messages against the baseline")
+        before = metrics(previous[report["messages"]])
+        for name, (value, higher_is_better) in metrics(report).items():
+            if name not in before or not before[name][0]:
+                continue
+            change = value / before[name][0] - 1
+            worse = -change if higher_is_better else change
+            noise = name.endswith(" s") and max(value, before[name][0]) < MIN_COMPARED_SECONDS
+            flag = "REGRESSION" if worse > tolerance and not noise else ""
+            regressions += bool(flag)
+            print(f"{name:>28} {before[name][0]:>12.3f} {value:>12.3f} {change:>+8.1%} {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--participants", type=int, default=8)
+    parser.add_argument("--date-format", choices=sorted(DATE_FORMATS), default="24h")
+    parser.add_argument("--emoji-ratio", type=float, default=0.2)
+    parser.add_argument("--url-ratio", type=float, default=0.1)
+    parser.add_argument("--media-ratio", type=float, default=0.04)
+    parser.add_argument("--system-ratio", type=float, default=0.01)
+    parser.add_argument("--multiline-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exclude", nargs="*", default=[], help="analyses to leave out")
+    parser.add_argument("--dict-max-messages", type=int, default=1_000_000,
+                        help="largest size to run the message-list routes and parse_chat_file at")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    os.environ.update(RESULT_CACHE="off", INCREMENTAL_ANALYSIS="0")
+    generator = {"participants": args.participants, "seed": args.seed, "date_format": args.date_format,
+                 "emoji_ratio": args.emoji_ratio, "url_ratio": args.url_ratio, "media_ratio": args.media_ratio,
+                 "system_ratio": args.system_ratio, "multiline_ratio": args.multiline_ratio}
+    options = {"generator": generator, "exclude": args.exclude, "dict_max_messages": args.dict_max_messages}
+    run = {"created": datetime.now(timezone.utc).isoformat(), "environment": environment(),
+           "generator": generator, "exclude": args.exclude, "results": []}
+
+    print(f"{'messages':>10} {'parse (lines/s)':>16} {'analysis (s)':>13} {'peak (MB)':>10} {'/analyze (s)':>13}")
+    for size in args.sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            report = pool.submit(run_size, size, options).result()
+        run["results"].append(report)
+        print(f"{size:>10} {report['parse_stream']['lines_per_second']:>16,.0f} "
+              f"{report['analysis']['seconds']:>13.2f} {report['analysis']['peak_rss_mb']:>10.0f} "
+              f"{report['http']['/analyze']['seconds']:>13.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), run, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Topic modeling: the exact batch LDA against the scalable mode, with a
+quality check of the scalable topics against the exact ones.
+
+Quality is the overlap of top words. For each exact topic, "match" is the
+best Jaccard similarity with any scalable topic, averaged over the topics.
+"recall" is the share of all exact top words that appear in some scalable
+topic. Synthetic chats are word salad, so pass --chat with a real export to
+judge quality; the timings are meaningful either way.
+
+    python -m benchmarks.bench_topics --messages 100000
+    python -m benchmarks.bench_topics --chat export.txt
+"""
+import argparse
+import logging
+import time
+
+from app.utils.analytics import TopicsAccumulator
+from app.utils.engine import run_accumulator
+from app.utils.parser import parse_chat_table
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+
+def topic_overlap(reference, candidate):
+    reference = [set(words) for words in reference.values()]
+    candidate = [set(words) for words in candidate.values()]
+    if not reference or not candidate:
+        return 0.0, 0.0
+    match = sum(max(len(r & c) / len(r | c) for c in candidate) for r in reference) / len(reference)
+    found = set().union(*candidate)
+    recall = sum(len(r & found) for r in reference) / sum(len(r) for r in reference)
+    return match, recall
+
+
+def timed(mode, table):
+    start = time.perf_counter()
+    topics = run_accumulator(TopicsAccumulator(mode=mode), table)
+    return topics, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--chat", help="WhatsApp export to use as the reference chat")
+    parser.add_argument("--skip-exact", action="store_true", help="only time the scalable mode")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    if args.chat:
+        with open(args.chat, encoding="utf-8") as f:
+            table = parse_chat_table(f)
+    else:
+        table = MessageTable.from_messages(synthetic_messages(args.messages))
+    print(f"{len(table)} messages")
+
+    scalable, scalable_time = timed("scalable", table)
+    print(f"{'scalable':>10} {scalable_time:>8.2f}s")
+    if args.skip_exact:
+        return
+
+    exact, exact_time = timed("exact", table)
+    match, recall = topic_overlap(exact, scalable)
+    print(f"{'exact':>10} {exact_time:>8.2f}s  speedup {exact_time / scalable_time:.1f}x  "
+          f"match {match:.2f}  recall {recall:.2f}")
+    for name in exact:
+        print(f"  {name}: exact    {' '.join(exact[name])}")
+        print(f"  {' ' * len(name)}  scalable {' '.join(scalable.get(name, []))}")
+
+
+if __name__ == "__main__":
+    main()
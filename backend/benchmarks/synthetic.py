@@ -0,0 +1,155 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+WORDS = (
+    "ok lol yes no maybe tomorrow today meeting lunch dinner call later "
+    "sure thanks great awesome sorry wait what where when why how the a "
+    "is are was will can project deadline code review deploy weekend plan"
+).split()
+EMOJIS = ["😂", "👍", "❤️", "🙏", "😊", "🔥", "😭", "🎉", "👍🏽", "👨‍👩‍👧", "🇮🇳"]
+SHORT_REPLIES = ["ok", "lol", "yes", "no", "thanks", "haha", "😂", "👍", "okay", "sure"]
+DOMAINS = ["github.com", "www.youtube.com", "docs.python.org", "example.org"]
+
+# Timestamp formats of real exports, which depend on the phone's locale and clock
+DATE_FORMATS = {
+    "24h": "%d/%m/%y, %H:%M",
+    "12h": "%d/%m/%y, %I:%M %p",
+    "12h-4y": "%d/%m/%Y, %I:%M %p",
+    "us-12h": "%m/%d/%y, %I:%M %p",
+    "24h-seconds": "%d/%m/%Y, %H:%M:%S",
+}
+
+
+def synthetic_messages(count: int, participants: int = 8, seed: int = 0) -> List[Dict]:
+    """Build `count` messages in the shape produced by `parse_chat_file`."""
+    rng = random.Random(seed)
+    senders = [f"User {i}" for i in range(participants)]
+    timestamp = datetime(2020, 1, 1, 9, 0)
+    messages = []
+
+    for _ in range(count):
+        timestamp += timedelta(seconds=rng.choice((0, 30, 60, 120, 600, 3600, 5 * 3600)))
+        roll = rng.random()
+        sender = rng.choice(senders)
+        emojis, mentions, urls = [], [], []
+
+        if roll < 0.01:
+            sender, msg_type, content = None, "system", f"{rng.choice(senders)} joined using this group's invite link"
+        elif roll < 0.05:
+            msg_type, content = "media", "<Media omitted>"
+        elif roll < 0.06:
+            msg_type, content = "deleted", "This message was deleted"
+        elif roll < 0.3:
+            msg_type, content = "normal", rng.choice(SHORT_REPLIES)
+            emojis = [content] if content in EMOJIS else []
+        else:
+            msg_type = "normal"
+            words = rng.choices(WORDS, k=rng.randint(1, 20))
+            if rng.random() < 0.1:
+                urls = [f"https://{rng.choice(DOMAINS)}/{rng.choice(WORDS)}"]
+                words.extend(urls)
+            if rng.random() < 0.05:
+                mentions = [f"@{rng.choice(senders).replace(' ', '')}"]
+                words.extend(mentions)
+            if rng.random() < 0.2:
+                emojis = rng.choices(EMOJIS, k=rng.randint(1, 3))
+                words.extend(emojis)
+            content = " ".join(words)
+            if rng.random() < 0.1:
+                content += "?"
+
+        messages.append({
+            "timestamp": timestamp.isoformat(),
+            "date": timestamp.date().isoformat(),
+            "time": timestamp.time().isoformat(),
+            "hour": timestamp.hour,
+            "minute": timestamp.minute,
+            "day_of_week": timestamp.weekday(),
+            "sender": sender,
+            "content": content,
+            "type": msg_type,
+            "word_count": len(content.split()) if msg_type == "normal" else 0,
+            "character_count": len(content),
+            "emojis": emojis,
+            "emoji_count": len(emojis),
+            "mentions": mentions,
+            "urls": urls,
+            "has_question": "?" in content,
+            "has_exclamation": "!" in content,
+            "is_caps": content.isupper() if len(content) > 3 else False
+        })
+
+    return messages
+
+
+def synthetic_export(count: int, participants: int = 8, seed: int = 0,
+                     timestamp_format: str = "%d/%m/%y, %H:%M") -> str:
+    """Render `synthetic_messages` as the text of a WhatsApp export."""
+    lines = []
+    for msg in synthetic_messages(count, participants, seed):
+        stamp = datetime.fromisoformat(msg["timestamp"]).strftime(timestamp_format)
+        if msg["sender"]:
+            lines.append(f"{stamp} - {msg['sender']}: {msg['content']}")
+        else:
+            lines.append(f"{stamp} - {msg['content']}")
+    return "\n".join(lines) + "\n"
+
+
+def iter_export_lines(count: int, participants: int = 8, seed: int = 0, date_format: str = "24h",
+                      emoji_ratio: float = 0.2, url_ratio: float = 0.1, media_ratio: float = 0.04,
+                      system_ratio: float = 0.01, multiline_ratio: float = 0.02) -> Iterator[str]:
+    """
+    Lines of a synthetic WhatsApp export with `count` messages, generated
+    lazily so exports of millions of messages never sit in memory.
+
+    `date_format` names one of DATE_FORMATS. The ratios are the share of
+    messages that carry emojis or a URL, that are media or system messages,
+    and that continue on further lines, as messages pasted with newlines
+    do. The same arguments always give the same export.
+    """
+    rng = random.Random(seed)
+    fmt = DATE_FORMATS[date_format]
+    senders = [f"User {i}" for i in range(participants)]
+    mentions = [f"@{sender.replace(' ', '')}" for sender in senders]
+    timestamp = datetime(2020, 1, 1, 9, 0)
+
+    for _ in range(count):
+        timestamp += timedelta(seconds=rng.choice((0, 30, 60, 120, 600, 3600, 5 * 3600)))
+        stamp = timestamp.strftime(fmt)
+        roll = rng.random()
+        if roll < system_ratio:
+            yield f"{stamp} - {rng.choice(senders)} joined using this group's invite link"
+            continue
+
+        sender = rng.choice(senders)
+        if roll < system_ratio + media_ratio:
+            yield f"{stamp} - {sender}: <Media omitted>"
+            continue
+
+        if rng.random() < 0.25:
+            words = [rng.choice(SHORT_REPLIES)]
+        else:
+            words = rng.choices(WORDS, k=rng.randint(1, 20))
+            if rng.random() < 0.05:
+                words.append(rng.choice(mentions))
+        if rng.random() < url_ratio:
+            words.append(f"https://{rng.choice(DOMAINS)}/{rng.choice(WORDS)}")
+        if rng.random() < emoji_ratio:
+            words.extend(rng.choices(EMOJIS, k=rng.randint(1, 3)))
+        yield f"{stamp} - {sender}: {' '.join(words)}"
+
+        if rng.random() < multiline_ratio:
+            for _ in range(rng.randint(1, 3)):
+                yield " ".join(rng.choices(WORDS, k=rng.randint(1, 10)))
+
+
+def write_export(path: str, count: int, **options) -> int:
+    """Write `iter_export_lines(count, **options)` to `path`; returns the number of lines."""
+    lines = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for line in iter_export_lines(count, **options):
+            f.write(line)
+            f.write("\n")
+            lines += 1
+    return lines
@@ -0,0 +1,61 @@
+import os
+import zipfile
+
+from app.batch import chat_filename
+from app.utils import batch
+from benchmarks.synthetic import synthetic_export
+
+ANALYSES = ["basic_stats", "content_analysis"]
+
+
+def analyze_or_crash(source, analyses=None):
+    # Runs in the worker process: takes the whole worker down for one chat
+    if source[0] == "crash.txt":
+        os._exit(1)
+    return batch.analyze_export(source, analyses)
+
+
+def test_dead_worker_fails_its_chat_and_the_batch_goes_on(tmp_path, monkeypatch):
+    archive = tmp_path / "batch.zip"
+    with zipfile.ZipFile(archive, "w") as f:
+        f.writestr("a.txt", synthetic_export(200, seed=1))
+        f.writestr("crash.txt", synthetic_export(200, seed=2))
+        f.writestr("z.txt", synthetic_export(300, seed=3))
+    monkeypatch.setattr(batch, "analyze_export", analyze_or_crash)
+
+    reports = []
+    summary = batch.run_batch(str(archive), ANALYSES, on_chat=reports.append, workers=1, max_pending=1)
+
+    by_name = {report["name"]: report for report in reports}
+    assert summary["chats"] == 3
+    assert summary["failed_chats"] == 1
+    assert "Worker process died" in by_name["crash.txt"]["error"]
+    # The chats after the crash ran on a new pool and made it into the aggregates
+    assert summary["messages"] == by_name["a.txt"]["messages"] + by_name["z.txt"]["messages"] == 500
+    assert all(stats["chats"] == 2 for stats in summary["aggregates"]["participants"].values())
+
+
+class BrokenActivity(batch.UserActivityAccumulator):
+    def update(self, batch_table):
+        raise RuntimeError("boom")
+
+
+def test_chat_without_participant_totals_fails_instead_of_the_batch(tmp_path, monkeypatch):
+    export = tmp_path / "chat.txt"
+    export.write_text(synthetic_export(200, seed=4), encoding="utf-8")
+    monkeypatch.setattr(batch, "UserActivityAccumulator", BrokenActivity)
+
+    outcome = batch.analyze_export(("chat.txt", str(export), None), ANALYSES)
+
+    assert outcome["totals"] is None
+    assert "user_activity" in outcome["report"]["error"]
+    # The analyses that did finish are still reported
+    assert outcome["report"]["result"]["basic_stats"] is not None
+
+
+def test_chat_filenames_do_not_collide():
+    taken = set()
+    names = ["a b.txt", "a?b.txt", "A_B.txt", "a_b-2.txt", "???"]
+    filenames = [chat_filename(name, taken) for name in names]
+
+    assert filenames == ["a_b.txt.json", "a_b.txt-2.json", "A_B.txt-3.json", "a_b-2.txt.json", "chat.json"]
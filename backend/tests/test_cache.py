@@ -0,0 +1,91 @@
+import os
+import pickle
+import stat
+
+import pytest
+
+from app.utils import cache
+from app.utils.cache import DiskResultCache, MemoryResultCache, private_directory
+
+RESULT = {"basic_stats": {"total_messages": 3}, "topics": ["a", "b"]}
+
+
+def test_disk_cache_directory_is_private(tmp_path):
+    directory = tmp_path / "results"
+    DiskResultCache(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+def test_loose_permissions_are_tightened(tmp_path):
+    directory = tmp_path / "results"
+    directory.mkdir(mode=0o777)
+    os.chmod(directory, 0o777)
+    private_directory(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="needs root to chown")
+def test_directory_owned_by_another_user_is_refused(tmp_path):
+    directory = tmp_path / "results"
+    directory.mkdir()
+    os.chown(directory, 12345, -1)
+    with pytest.raises(PermissionError):
+        DiskResultCache(str(directory))
+
+
+def test_results_round_trip_across_instances(tmp_path):
+    DiskResultCache(str(tmp_path)).put("key", RESULT)
+    assert DiskResultCache(str(tmp_path)).get("key") == RESULT
+
+
+def test_unsigned_or_tampered_files_are_not_unpickled(tmp_path, monkeypatch):
+    store = DiskResultCache(str(tmp_path))
+    store.put("key", RESULT)
+    path = store._path("key")
+
+    loads = []
+    monkeypatch.setattr(cache.pickle, "loads", lambda payload: loads.append(payload))
+    with open(path, "wb") as f:
+        f.write(pickle.dumps({"planted": True}))
+    assert store.get("key") is None
+    assert loads == []
+    assert not os.path.exists(path)
+
+
+def test_files_signed_with_another_key_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "RESULT_CACHE_KEY", "one key")
+    DiskResultCache(str(tmp_path)).put("key", RESULT)
+    monkeypatch.setattr(cache, "RESULT_CACHE_KEY", "another key")
+    assert DiskResultCache(str(tmp_path)).get("key") is None
+
+
+def test_workers_sharing_a_directory_see_each_others_results(tmp_path):
+    first, second = DiskResultCache(str(tmp_path)), DiskResultCache(str(tmp_path))
+    first.put("key", RESULT)
+    assert second.get("key") == RESULT
+    assert second.stats()["hits"] == 1
+
+
+def test_budget_covers_the_whole_directory(tmp_path):
+    result = {"section": "x" * 1000}
+    workers = [DiskResultCache(str(tmp_path), max_bytes=5000) for _ in range(3)]
+    for i in range(12):
+        workers[i % 3].put(f"key-{i}", result)
+    on_disk = sum(entry.stat().st_size for entry in os.scandir(tmp_path) if entry.name.endswith(".pkl"))
+    assert 0 < on_disk <= 5000
+    # The newest results are the ones kept
+    assert workers[0].get("key-11") == result
+
+
+@pytest.mark.parametrize("store", [MemoryResultCache, DiskResultCache])
+def test_selection_lookup_counts_once(tmp_path, store):
+    cache_ = store() if store is MemoryResultCache else store(str(tmp_path))
+    cache_.put("key", RESULT)
+
+    assert cache_.get_selection("key", ["topics"]) == {"topics": ["a", "b"]}
+    assert (cache_.hits, cache_.misses) == (1, 0)
+    assert cache_.get_selection("other", ["topics"]) is None
+    assert (cache_.hits, cache_.misses) == (1, 1)
+    cache_.put_selection("other", ["topics"], {"topics": ["c"]})
+    assert cache_.get_selection("other", ["topics"]) == {"topics": ["c"]}
+    assert (cache_.hits, cache_.misses) == (2, 1)
@@ -0,0 +1,78 @@
+from fractions import Fraction
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from app.utils.centrality import betweenness, pivot_count, reply_centrality
+
+
+def random_pairs(nodes: int, edges: int, seed: int, max_count: int = 20):
+    rng = np.random.default_rng(seed)
+    pairs = {}
+    while len(pairs) < edges:
+        source, target = rng.choice(nodes, 2, replace=False).tolist()
+        pairs[(f"User {source}", f"User {target}")] = int(rng.integers(1, max_count + 1))
+    return pairs
+
+
+def networkx_reply_centrality(pairs):
+    G = nx.Graph()
+    for (source, target), count in pairs.items():
+        if G.has_edge(source, target):
+            G[source][target]["count"] += count
+        else:
+            G.add_edge(source, target, count=count)
+    for _, _, data in G.edges(data=True):
+        # Exact lengths, so paths of equal length tie in networkx as well
+        data["length"] = Fraction(1, data["count"])
+    return nx.degree_centrality(G), nx.betweenness_centrality(G, weight="length")
+
+
+@pytest.mark.parametrize("nodes, edges, max_count", [
+    (2, 1, 5),
+    (12, 30, 20),
+    (60, 200, 20),
+    # Equal counts everywhere, so shortest paths tie all over the graph
+    (40, 120, 1),
+])
+def test_sparse_betweenness_matches_networkx(nodes, edges, max_count):
+    pairs = random_pairs(nodes, edges, seed=nodes, max_count=max_count)
+    degree, between, info = reply_centrality(pairs, "exact")
+    expected_degree, expected_between = networkx_reply_centrality(pairs)
+
+    assert info == {"betweenness": "exact"}
+    assert degree == pytest.approx(expected_degree)
+    assert between == pytest.approx(expected_between, abs=1e-9)
+
+
+def test_sampled_betweenness_is_deterministic_and_close():
+    pairs = random_pairs(300, 2000, seed=7)
+    _, exact, _ = reply_centrality(pairs, "exact")
+    _, sampled, info = reply_centrality(pairs, "approximate", pivots=150)
+    _, again, _ = reply_centrality(pairs, "approximate", pivots=150)
+
+    assert info == {"betweenness": "approximate", "pivots": 150}
+    assert sampled == again
+    users = sorted(exact, key=exact.get, reverse=True)[:10]
+    assert np.corrcoef([exact[u] for u in exact], [sampled[u] for u in exact])[0, 1] > 0.9
+    assert set(users[:3]) <= set(sorted(sampled, key=sampled.get, reverse=True)[:10])
+
+
+def test_mention_graph_betweenness_modes():
+    G = nx.gnm_random_graph(80, 300, seed=1)
+    values, info = betweenness(G, "auto", max_exact_nodes=100)
+    assert info == {"betweenness": "exact"}
+    assert values == nx.betweenness_centrality(G)
+
+    values, info = betweenness(G, "auto", max_exact_nodes=50, pivots=20)
+    assert info == {"betweenness": "approximate", "pivots": 20}
+    assert values == betweenness(G, "approximate", pivots=20)[0]
+
+
+def test_pivot_count():
+    assert pivot_count(100, "exact") is None
+    assert pivot_count(100, "auto", max_exact_nodes=500, pivots=10) is None
+    assert pivot_count(1000, "auto", max_exact_nodes=500, pivots=10) == 10
+    # Never more pivots than there are nodes
+    assert pivot_count(5, "approximate", pivots=10) is None
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.analytics import ANALYSIS_ACCUMULATORS, generate_complete_analysis
+from app.utils.engine import run_accumulators
+from app.utils.features import SEPARATOR, WORD_PATTERN
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+TRICKY = [
+    "Hello, WORLD... it's 3.14!",
+    "tabs\tand no-break　ideographic spaces",
+    "İstanbul Straße ÉCOLE 👍🏽 naïve",
+    "snake_case words_with_digits 42",
+    "  ",
+]
+
+
+def table_with(contents):
+    messages = synthetic_messages(len(contents) + 50, seed=4)
+    for message, content in zip(messages, contents):
+        message.update(content=content, type="normal")
+    return MessageTable.from_messages(messages)
+
+
+def expected_features(table, row):
+    if table.to_messages()[row]["type"] != "normal":
+        return [], 0, 0, 0
+    content = table.content_at(row)
+    words = content.split()
+    return WORD_PATTERN.findall(content.lower()), len(words), sum(map(len, words)), content.count(".")
+
+
+@pytest.mark.parametrize("contents", [
+    TRICKY,
+    # A message holding the separator sends its chunk down the row-by-row path
+    TRICKY + [f"odd{SEPARATOR}message"],
+])
+def test_features_match_tokenizing_each_message(contents):
+    table = table_with(contents)
+    features = table.features()
+    for row in range(len(table)):
+        start, stop = features.token_offsets[row], features.token_offsets[row + 1]
+        tokens = [features.vocabulary[i] for i in features.token_ids[start:stop].tolist()]
+        got = (tokens, int(features.split_words[row]), int(features.split_characters[row]),
+               int(features.periods[row]))
+        assert got == expected_features(table, row)
+
+
+def test_slices_share_the_features():
+    table = table_with(TRICKY)
+    features = table.features()
+    part = table.slice(3, 20).features()
+    assert part.vocabulary is features.vocabulary
+    assert part.batch_token_ids().tolist() == \
+        features.token_ids[features.token_offsets[3]:features.token_offsets[20]].tolist()
+
+
+def test_results_do_not_depend_on_batching():
+    table = MessageTable.from_messages(synthetic_messages(900, seed=9))
+    names = [name for name, factory in ANALYSIS_ACCUMULATORS.items() if factory().uses_features]
+    results = [run_accumulators(table, {name: ANALYSIS_ACCUMULATORS[name]() for name in names}, batch_size=size)
+               for size in (64, 900)]
+    assert repr(results[0]) == repr(results[1])
+
+
+def test_lone_surrogate_does_not_fail_the_analysis():
+    # JSON can carry half of a surrogate pair on its own
+    table = table_with(TRICKY + ["broken emoji \ud83d here"])
+    features = table.features()
+    row = len(TRICKY)
+    start, stop = features.token_offsets[row], features.token_offsets[row + 1]
+    assert [features.vocabulary[i] for i in features.token_ids[start:stop].tolist()] == ["broken", "emoji", "here"]
+
+    result = generate_complete_analysis(table, "serial")
+    assert all(section is not None for section in result.values())
+
+    messages = table.to_messages()
+    response = TestClient(app).post("/analysis/complete", content=json.dumps(messages),
+                                    headers={"content-type": "application/json"})
+    assert response.status_code == 200
+
+
+def test_failing_features_only_fail_the_analyses_using_them(monkeypatch):
+    table = MessageTable.from_messages(synthetic_messages(100, seed=2))
+
+    def broken():
+        raise ValueError("cannot tokenize")
+
+    monkeypatch.setattr(table, "features", broken)
+    accumulators = {name: factory() for name, factory in ANALYSIS_ACCUMULATORS.items()}
+    uses_features = {name: acc.uses_features for name, acc in accumulators.items()}
+    result = run_accumulators(table, accumulators)
+    for name, uses in uses_features.items():
+        assert (result[name] is None) == uses, name
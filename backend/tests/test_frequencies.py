@@ -0,0 +1,32 @@
+from app.utils.analytics import ContentAccumulator, StopwordsAccumulator, TopicsAccumulator
+from app.utils.engine import run_accumulators
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+
+def frequencies(table, mode, capacity=None, **others):
+    accumulators = {"content_analysis": ContentAccumulator(mode, capacity),
+                    "stopwords": StopwordsAccumulator(mode, capacity), **others}
+    results = run_accumulators(table, accumulators, batch_size=97)
+    return results["content_analysis"], results["stopwords"]
+
+
+def test_sketch_mode_does_not_build_the_shared_features():
+    table = MessageTable.from_messages(synthetic_messages(600, seed=5))
+    content, stopwords = frequencies(table, "sketch", 100_000)
+    assert not table.has_features()
+
+    exact_content, exact_stopwords = frequencies(MessageTable.from_messages(synthetic_messages(600, seed=5)),
+                                                 "exact")
+    assert content["word_frequency"] == exact_content["word_frequency"]
+    assert list(content["word_frequency"].items()) == list(exact_content["word_frequency"].items())
+    assert stopwords == exact_stopwords
+    assert content["frequency_bounds"]["word_frequency"]["exact"]
+
+
+def test_sketch_mode_reads_features_another_analysis_built():
+    table = MessageTable.from_messages(synthetic_messages(600, seed=5))
+    content, _ = frequencies(table, "sketch", 100_000, topics=TopicsAccumulator())
+    assert table.has_features()
+    exact, _ = frequencies(MessageTable.from_messages(synthetic_messages(600, seed=5)), "exact")
+    assert list(content["word_frequency"].items()) == list(exact["word_frequency"].items())
@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from app.utils import executor, incremental
+from app.utils.analytics import generate_complete_analysis
+from app.utils.cache import MemoryResultCache
+from app.utils.table import MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+
+@pytest.fixture(autouse=True)
+def state_store(monkeypatch):
+    store = MemoryResultCache()
+    monkeypatch.setattr(incremental, "state_store", store)
+    monkeypatch.setattr(incremental, "INCREMENTAL_ANALYSIS", True)
+    return store
+
+
+@pytest.fixture(scope="module")
+def chat():
+    return MessageTable.from_messages(synthetic_messages(400, seed=3))
+
+
+def test_resume_matches_fresh_run(chat):
+    incremental.generate_incremental_analysis(chat.slice(0, 250), mode="serial")
+    result, info = incremental.generate_incremental_analysis(chat, mode="serial")
+
+    assert info["resumed_rows"] == 250
+    assert info["new_rows"] == 150
+    assert repr(result) == repr(generate_complete_analysis(chat, "serial"))
+
+
+def test_prefix_with_different_fingerprint_is_rejected(chat):
+    incremental.generate_incremental_analysis(chat.slice(0, 250), mode="serial")
+    # Same first messages, so the same saved state is found, but an edit
+    # further into the part it was built from
+    messages = chat.to_messages()
+    messages[200]["content"] = "edited after the export"
+    edited = MessageTable.from_messages(messages)
+    assert incremental.chat_anchor(edited) == incremental.chat_anchor(chat)
+
+    result, info = incremental.generate_incremental_analysis(edited, mode="serial")
+
+    assert info["resumed_rows"] == 0
+    assert repr(result) == repr(generate_complete_analysis(edited, "serial"))
+
+
+def test_process_mode_runs_in_worker_processes_and_saves_state(chat, monkeypatch, state_store):
+    pools = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(executor, "ProcessPoolExecutor", RecordingPool)
+    monkeypatch.setattr(executor, "EXECUTOR_WORKERS", 2)
+    executor.shutdown_process_pool()
+
+    try:
+        first, _ = incremental.generate_incremental_analysis(chat.slice(0, 250), mode="process")
+        assert pools, "the process mode did not start a process pool"
+        assert repr(first) == repr(generate_complete_analysis(chat.slice(0, 250), "serial"))
+        # Requests share the one pool, whose workers are not forked from this process
+        assert repr(generate_complete_analysis(chat, "process")) == repr(generate_complete_analysis(chat, "serial"))
+        assert len(pools) == 1
+        assert pools[0]._mp_context.get_start_method() != "fork"
+    finally:
+        executor.shutdown_process_pool()
+
+    # The state the workers sent back is saved, and resuming from it in
+    # another mode gives the fresh result
+    assert state_store.stats()["entries"] == 1
+    result, info = incremental.generate_incremental_analysis(chat, mode="serial")
+    assert info["resumed_rows"] == 250
+    assert repr(result) == repr(generate_complete_analysis(chat, "serial"))
+
+
+def test_chats_shorter_than_the_anchor_are_not_saved(chat, state_store):
+    short = chat.slice(0, incremental.ANCHOR_ROWS - 1)
+    result, info = incremental.generate_incremental_analysis(short, mode="serial")
+    assert info is None
+    assert state_store.stats()["entries"] == 0
+    assert repr(result) == repr(generate_complete_analysis(short, "serial"))
+
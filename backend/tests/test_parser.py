@@ -0,0 +1,89 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.utils import parser
+from app.utils.parser import (DAY_FIRST, MONTH_FIRST, detect_date_order, parse_chat_table, parse_chunks,
+                              parse_stream)
+from app.utils.table import to_epoch
+
+
+def export_lines(start: datetime, count: int, step: timedelta, date_format: str):
+    lines, times = [], []
+    for i in range(count):
+        moment = start + i * step
+        lines.append(f"{moment.strftime(date_format)} - User {i % 3}: message number {i} 👍🏽")
+        times.append(to_epoch(moment))
+    return lines, times
+
+
+def chunked(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize("date_format, order", [
+    ("%d/%m/%y, %H:%M", DAY_FIRST),
+    ("%m/%d/%y, %I:%M %p", MONTH_FIRST),
+])
+def test_date_order_is_detected(date_format, order):
+    lines, times = export_lines(datetime(2023, 3, 10), 200, timedelta(hours=6), date_format)
+    assert detect_date_order(lines) == order
+    assert parse_chat_table(lines).timestamps.tolist() == times
+
+
+def test_all_ambiguous_dates_are_read_day_first():
+    lines = ["01/02/24, 09:00 - Alice: hi", "03/04/24, 10:00 - Bob: hello"]
+    assert detect_date_order(lines) == DAY_FIRST
+    assert parse_chat_table(lines).timestamps.tolist() == [to_epoch(datetime(2024, 2, 1, 9)),
+                                                           to_epoch(datetime(2024, 4, 3, 10))]
+
+
+def test_lines_held_for_the_date_order_are_capped(monkeypatch):
+    monkeypatch.setattr(parser, "DATE_ORDER_MAX_HELD_LINES", 100)
+    read = []
+
+    def lines():
+        for _ in range(1000):
+            read.append(None)
+            yield "01/02/24, 09:00 - Alice: hi"
+
+    rows = parser.iter_message_rows(lines())
+    first = next(rows)
+
+    # No date settles the order, so the first row came after the cap, read day-first
+    assert len(read) == 100
+    assert first[0] == to_epoch(datetime(2024, 2, 1, 9))
+    assert len(list(rows)) == 999
+
+
+def test_month_first_settled_after_the_first_chunks():
+    # Days 1-12 only for well over a chunk, then the 13th settles the order
+    lines, times = export_lines(datetime(2023, 1, 1), 3000, timedelta(minutes=10), "%m/%d/%y, %I:%M %p")
+    ambiguous = sum(1 for line in lines if int(line[3:5]) <= 12)
+    data = "\n".join(lines).encode()
+    assert ambiguous < len(lines)
+    assert len("\n".join(lines[:ambiguous]).encode()) > 3 * 16 * 1024
+
+    table = parse_chunks(chunked(data, 16 * 1024))
+
+    assert len(table) == len(lines)
+    assert table.timestamps.tolist() == times
+
+
+def test_lines_split_across_chunks_come_out_whole():
+    lines, _ = export_lines(datetime(2023, 5, 20), 300, timedelta(minutes=47), "%d/%m/%Y, %H:%M")
+    lines.insert(10, "a continuation line without a timestamp")
+    data = ("\n".join(lines) + "\n").encode()
+    expected = parse_chat_table(lines).to_messages()
+
+    # Chunk sizes that split lines, and the multi-byte emoji, everywhere
+    for size in (1, 7, 61, 4096):
+        assert parse_chunks(chunked(data, size)).to_messages() == expected
+    assert parse_stream(io.BytesIO(data), chunk_size=13).to_messages() == expected
+
+
+def test_missing_final_newline_and_crlf():
+    data = b"13/01/24, 09:00 - Alice: first\r\n13/01/24, 09:01 - Bob: last"
+    table = parse_chunks(chunked(data, 5))
+    assert [message["content"] for message in table.to_messages()] == ["first", "last"]
@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.sentiment import SentimentScorer
+
+
+def test_only_cache_lookups_that_found_the_text_are_hits():
+    scorer = SentimentScorer("textblob")
+    # Repeats within a batch are scored once, but were never in the cache
+    scores = scorer.score_many(["great", "great", "awful", "great"])
+    assert scores[0] == scores[1] == scores[3]
+    assert (scorer.hits, scorer.misses) == (0, 2)
+
+    scorer.score_many(["great", "fine", "fine"])
+    assert (scorer.hits, scorer.misses) == (1, 3)
+
+
+def test_counts_add_up_across_threads():
+    scorer = SentimentScorer("textblob")
+    batches = [[f"message {i % 50}" for i in range(start, start + 100)] for start in range(0, 4000, 100)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(scorer.score_many, batches))
+    # Every batch looks up its 50 distinct texts once
+    assert scorer.hits + scorer.misses == 50 * len(batches)
@@ -0,0 +1,80 @@
+import pickle
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.utils.sketches import ExactCounts, HeavyHitters, frequency_counter
+
+
+def zipf_batches(count: int, batches: int, seed: int):
+    rng = np.random.default_rng(seed)
+    items = rng.zipf(1.3, count)
+    return [Counter(batch.tolist()) for batch in np.array_split(items, batches)]
+
+
+def assert_within_bounds(sketch: HeavyHitters, exact: Counter):
+    assert sketch.total == sum(exact.values())
+    assert len(sketch) <= sketch.capacity
+    assert sketch.max_error <= sketch.total / (sketch.capacity + 1)
+    for item, count in sketch.items():
+        assert exact[item] - sketch.max_error <= count <= exact[item]
+    # Anything more frequent than the error bound is never dropped
+    for item, count in exact.items():
+        if count > sketch.max_error:
+            assert item in sketch
+
+
+@pytest.mark.parametrize("capacity", [10, 100, 1000])
+def test_counts_stay_within_the_error_bound(capacity):
+    sketch, exact = HeavyHitters(capacity), Counter()
+    for batch in zipf_batches(50_000, 40, seed=capacity):
+        sketch.add_counts(batch.items())
+        exact.update(batch)
+
+    assert sketch.max_error > 0
+    assert_within_bounds(sketch, exact)
+    assert sketch.bounds() == {"capacity": capacity, "total": 50_000, "max_error": sketch.max_error,
+                               "exact": False}
+
+
+def test_exact_until_capacity_is_reached():
+    sketch, exact = HeavyHitters(10_000), Counter()
+    for batch in zipf_batches(5_000, 5, seed=1):
+        sketch.add_counts(batch.items())
+        exact.update(batch)
+    assert sketch.max_error == 0 and sketch.bounds()["exact"]
+    assert sketch.most_common() == exact.most_common()
+
+
+def test_merged_sketches_add_their_errors():
+    merged, exact = HeavyHitters(50), Counter()
+    errors = 0
+    for seed in range(4):
+        part = HeavyHitters(50)
+        for batch in zipf_batches(20_000, 10, seed=seed):
+            part.add_counts(batch.items())
+            exact.update(batch)
+        errors += part.max_error
+        merged.merge(part)
+
+    assert merged.max_error >= errors
+    assert_within_bounds(merged, exact)
+
+
+def test_sketch_survives_pickling():
+    sketch = HeavyHitters(20)
+    for batch in zipf_batches(5_000, 5, seed=2):
+        sketch.add_counts(batch.items())
+    copy = pickle.loads(pickle.dumps(sketch))
+    assert copy == sketch
+    assert copy.bounds() == sketch.bounds()
+
+
+def test_frequency_counter_modes():
+    assert isinstance(frequency_counter("exact"), ExactCounts)
+    assert frequency_counter("sketch", 5).capacity == 5
+    with pytest.raises(ValueError):
+        frequency_counter("approximate")
+    with pytest.raises(ValueError):
+        HeavyHitters(0)
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+
+from app.routers import analysis
+from app.routers.chats import MessageFilter, analyze_stored
+from app.utils import incremental
+from app.utils.cache import MemoryResultCache
+from app.utils.metrics import Profile
+from app.utils.store import ChatNotFound, ChatStore
+from app.utils.table import MessageTable, to_epoch
+from benchmarks.synthetic import synthetic_messages
+
+
+@pytest.fixture(scope="module")
+def messages():
+    messages = synthetic_messages(3000, participants=6, seed=7)
+    # Out of order timestamps, as a chat with a changed phone clock has
+    messages[10], messages[2000] = messages[2000], messages[10]
+    return messages
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChatStore(str(tmp_path))
+
+
+def epoch(message):
+    return to_epoch(datetime.fromisoformat(message["timestamp"]))
+
+
+def expected(messages, start=None, end=None, senders=None):
+    return [m for m in messages
+            if (start is None or epoch(m) >= start) and (end is None or epoch(m) < end)
+            and (senders is None or m["sender"] in senders)]
+
+
+def test_stored_chat_reads_back_whole(store, messages):
+    table = MessageTable.from_messages(messages)
+    chat = store.get(store.save(table))
+    assert chat.query().fingerprint() == table.fingerprint()
+    assert store.save(table) == chat.meta["chat_id"]
+
+
+@pytest.mark.parametrize("start_row, end_row, senders", [
+    (500, 1500, None),
+    (None, 1200, None),
+    (2500, None, None),
+    (None, None, ["User 1", "User 4"]),
+    (100, 2900, ["User 2"]),
+    # A narrow range with many senders, and the other way around, take
+    # different paths through the indexes
+    (1000, 1010, ["User 0", "User 1", "User 2", "User 3", "User 5"]),
+    (0, 2999, ["User 3"]),
+    (None, None, ["Nobody"]),
+])
+def test_filter_by_time_and_sender(store, messages, start_row, end_row, senders):
+    chat = store.get(store.save(MessageTable.from_messages(messages)))
+    times = sorted(epoch(m) for m in messages)
+    start = None if start_row is None else times[start_row]
+    end = None if end_row is None else times[end_row]
+
+    result = chat.query(start, end, senders)
+
+    assert result.to_messages() == expected(messages, start, end, senders)
+
+
+def test_least_recently_used_chats_are_closed(tmp_path):
+    store = ChatStore(str(tmp_path), max_open=2)
+    ids = [store.save(MessageTable.from_messages(synthetic_messages(50, seed=seed))) for seed in range(3)]
+    first, second = store.get(ids[0]), store.get(ids[1])
+    store.get(ids[0])
+    store.get(ids[2])
+
+    assert list(store.open_chats) == [ids[0], ids[2]]
+    assert second.closed and second.columns is None
+    assert not first.closed
+    # A chat closed while someone still holds it maps its files again to answer
+    assert second.query(senders=["User 1"]).to_messages() == expected(synthetic_messages(50, seed=1),
+                                                                        senders=["User 1"])
+    assert second.columns is None
+
+
+def test_deleted_chat_is_gone(store, messages):
+    chat_id = store.save(MessageTable.from_messages(messages[:100]))
+    store.get(chat_id)
+    store.delete(chat_id)
+    assert store.list() == []
+    with pytest.raises(ChatNotFound):
+        store.get(chat_id)
+
+
+def test_only_unfiltered_analyses_save_incremental_state(store, messages, monkeypatch):
+    state_store = MemoryResultCache()
+    monkeypatch.setattr(incremental, "state_store", state_store)
+    monkeypatch.setattr(incremental, "INCREMENTAL_ANALYSIS", True)
+    monkeypatch.setattr(analysis, "result_cache", MemoryResultCache())
+    chat = store.get(store.save(MessageTable.from_messages(messages[:300])))
+
+    analyze_stored(chat, MessageFilter(None, None, ["User 1"]), Profile())
+    assert state_store.stats()["entries"] == 0
+    analyze_stored(chat, MessageFilter(None, None, None), Profile())
+    assert state_store.stats()["entries"] == 1
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.table import InvalidMessage, MessageTable
+from benchmarks.synthetic import synthetic_messages
+
+
+def with_timestamps(messages, timestamps):
+    return [dict(message, timestamp=timestamp) for message, timestamp in zip(messages, timestamps)]
+
+
+def test_offsets_keep_the_local_time():
+    messages = synthetic_messages(3, seed=1)
+    aware = with_timestamps(messages, ["2024-03-01T09:30:00+02:00", "2024-03-01T10:00:00Z",
+                                       "2024-03-01T23:15:00-05:00"])
+    naive = with_timestamps(messages, ["2024-03-01T09:30:00", "2024-03-01T10:00:00", "2024-03-01T23:15:00"])
+
+    table = MessageTable.from_messages(aware)
+
+    assert table.timestamps.tolist() == MessageTable.from_messages(naive).timestamps.tolist()
+    assert table.hours().tolist() == [9, 10, 23]
+
+
+@pytest.mark.parametrize("timestamp", ["yesterday", "2024-13-01T00:00:00", None, 1709285400])
+def test_invalid_timestamp_is_a_bad_request(timestamp):
+    messages = synthetic_messages(5, seed=2)
+    messages[3]["timestamp"] = timestamp
+
+    with pytest.raises(InvalidMessage):
+        MessageTable.from_messages(messages)
+    response = TestClient(app).post("/analysis/complete", json=messages)
+    assert response.status_code == 400
+    assert "Invalid timestamp" in response.json()["detail"]
@@ -0,0 +1,20 @@
+import pytest
+
+from app.routers import metrics as metrics_router  # noqa: F401 (adds the cache collectors)
+from app.utils import analytics, metrics, warmup
+
+
+def test_warm_up_leaves_the_metrics_alone():
+    before = metrics.registry.render()
+    warmup.warm_up()
+    assert metrics.registry.render() == before
+
+
+def test_failed_section_fails_the_warm_up(monkeypatch):
+    class Failing(analytics.BasicStatsAccumulator):
+        def finalize(self):
+            raise ValueError("broken")
+
+    monkeypatch.setitem(analytics.ANALYSIS_ACCUMULATORS, "basic_stats", Failing)
+    with pytest.raises(RuntimeError, match="basic_stats"):
+        warmup.warm_up()
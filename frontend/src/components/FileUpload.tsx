@@ -24,15 +24,7 @@ export default function FileUpload() {
       const formData = new FormData()
       formData.append('file', file)
 
-      const parseResponse = await axios.post('http://localhost:8000/parse/chat', formData)
-      
-      if (!parseResponse.data.messages) {
-        throw new Error('No messages found in parsed response.')
-      }
-
-      const messages = parseResponse.data.messages
-      const analysisResponse = await axios.post('http://localhost:8000/analysis/complete', messages)
-      
+      const analysisResponse = await axios.post('http://localhost:8000/analyze', formData)
       setAnalysis(analysisResponse.data)
       router.push('/analysis')
     } catch (err: any) {